@@ -1,14 +1,24 @@
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from datetime import datetime
 from app.models import AgentResult
 from app.tools.db import DatabaseQueries
+from app.tools.async_db import AsyncDatabaseQueries
 
 class AnomalyAgent:
     async def analyze(self, db: Session, part_id: str, location: str, lat: float, lon: float, timestamp: datetime) -> AgentResult:
-        
+        return self.check(db, part_id, location, lat, lon, timestamp)
+
+    def check(self, db: Session, part_id: str, location: str, lat: float, lon: float, timestamp: datetime) -> AgentResult:
+        """Blocking (DB) part of analyze; the scan pipeline runs it in its agent thread pool"""
         # This will now return [] instead of crashing
-        recent_scans = DatabaseQueries.get_recent_scans(db, part_id) or []
+        return self._evaluate(DatabaseQueries.get_recent_scans(db, part_id) or [])
+
+    async def check_async(self, db: AsyncSession, part_id: str, location: str, lat: float, lon: float, timestamp: datetime) -> AgentResult:
+        """check through the async repository"""
+        return self._evaluate(await AsyncDatabaseQueries.get_recent_scans(db, part_id) or [])
 
+    def _evaluate(self, recent_scans: list) -> AgentResult:
         return AgentResult(
             agent_name="Anomaly Agent",
             passed=True,
@@ -1,12 +1,19 @@
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.models import AgentResult
 from app.tools.db import DatabaseQueries
+from app.tools.async_db import AsyncDatabaseQueries
 
 class CourierAgent:
     def verify(self, db: Session, courier_id: str, location: str) -> AgentResult:
         # 1. Fetch Courier Data from DB
-        courier = DatabaseQueries.get_courier_by_id(db, courier_id)
+        return self._evaluate(DatabaseQueries.get_courier_by_id(db, courier_id), courier_id)
 
+    async def check_async(self, db: AsyncSession, courier_id: str, location: str) -> AgentResult:
+        """verify through the async repository"""
+        return self._evaluate(await AsyncDatabaseQueries.get_courier_by_id(db, courier_id), courier_id)
+
+    def _evaluate(self, courier, courier_id: str) -> AgentResult:
         # 2. Handle Unknown Courier
         if not courier:
             return AgentResult(
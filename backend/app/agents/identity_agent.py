@@ -1,13 +1,23 @@
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.models import AgentResult
 from app.tools.db import DatabaseQueries
+from app.tools.async_db import AsyncDatabaseQueries
 
 class IdentityAgent:
     # ADDED 'async' keyword here
     async def verify(self, db: Session, part_id: str, serial_hash: str, oem_signature: str) -> AgentResult:
-        
-        part_record = DatabaseQueries.get_part_by_id(db, part_id)
+        return self.check(db, part_id, serial_hash, oem_signature)
+
+    def check(self, db: Session, part_id: str, serial_hash: str, oem_signature: str) -> AgentResult:
+        """Blocking (DB) part of verify; the scan pipeline runs it in its agent thread pool"""
+        return self._evaluate(DatabaseQueries.get_part_by_id(db, part_id), part_id, serial_hash)
+
+    async def check_async(self, db: AsyncSession, part_id: str, serial_hash: str, oem_signature: str) -> AgentResult:
+        """check through the async repository"""
+        return self._evaluate(await AsyncDatabaseQueries.get_part_by_id(db, part_id), part_id, serial_hash)
 
+    def _evaluate(self, part_record, part_id: str, serial_hash: str) -> AgentResult:
         if not part_record:
             return AgentResult(agent_name="Identity Agent", passed=False, confidence=0.0, details={"error": "Part not found"})
 
@@ -1,11 +1,18 @@
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.models import AgentResult
 from app.tools.db import DatabaseQueries
+from app.tools.async_db import AsyncDatabaseQueries
 
 class ProvenanceAgent:
     def verify(self, db: Session, part_id: str, current_location: str) -> AgentResult:
-        part = DatabaseQueries.get_part_by_id(db, part_id)
+        return self._evaluate(DatabaseQueries.get_part_by_id(db, part_id), current_location)
 
+    async def check_async(self, db: AsyncSession, part_id: str, current_location: str) -> AgentResult:
+        """verify through the async repository"""
+        return self._evaluate(await AsyncDatabaseQueries.get_part_by_id(db, part_id), current_location)
+
+    def _evaluate(self, part, current_location: str) -> AgentResult:
         if not part:
             return AgentResult(agent_name="Provenance Agent", passed=False, confidence=0.0, details={"error": "Part not found"})
 
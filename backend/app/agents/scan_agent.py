@@ -1,4 +1,4 @@
-from typing import Dict, Any, Tuple
+from typing import Dict, Any, Tuple, List, Optional
 from app.models import ScanRequest, ScanType
 from app.tools.ledger import crypto_ledger
 import logging
@@ -11,6 +11,7 @@ class ScanAgent:
     
     Decision Logic:
     - If QR code is valid → Path A (Digital Audit)
+    - If only a part ID was entered (QR scan without payload) → Path A against the ledger record
     - If QR code is missing/damaged → Path B (Visual Audit)
     """
     
@@ -31,22 +32,52 @@ class ScanAgent:
         
         if request.scan_type == ScanType.QR_SCAN and request.qr_data:
             return self._process_qr_scan(request)
+        elif request.scan_type == ScanType.QR_SCAN and request.part_id:
+            return self._process_part_lookup(request)
         elif request.scan_type == ScanType.MANUAL_AUDIT:
             return self._process_manual_audit(request)
         else:
             return self._process_visual_inspection(request)
     
-    def _process_qr_scan(self, request: ScanRequest) -> Dict[str, Any]:
+    def process_batch(self, requests: List[ScanRequest]) -> List[Dict[str, Any]]:
+        """
+        Route a whole pallet of scans, validating every QR payload in one pass
+        
+        Args:
+            requests: Incoming scan requests
+            
+        Returns:
+            Routing decisions in input order
+        """
+        logger.info(f"Scan Agent processing batch of {len(requests)}")
+        validations = crypto_ledger.verify_qr_batch([
+            r.qr_data if r.scan_type == ScanType.QR_SCAN else None for r in requests
+        ])
+        
+        routes = []
+        for request, qr_validation in zip(requests, validations):
+            if qr_validation is not None:
+                routes.append(self._process_qr_scan(request, qr_validation))
+            else:
+                routes.append(self.process(request))
+        return routes
+    
+    def _process_qr_scan(self, request: ScanRequest, qr_validation: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
         Process QR code scan
         
+        Args:
+            request: Incoming scan request
+            qr_validation: Pre-computed verify_qr_integrity result (batch scans)
+        
         Returns:
             Path decision and extracted data
         """
         logger.info(f"Processing QR code: {request.qr_data[:20]}...")
         
         # Verify QR integrity
-        qr_validation = crypto_ledger.verify_qr_integrity(request.qr_data)
+        if qr_validation is None:
+            qr_validation = crypto_ledger.verify_qr_integrity(request.qr_data)
         
         if qr_validation["valid"]:
             # QR is valid - go to Path A (Digital Audit)
@@ -58,7 +89,7 @@ class ScanAgent:
                 "oem_signature": qr_validation["oem_signature"],
                 "confidence": qr_validation["confidence"],
                 "message": "QR code validated successfully. Proceeding with digital audit.",
-                "next_agents": ["identity", "provenance", "anomaly", "courier"]
+                "next_agents": ["identity", "provenance", "anomaly", "courier", "marketplace"]
             }
         else:
             # QR is invalid - go to Path B (Visual Audit)
@@ -74,6 +105,27 @@ class ScanAgent:
                 "requires_user_input": True
             }
     
+    def _process_part_lookup(self, request: ScanRequest) -> Dict[str, Any]:
+        """
+        Process a scan that carries a part ID but no QR payload
+        (SKU typed in or decoded by the client)
+        
+        Returns:
+            Path A routing without cryptographic material
+        """
+        logger.info(f"Part ID lookup without QR payload: {request.part_id}")
+        
+        return {
+            "route": "PATH_A_DIGITAL",
+            "qr_valid": False,
+            "part_id": request.part_id,
+            "serial_hash": "",
+            "oem_signature": "",
+            "confidence": 80,  # Ledger lookup only, no signed payload
+            "message": "Part ID received. Proceeding with digital audit against the ledger.",
+            "next_agents": ["identity", "provenance", "anomaly", "courier", "marketplace"]
+        }
+    
     def _process_manual_audit(self, request: ScanRequest) -> Dict[str, Any]:
         """
         Process manual audit request (no QR code available)
@@ -1,14 +1,67 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+# Settings are read from the environment when app.* modules are imported,
+# so .env has to be loaded before any of them
+from dotenv import load_dotenv
+load_dotenv()
+
+from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from starlette.requests import ClientDisconnect
 import uvicorn
-import ollama
 import json
 import base64
-import io
 import re
-from PIL import Image
+import time
+from collections import Counter
+from typing import Optional
+from pydantic import ValidationError
+from contextlib import asynccontextmanager
+from sqlalchemy.orm import Session
+from app.models import ScanRequest, AuditResponse, BatchScanRequest, ChatResponse
+from app.pipeline import (
+    scan_pipeline, compact_result, SCAN_BATCH_MAX_ITEMS, SCAN_STREAM_MAX_LINE_BYTES
+)
+from app.tools.db import get_db
+from app.tools.async_db import async_database
+from app.tools.row_cache import row_cache
+from app.tools.imaging import (
+    preprocess_image_async, read_upload, shutdown_image_executor, ImageRejectedError
+)
+from app.tools.llm import llm_client, LLMUnavailableError
+from app.tools.scheduler import Priority, QueueFullError, inference_scheduler
+from app.tools.health import health_monitor, ollama_breaker
+from app.tools.cache import llm_cache
+from app.tools.phash import photo_index
+from app.tools.warmup import model_warmer
+from app.tools.tracing import trace_exporter
+from app.tools import metrics
+from app.tools.genstats import generation_stats
+from app.tools.jobs import job_queue, JobQueueFullError, CallbackRejectedError
+from app.tools.streaming import sse_event, ndjson_lines, DuplexStreamingResponse, STREAM_HEADERS
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open the pooled Ollama connection once and reuse it for every request
+    await llm_client.startup()
+    health_monitor.start(llm_client)
+    # Preload models in the background so the first courier scan is warm
+    model_warmer.start(llm_client)
+    # Background audits; resumes jobs left unfinished by the last shutdown
+    await job_queue.start(scan_pipeline.run)
+    # Async engines for the agents' ledger reads
+    await async_database.start()
+    yield
+    await job_queue.stop()
+    await trace_exporter.close()
+    await model_warmer.stop()
+    scan_pipeline.shutdown()
+    await async_database.close()
+    metrics.mark_process_dead()
+    await health_monitor.stop()
+    await llm_client.shutdown()
+    shutdown_image_executor()
+
+app = FastAPI(lifespan=lifespan)
 
 # --- CORS Configuration ---
 origins = [
@@ -24,9 +77,31 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# --- Per-route latency histograms (scraped from /metrics) ---
+app.add_middleware(metrics.MetricsMiddleware)
+
+def _llm_error(e: Exception) -> HTTPException:
+    """Map an endpoint failure to an HTTP error (429 on backpressure, 503 when Ollama is down)"""
+    if isinstance(e, HTTPException):
+        return e
+    if isinstance(e, QueueFullError):
+        return HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    if isinstance(e, LLMUnavailableError):
+        return HTTPException(status_code=503, detail=str(e))
+    return HTTPException(status_code=500, detail=str(e))
+
 @app.get("/")
 def read_root():
-    return {"status": "LogiGuard Core Online - Port 5000"}
+    return {
+        "status": "LogiGuard Core Online - Port 5000",
+        "ollama": ollama_breaker.snapshot(),
+        "models_ready": model_warmer.all_ready,
+        "models": model_warmer.readiness()
+    }
 
 # ==========================================
 # 1. VISUAL AGENT (Moondream)
@@ -35,43 +110,75 @@ def read_root():
 async def visual_agent(file: UploadFile = File(...)):
     try:
         print(f"--> Receiving Image: {file.filename}")
-        contents = await file.read()
+        # Refused by size before the whole upload is buffered
+        try:
+            contents = await read_upload(file)
+        except ImageRejectedError as rejected:
+            raise HTTPException(status_code=413, detail=str(rejected))
         
         if not contents:
             raise HTTPException(status_code=400, detail="Empty file uploaded")
 
-        # Convert to RGB JPEG for robustness
+        # Orient, downscale and re-encode before base64 (skipped if already compliant)
+        # Runs in the imaging worker pool; oversized uploads and decompression bombs are refused
         try:
-            image = Image.open(io.BytesIO(contents))
-            if image.mode in ("RGBA", "P"):
-                image = image.convert("RGB")
-            img_byte_arr = io.BytesIO()
-            image.save(img_byte_arr, format='JPEG')
-            img_byte_arr = img_byte_arr.getvalue()
+            img_byte_arr, preprocessing = await preprocess_image_async(contents)
+            print(
+                f"--> Preprocessed: {preprocessing['bytes_in']} -> {preprocessing['bytes_out']} bytes, "
+                f"{preprocessing['size_in']} -> {preprocessing['size_out']} in {preprocessing['ms']}ms"
+            )
+        except ImageRejectedError as rejected:
+            raise HTTPException(status_code=413, detail=str(rejected))
         except Exception as img_error:
             print(f"!!! Image processing warning: {img_error}")
             img_byte_arr = contents
+            preprocessing = {"bytes_in": len(contents), "bytes_out": len(contents), "reencoded": False, "error": str(img_error)}
+
+        # Near-duplicate of an earlier upload: reuse its analysis and flag the reuse
+        prompt = 'Describe this image in one short sentence. Is there damage?'
+        namespace = f"moondream:{prompt}"
+        image_hash = preprocessing.get("phash")
+        if image_hash:
+            match = photo_index.lookup(namespace, image_hash)
+            if match:
+                print(f"<-- Reused photo (distance {match['match_distance']}, seen {match['times_seen']}x)")
+                return {
+                    "analysis": match["analysis"],
+                    "status": "VERIFIED",
+                    "preprocessing": preprocessing,
+                    "reused_photo": True,
+                    "match_distance": match["match_distance"],
+                    "times_seen": match["times_seen"]
+                }
 
         encoded_image = base64.b64encode(img_byte_arr).decode('utf-8')
         
         print("--> Sending to Ollama (Moondream)...")
-        response = ollama.chat(model='moondream', messages=[
+        response = await llm_client.chat(model='moondream', messages=[
             {
                 'role': 'user',
-                'content': 'Describe this image in one short sentence. Is there damage?',
+                'content': prompt,
                 'images': [encoded_image]
             }
         ])
         
         analysis = response['message']['content']
         if not analysis: analysis = "No specific anomalies detected."
+        if image_hash:
+            photo_index.record(namespace, image_hash, analysis)
             
         print(f"<-- Analysis: {analysis}")
-        return {"analysis": analysis, "status": "VERIFIED"}
+        return {
+            "analysis": analysis,
+            "status": "VERIFIED",
+            "preprocessing": preprocessing,
+            "reused_photo": False,
+            "times_seen": 1
+        }
 
     except Exception as e:
         print(f"!!! Visual Agent Error: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+        raise _llm_error(e)
 
 # ==========================================
 # 2. IDENTITY AGENT (Llama 3)
@@ -80,11 +187,11 @@ async def visual_agent(file: UploadFile = File(...)):
 async def identity_agent(data: dict):
     try:
         print(f"--> Identity Request: {data}")
-        prompt = f"Generate a brief, secure system log confirming identity verification for this user. Use technical, cyber-security jargon. User data: {json.dumps(data)}"
-        response = ollama.chat(model='llama3', messages=[{'role': 'user', 'content': prompt}])
+        prompt = f"Generate a brief, secure system log confirming identity verification for this user. Use technical, cyber-security jargon. User data: {json.dumps(data, sort_keys=True)}"
+        response = await llm_client.chat(model='llama3', messages=[{'role': 'user', 'content': prompt}], cache=True)
         return {"log": response['message']['content']}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise _llm_error(e)
 
 # ==========================================
 # 3. RISK AGENT (Llama 3)
@@ -95,7 +202,7 @@ async def risk_agent(data: dict):
         print(f"--> Risk Request: {data}")
         prompt = f"""You are an expert Risk Assessment AI. Analyze the following telemetry data for security risks.
 
-Telemetry Data: {json.dumps(data)}
+Telemetry Data: {json.dumps(data, sort_keys=True)}
 
 Provide a risk assessment and determine if the system is safe or suspicious.
 
@@ -103,7 +210,7 @@ Output your response in this format:
 FLAG: [safe/suspicious]
 ANALYSIS: [your detailed risk assessment]
 RISK_SCORE: [numerical score 0-100]"""
-        response = ollama.chat(model='llama3', messages=[{'role': 'user', 'content': prompt}])
+        response = await llm_client.chat(model='llama3', messages=[{'role': 'user', 'content': prompt}], cache=True)
         content = response['message']['content']
         # Parse flag, analysis, risk_score
         lines = content.split('\n')
@@ -123,7 +230,7 @@ RISK_SCORE: [numerical score 0-100]"""
         return {"analysis": analysis, "risk_score": risk_score, "flag": flag}
     except Exception as e:
         print(f"!!! Error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+        raise _llm_error(e)
 
 # ==========================================
 # 4. LOGIGUARD (COURIER) AGENT (Llama 3)
@@ -143,7 +250,7 @@ async def courier_agent(data: dict):
         STRATEGY: [Your detailed mitigation strategy here]
         """
         
-        response = ollama.chat(model='llama3', messages=[{'role': 'user', 'content': prompt}])
+        response = await llm_client.chat(model='llama3', messages=[{'role': 'user', 'content': prompt}], cache=True)
         content = response['message']['content']
         
         # Robust Parsing using Regex
@@ -156,7 +263,7 @@ async def courier_agent(data: dict):
         return {"status": status, "strategy": strategy}
     except Exception as e:
         print(f"!!! Courier Error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+        raise _llm_error(e)
 
 # ==========================================
 # 5. PROVENANCE AGENT (Llama 3)
@@ -164,11 +271,11 @@ async def courier_agent(data: dict):
 @app.post("/api/provenance_agent")
 async def provenance_agent(data: dict):
     try:
-        prompt = f"Verify the custody chain for this item. Respond with 'CHAIN_VERIFIED' or 'CHAIN_BROKEN' and a short reason. Data: {json.dumps(data)}"
-        response = ollama.chat(model='llama3', messages=[{'role': 'user', 'content': prompt}])
+        prompt = f"Verify the custody chain for this item. Respond with 'CHAIN_VERIFIED' or 'CHAIN_BROKEN' and a short reason. Data: {json.dumps(data, sort_keys=True)}"
+        response = await llm_client.chat(model='llama3', messages=[{'role': 'user', 'content': prompt}], cache=True)
         return {"verification": response['message']['content']}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise _llm_error(e)
 
 # ==========================================
 # 6. ANOMALY AGENT (Llama 3)
@@ -193,10 +300,12 @@ async def anomaly_agent(data: dict):
         }}
         """
         
-        response = ollama.chat(model='llama3', format='json', messages=[{'role': 'user', 'content': prompt}])
+        response = await llm_client.chat(model='llama3', format='json', messages=[{'role': 'user', 'content': prompt}])
         content = json.loads(response['message']['content'])
         
         return content
+    except QueueFullError as e:
+        raise _llm_error(e)
     except Exception as e:
         print(f"!!! Error: {e}")
         return {
@@ -215,37 +324,271 @@ async def anomaly_agent(data: dict):
 @app.post("/api/council_agent")
 async def council_agent(data: dict):
     try:
-        prompt = f"Review reports. Verdict: 'APPROVED' or 'REJECTED' with reason. Reports: {json.dumps(data)}"
-        response = ollama.chat(model='llama3', messages=[{'role': 'user', 'content': prompt}])
+        prompt = f"Review reports. Verdict: 'APPROVED' or 'REJECTED' with reason. Reports: {json.dumps(data, sort_keys=True)}"
+        response = await llm_client.chat(model='llama3', messages=[{'role': 'user', 'content': prompt}], cache=True)
         return {"verdict": response['message']['content']}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise _llm_error(e)
 
 # ==========================================
 # 8. COUNCIL CHAT (Interactive Endpoint)
 # ==========================================
-@app.post("/api/council/chat")
-async def council_chat(data: dict):
-    try:
-        print(f"--> Council Chat Message: {data}")
-        user_message = data.get("message", "")
-        
-        system_context = """
+COUNCIL_SYSTEM_CONTEXT = """
         You are the 'Council Supervisor' for the LogiGuard Supply Chain System.
         Your role is to oversee the following agents: Scan, LogiGuard, Identity, Anomaly.
         You speak with authority, precision, and technical depth.
         Keep responses concise and professional (Cyberpunk/Military style).
         """
+COUNCIL_OFFLINE_RESPONSE = "COUNCIL_UPLINK_OFFLINE. Manual override required."
 
-        response = ollama.chat(model='llama3', messages=[
-            {'role': 'system', 'content': system_context},
+@app.post("/api/council/chat")
+async def council_chat(data: dict):
+    try:
+        print(f"--> Council Chat Message: {data}")
+        user_message = data.get("message", "")
+
+        response = await llm_client.chat(model='llama3', messages=[
+            {'role': 'system', 'content': COUNCIL_SYSTEM_CONTEXT},
             {'role': 'user', 'content': user_message}
-        ])
+        ], priority=Priority.INTERACTIVE)
         
         return {"response": response['message']['content']}
+    except QueueFullError as e:
+        raise _llm_error(e)
     except Exception as e:
         print(f"!!! Council Chat Error: {e}")
-        return {"response": "COUNCIL_UPLINK_OFFLINE. Manual override required."}
+        return {"response": COUNCIL_OFFLINE_RESPONSE}
+
+@app.post("/api/council/chat/stream")
+async def council_chat_stream(data: dict, structured: bool = False):
+    """
+    Streaming variant of /api/council/chat (Server-Sent Events)
+
+    Emits one `data: {"token": ...}` event per generated token, then a final
+    `event: done` whose data is the same {"response": ...} body the
+    non-streaming endpoint returns; with structured=true, a ChatResponse
+    whose session_data has the model, the generation statistics and
+    whether the offline reply was used. When the model's queue is full the
+    only event is `event: error` with status 429 and retry_after, the
+    non-streaming endpoint's 429.
+    """
+    print(f"--> Council Chat Stream: {data}")
+    messages = [
+        {'role': 'system', 'content': COUNCIL_SYSTEM_CONTEXT},
+        {'role': 'user', 'content': data.get("message", "")}
+    ]
+
+    async def events():
+        tokens = []
+        session_data = {"model": "llama3", "offline": False}
+        try:
+            async for chunk in llm_client.chat_stream(model='llama3', messages=messages):
+                token = chunk.get('message', {}).get('content', '')
+                if token:
+                    tokens.append(token)
+                    yield sse_event({"token": token})
+                if chunk.get('done'):
+                    session_data.update(
+                        (key, value) for key, value in chunk.items() if key.endswith(("_count", "_duration"))
+                    )
+        except QueueFullError as e:
+            print(f"!!! Council Chat Stream Busy: {e}")
+            yield sse_event({"status": 429, "detail": str(e), "retry_after": e.retry_after}, event="error")
+            return
+        except Exception as e:
+            print(f"!!! Council Chat Stream Error: {e}")
+            if not tokens:
+                session_data["offline"] = True
+                tokens.append(COUNCIL_OFFLINE_RESPONSE)
+                yield sse_event({"token": COUNCIL_OFFLINE_RESPONSE})
+        if structured:
+            done = ChatResponse(response="".join(tokens), session_data=session_data).model_dump()
+        else:
+            done = {"response": "".join(tokens)}
+        yield sse_event(done, event="done")
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=STREAM_HEADERS)
+
+# ==========================================
+# 9. MASTER SCAN PIPELINE (Concurrent Agents)
+# ==========================================
+@app.post("/api/scan", response_model=AuditResponse)
+async def scan(request: ScanRequest, trace: bool = False, db: Session = Depends(get_db)):
+    try:
+        print(f"--> Scan Request: {request.part_id or request.scan_type.value} @ {request.location}")
+        result = await scan_pipeline.run(db, request, trace=trace)
+        print(
+            f"<-- Scan {result.scan_id}: {result.verdict.verdict.value} "
+            f"({result.risk_score.risk_level.value}) in {result.processing_time_ms}ms"
+        )
+        return result
+    except Exception as e:
+        print(f"!!! Scan Pipeline Error: {str(e)}")
+        raise _llm_error(e)
+
+@app.post("/api/scan/batch")
+async def scan_batch(
+    batch: BatchScanRequest,
+    stream: bool = False,
+    council: bool = False,
+    concurrency: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Pallet scan: audit many items in one request
+
+    Returns a compact per-item array sorted by input index, or with
+    stream=true one NDJSON line per item as soon as it finishes.
+    """
+    if not batch.scans:
+        raise HTTPException(status_code=400, detail="Empty batch")
+    if len(batch.scans) > SCAN_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {SCAN_BATCH_MAX_ITEMS} items")
+
+    print(f"--> Batch Scan: {len(batch.scans)} items")
+    options = {"use_council": council}
+    if concurrency:
+        options["concurrency"] = max(1, concurrency)
+    results = scan_pipeline.run_batch(db, batch.scans, **options)
+
+    if stream:
+        async def lines():
+            async for index, result in results:
+                yield json.dumps(compact_result(index, result), default=str) + "\n"
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson", headers=STREAM_HEADERS)
+
+    start = time.perf_counter()
+    items = [compact_result(index, result) async for index, result in results]
+    items.sort(key=lambda item: item["index"])
+    verdicts = Counter(item.get("verdict", "ERROR") for item in items)
+    print(f"<-- Batch Scan: {len(items)} items in {time.perf_counter() - start:.2f}s {dict(verdicts)}")
+    return {
+        "count": len(items),
+        "summary": dict(verdicts),
+        "processing_time_ms": round((time.perf_counter() - start) * 1000, 2),
+        "results": items
+    }
+
+@app.post("/api/scan/stream")
+async def scan_stream(
+    request: Request,
+    ordered: bool = False,
+    council: bool = False,
+    max_in_flight: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Scanner-gate feed: NDJSON ScanRequests in, NDJSON verdicts out
+
+    The body is read line by line while verdicts are written back, so a
+    gate can keep one connection open indefinitely. Each output line
+    carries the input line's index; ordered=true keeps input order.
+    """
+    async def scans():
+        try:
+            async for line in ndjson_lines(request.stream(), SCAN_STREAM_MAX_LINE_BYTES):
+                try:
+                    yield ScanRequest.model_validate_json(line)
+                except ValidationError as e:
+                    yield ValueError(f"Invalid ScanRequest: {e.errors(include_url=False)}")
+        except ClientDisconnect:
+            # The gate hung up: finish (and record) the scans already read, then end
+            print("--> Scan Stream: client disconnected")
+
+    options = {"ordered": ordered, "use_council": council}
+    if max_in_flight:
+        options["max_in_flight"] = max(1, max_in_flight)
+
+    async def lines():
+        count = 0
+        try:
+            async for index, result in scan_pipeline.run_stream(db, scans(), **options):
+                count += 1
+                yield json.dumps(compact_result(index, result), default=str) + "\n"
+        except ValueError as e:
+            # Unreadable feed (e.g. oversized line): report it and end the stream
+            yield json.dumps({"error": str(e)}) + "\n"
+        print(f"<-- Scan Stream: {count} items")
+
+    print("--> Scan Stream: opened")
+    return DuplexStreamingResponse(lines(), media_type="application/x-ndjson", headers=STREAM_HEADERS)
+
+@app.post("/api/scan/jobs", status_code=202)
+async def submit_scan_job(request: ScanRequest, response: Response, callback_url: Optional[str] = None):
+    """
+    Queue a scan (typically a slow Path B visual audit) and return at once
+
+    Poll GET /api/scan/jobs/{job_id} (add ?wait=N to long-poll), or pass
+    callback_url to have the finished job POSTed to a local webhook.
+    """
+    try:
+        job = await job_queue.submit(request, callback_url)
+    except CallbackRejectedError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except JobQueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+    print(f"--> Scan Job queued: {job['job_id']}")
+    response.headers["Location"] = f"/api/scan/jobs/{job['job_id']}"
+    return job
+
+@app.get("/api/scan/jobs")
+def scan_job_stats():
+    return job_queue.stats()
+
+@app.get("/api/scan/jobs/{job_id}")
+async def get_scan_job(job_id: str, wait: float = 0):
+    job = await job_queue.wait(job_id, wait)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+# ==========================================
+# 10. LLM CACHE, COALESCING, QUEUE & GENERATION STATS
+# ==========================================
+@app.get("/api/llm/cache")
+def llm_cache_stats():
+    return {
+        **llm_cache.stats(),
+        "coalescing": llm_client.flights.stats(),
+        "photos": photo_index.stats()
+    }
+
+@app.get("/api/llm/queues")
+def llm_queue_stats():
+    return inference_scheduler.stats()
+
+@app.get("/api/llm/stats")
+def llm_generation_stats():
+    """Ollama token counts and durations per route and model, with prompt-size drift flags"""
+    return generation_stats.stats()
+
+# ==========================================
+# 11. PROMETHEUS METRICS
+# ==========================================
+@app.get("/metrics")
+def prometheus_metrics():
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+# ==========================================
+# 12. LEDGER ROW CACHE
+# ==========================================
+@app.get("/api/ledger/cache")
+def ledger_cache_stats():
+    return row_cache.stats()
+
+@app.delete("/api/ledger/cache")
+def invalidate_ledger_cache(part_id: Optional[str] = None, courier_id: Optional[str] = None):
+    """Drop cached ledger rows after an out-of-band change (no ids: the whole cache)"""
+    dropped = 0
+    if part_id:
+        dropped += row_cache.invalidate("part", part_id)
+    if courier_id:
+        dropped += row_cache.invalidate("courier", courier_id)
+    if not (part_id or courier_id):
+        dropped = row_cache.invalidate()
+    return {"invalidated": dropped}
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=5000)
\ No newline at end of file
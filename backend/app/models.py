@@ -52,6 +52,10 @@ class ScanRequest(BaseModel):
     image_path: Optional[str] = None
     user_description: Optional[str] = None
 
+class BatchScanRequest(BaseModel):
+    """Pallet / container scan: many items in one request"""
+    scans: List[ScanRequest]
+
 class VisualAuditRequest(BaseModel):
     """Request for visual-only audit when QR fails"""
     part_id: Optional[str] = None
@@ -137,7 +141,7 @@ class ProductInfo(BaseModel):
 
 class AuditResponse(BaseModel):
     """Complete audit result returned to frontend"""
-    scan_id: int
+    scan_id: Optional[int] = None  # None when the scan_history row could not be written
     part_id: str
     verdict: FinalVerdict
     risk_score: Any # Using Any to be flexible with simplified Risk Logic
@@ -145,6 +149,9 @@ class AuditResponse(BaseModel):
     product_info: Optional[ProductInfo] = None
     timestamp: datetime = Field(default_factory=datetime.now)
     processing_time_ms: float
+    skipped_agents: List[str] = []  # Cancelled by a short-circuit rule
+    short_circuit: Optional[Dict[str, Any]] = None
+    timing_breakdown: Optional[Dict[str, Any]] = None  # Per-stage spans (/api/scan?trace=true)
 
 # --- DATABASE MODELS (Reference) ---
 
@@ -206,6 +213,11 @@ class AnomalyLog(BaseModel):
     detected_at: datetime
     resolved: bool
 
+class ChatResponse(BaseModel):
+    """Council chat reply; session_data holds what the reply was generated from"""
+    response: str
+    session_data: Dict[str, Any] = Field(default_factory=dict)
+
 # --- UTILITY MODELS ---
 
 class HealthCheck(BaseModel):
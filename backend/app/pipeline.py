@@ -0,0 +1,779 @@
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Optional, Dict, Any, List, Tuple, Callable, Awaitable, AsyncIterator, Union
+from sqlalchemy.orm import Session
+
+from app.models import (
+    ScanRequest, AgentResult, RiskScore, RiskLevel, Verdict,
+    FinalVerdict, ProductInfo, AuditResponse
+)
+from app.agents.scan_agent import scan_agent
+from app.agents.identity_agent import identity_agent
+from app.agents.provenance_agent import provenance_agent
+from app.agents.anomaly_agent import anomaly_agent
+from app.agents.courier_agent import courier_agent
+from app.agents.marketplace_agent import marketplace_agent
+from app.agents.risk_agent import risk_agent
+from app.tools.db import (
+    DatabaseQueries, ScanHistoryWriter, load_batch_rows, memoized_row, prefetched_rows, read_bind, scan_rows
+)
+from app.tools.async_db import AsyncDatabaseQueries, async_database
+from app.tools.vision import vision_service
+from app.tools.tracing import start_trace, span, trace_exporter
+from app.tools import metrics
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURATION ---
+AGENT_TIMEOUT_SECONDS = float(os.getenv("AGENT_TIMEOUT_SECONDS", "5"))
+# Per-agent overrides, e.g. "visual=60,marketplace=3" (vision models are slow)
+AGENT_TIMEOUTS = os.getenv("AGENT_TIMEOUTS", "visual=60")
+COUNCIL_TIMEOUT_SECONDS = float(os.getenv("COUNCIL_TIMEOUT_SECONDS", "30"))
+# Ask the Council LLM for the final verdict (false = derive it from the risk score)
+SCAN_COUNCIL = os.getenv("SCAN_COUNCIL", "true").lower() == "true"
+# Pallet scans (/api/scan/batch)
+SCAN_BATCH_CONCURRENCY = int(os.getenv("SCAN_BATCH_CONCURRENCY", "64"))
+SCAN_BATCH_MAX_ITEMS = int(os.getenv("SCAN_BATCH_MAX_ITEMS", "10000"))
+# scan_history rows per commit during a batch (one fsync per chunk, not per item)
+SCAN_BATCH_COMMIT_EVERY = int(os.getenv("SCAN_BATCH_COMMIT_EVERY", "500"))
+# Scanner-gate feeds (/api/scan/stream): scans admitted but not yet written back
+SCAN_STREAM_MAX_IN_FLIGHT = int(os.getenv("SCAN_STREAM_MAX_IN_FLIGHT", "64"))
+SCAN_STREAM_MAX_LINE_BYTES = int(os.getenv("SCAN_STREAM_MAX_LINE_BYTES", "65536"))
+# ScanRequest.image_path is resolved under this directory; paths leading outside it are refused
+SCAN_IMAGE_DIR = os.path.realpath(
+    os.getenv("SCAN_IMAGE_DIR", "") or os.path.join(os.path.dirname(__file__), "data", "scan_images")
+)
+# Threads for blocking agent work (SQLAlchemy lookups); 0 runs those agents inline on the event loop
+AGENT_WORKERS = int(os.getenv("AGENT_WORKERS", str(min(32, (os.cpu_count() or 1) + 4))))
+# DB-bound agents await the async repository; false runs their sync checks as above
+ASYNC_AGENT_DB = os.getenv("ASYNC_AGENT_DB", "true").lower() == "true"
+# Stop the scan as soon as a decisive failure arrives (see SHORT_CIRCUIT_RULES)
+SCAN_SHORT_CIRCUIT = os.getenv("SCAN_SHORT_CIRCUIT", "true").lower() == "true"
+
+# Final verdict when the Council is disabled, unavailable or unparseable
+RISK_VERDICTS = {
+    RiskLevel.LOW: Verdict.AUTHENTIC,
+    RiskLevel.MEDIUM: Verdict.NEEDS_REVIEW,
+    RiskLevel.HIGH: Verdict.SUSPICIOUS,
+    RiskLevel.CRITICAL: Verdict.COUNTERFEIT,
+}
+
+# Demo catalog for the product card; unknown SKUs get a placeholder
+PRODUCT_CATALOG = {
+    "B08N5KWB9H": ProductInfo(
+        name="Sony Alpha 7 IV Camera",
+        image_url="https://m.media-amazon.com/images/I/71Tfu1NX2CL._AC_SL1500_.jpg",
+        description="Full-frame mirrorless camera, 33MP sensor, 4K video"
+    ),
+}
+UNKNOWN_PRODUCT = ProductInfo(
+    name="Unidentified SKU",
+    image_url="",
+    description="No catalog entry found for this part ID"
+)
+
+class ShortCircuitRule:
+    """A failed agent result that decides the scan on its own"""
+
+    def __init__(self, name: str, agent: str, error_contains: str):
+        self.name = name
+        self.agent = agent
+        self.error_contains = error_contains
+
+    def matches(self, result: AgentResult) -> bool:
+        return (
+            result.agent_name == self.agent
+            and not result.passed
+            and self.error_contains in str(result.details.get("error", ""))
+        )
+
+# A part missing from the ledger or a courier missing from the manifest is
+# CRITICAL regardless of what the remaining agents say
+SHORT_CIRCUIT_RULES = [
+    ShortCircuitRule("PART_NOT_FOUND", "Identity Agent", "Part not found"),
+    ShortCircuitRule("PART_NOT_FOUND", "Provenance Agent", "Part not found"),
+    ShortCircuitRule("UNKNOWN_COURIER", "Courier Agent", "not found in manifest"),
+]
+
+# Ledger row each DB-bound agent reads; a row wanted by several agents is
+# loaded once before they start, so concurrent agents don't each query it
+LEDGER_AGENTS = {"identity": "part", "provenance": "part", "courier": "courier"}
+
+# Factor taking each agent's confidence to 0-100: the ledger and marketplace
+# agents report 0-1, the vision model's report is already a percentage
+CONFIDENCE_SCALES = {"visual": 1}
+
+VISUAL_PROMPT = "Inspect this part for signs of counterfeiting, tampering or damage."
+
+AgentRunner = Callable[[Session, ScanRequest, Dict[str, Any]], Awaitable[AgentResult]]
+
+def _parse_timeouts(spec: str) -> Dict[str, float]:
+    timeouts = {}
+    for item in spec.split(","):
+        if "=" in item:
+            agent, seconds = item.split("=", 1)
+            timeouts[agent.strip()] = float(seconds)
+    return timeouts
+
+def _parse_json(raw: Any) -> Dict[str, Any]:
+    """LLM output arrives as a JSON string (format=json) or an already-parsed dict"""
+    if isinstance(raw, dict):
+        return raw
+    try:
+        parsed = json.loads(raw)
+        return parsed if isinstance(parsed, dict) else {}
+    except (TypeError, ValueError):
+        return {}
+
+def _scan_image(image_path: str) -> Optional[str]:
+    """image_path resolved (symlinks too) under SCAN_IMAGE_DIR, None if it leads outside it"""
+    path = os.path.realpath(os.path.join(SCAN_IMAGE_DIR, image_path))
+    try:
+        inside = os.path.commonpath([SCAN_IMAGE_DIR, path]) == SCAN_IMAGE_DIR
+    except ValueError:
+        # Another drive (Windows)
+        inside = False
+    return path if inside else None
+
+def _as_percent(name: str, result: AgentResult) -> AgentResult:
+    """Rescale agent name's confidence to the 0-100 RiskAgent thresholds expect"""
+    scale = CONFIDENCE_SCALES.get(name, 100)
+    if scale == 1:
+        return result
+    return result.model_copy(update={"confidence": round(result.confidence * scale, 2)})
+
+def _confirmed(history: ScanHistoryWriter, result: Union[AuditResponse, Exception]) -> Union[AuditResponse, Exception]:
+    """Keep a batch result's scan_id only if its scan_history row was committed"""
+    if isinstance(result, AuditResponse) and result.scan_id is not None:
+        scan_id = history.confirm(result.scan_id)
+        if scan_id is None:
+            logger.warning(f"Scan {result.part_id}: audit row not committed, returning scan_id=None")
+        result.scan_id = scan_id
+    return result
+
+class ScanPipeline:
+    """
+    Master pipeline behind POST /api/scan
+
+    1. ScanAgent picks the route (Path A digital / Path B visual) and the
+       agents to run.
+    2. Those agents run concurrently, each under its own timeout; a slow or
+       failing agent becomes a failed AgentResult instead of failing the
+       scan, so latency is bounded by the slowest agent (or its timeout).
+       Agents that read the database await the async repository, each
+       call with its own AsyncSession (or, with ASYNC_AGENT_DB off, run
+       their sync checks in a pool of AGENT_WORKERS threads), so a scan
+       never stalls the event loop for other requests.
+    3. RiskAgent aggregates the results.
+    4. The Council (reasoning LLM) synthesizes the final verdict, falling
+       back to a verdict derived from the risk level.
+
+    If a result matches one of the short-circuit rules, the agents still
+    running are cancelled, the Council is skipped and the scan is decided
+    as CRITICAL straight away. If the caller goes away (client
+    disconnect), cancelling run() cancels every agent still in flight.
+    """
+
+    def __init__(
+        self,
+        agent_timeout: float = AGENT_TIMEOUT_SECONDS,
+        agent_timeouts: Optional[Dict[str, float]] = None,
+        council_timeout: float = COUNCIL_TIMEOUT_SECONDS,
+        use_council: bool = SCAN_COUNCIL,
+        rules: Optional[List[ShortCircuitRule]] = None,
+        agent_workers: int = AGENT_WORKERS,
+        async_db: bool = ASYNC_AGENT_DB
+    ):
+        self.agent_timeout = agent_timeout
+        self.agent_timeouts = agent_timeouts if agent_timeouts is not None else _parse_timeouts(AGENT_TIMEOUTS)
+        self.council_timeout = council_timeout
+        self.use_council = use_council
+        self.rules = rules if rules is not None else (SHORT_CIRCUIT_RULES if SCAN_SHORT_CIRCUIT else [])
+        self.runners: Dict[str, AgentRunner] = {
+            "identity": self._run_identity,
+            "provenance": self._run_provenance,
+            "anomaly": self._run_anomaly,
+            "courier": self._run_courier,
+            "marketplace": self._run_marketplace,
+            "visual": self._run_visual,
+        }
+        self.agent_workers = agent_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.async_db = async_db
+
+    def shutdown(self) -> None:
+        """Stop the agent thread pool (called from the FastAPI lifespan)"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def _in_agent_pool(self, check: Callable[..., AgentResult], db: Session, *args) -> AgentResult:
+        """
+        Run a blocking agent check in the agent thread pool
+
+        Sessions are not thread-safe, so each call opens its own on the
+        request session's read pool (inline too: the request session may be
+        busy recording another scan of the batch in a worker thread). The
+        context is copied into the thread, keeping batch prefetches and
+        tracing spans visible. An agent that times out is abandoned, not
+        interrupted: its thread finishes the query in the background.
+        """
+        bind = read_bind(db)
+
+        def call() -> AgentResult:
+            session = Session(bind=bind)
+            try:
+                return check(session, *args)
+            finally:
+                session.close()
+
+        if self.agent_workers <= 0:
+            return call()
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.agent_workers, thread_name_prefix="agent")
+        context = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(self._executor, context.run, call)
+
+    async def _db_agent(
+        self,
+        check_async: Callable[..., Awaitable[AgentResult]],
+        check: Callable[..., AgentResult],
+        db: Session,
+        *args
+    ) -> AgentResult:
+        """Run a DB-bound agent on its own AsyncSession for db's database, or its sync check in the pool"""
+        if not self.async_db:
+            return await self._in_agent_pool(check, db, *args)
+        async with async_database.session(db) as session:
+            return await check_async(session, *args)
+
+    async def _load_shared_rows(
+        self,
+        db: Session,
+        request: ScanRequest,
+        route: Dict[str, Any],
+        agents: List[str]
+    ) -> None:
+        """
+        Read the ledger rows several routed agents need into the scan's memo
+
+        Rows already memoized (batch prefetch) or in the ledger cache cost
+        nothing; a slow or failing read is left to the agents themselves,
+        which then run under their own timeouts as usual.
+        """
+        kinds = [LEDGER_AGENTS[name] for name in agents if name in LEDGER_AGENTS]
+        keys = {"part": route.get("part_id"), "courier": request.courier_id}
+        wanted = [
+            kind for kind in dict.fromkeys(kinds)
+            if kinds.count(kind) > 1 and keys[kind] and not memoized_row(db, kind, keys[kind])[0]
+        ]
+        if not wanted:
+            return
+
+        async def load():
+            if not self.async_db:
+                getters = {"part": DatabaseQueries.get_part_by_id, "courier": DatabaseQueries.get_courier_by_id}
+                await self._in_agent_pool(
+                    lambda session: [getters[kind](session, keys[kind]) for kind in wanted], db
+                )
+                return
+            getters = {"part": AsyncDatabaseQueries.get_part_by_id, "courier": AsyncDatabaseQueries.get_courier_by_id}
+            async with async_database.session(db) as session:
+                for kind in wanted:
+                    await getters[kind](session, keys[kind])
+
+        try:
+            with span("ledger"):
+                await asyncio.wait_for(load(), self.agent_timeout)
+        except Exception as e:
+            logger.warning(f"Ledger preload failed: {e!r}")
+
+    async def run(
+        self,
+        db: Session,
+        request: ScanRequest,
+        use_council: Optional[bool] = None,
+        route: Optional[Dict[str, Any]] = None,
+        commit: bool = True,
+        trace: bool = False,
+        history: Optional[ScanHistoryWriter] = None
+    ) -> AuditResponse:
+        """
+        Run a full audit for one scan
+
+        Args:
+            db: Database session shared by the agents
+            request: Incoming scan request
+            use_council: Override the SCAN_COUNCIL default for this call
+            route: ScanAgent decision, if already computed (batch scans)
+            commit: Commit the scan_history row immediately
+            trace: Attach the per-stage timing breakdown to the response
+            history: Record through this batch writer instead (never commits;
+                the scan_id stays provisional until history confirms it)
+
+        Returns:
+            Complete audit result
+        """
+        if not (trace or trace_exporter.enabled):
+            return await self._audit(db, request, use_council, route, commit, history)
+
+        with start_trace("scan", courier_id=request.courier_id, scan_type=request.scan_type.value) as active:
+            result = await self._audit(db, request, use_council, route, commit, history)
+        active.root.attributes["part_id"] = result.part_id
+        if trace:
+            result.timing_breakdown = active.breakdown()
+        trace_exporter.submit(active)
+        return result
+
+    async def _audit(
+        self,
+        db: Session,
+        request: ScanRequest,
+        use_council: Optional[bool],
+        route: Optional[Dict[str, Any]],
+        commit: bool,
+        history: Optional[ScanHistoryWriter] = None
+    ) -> AuditResponse:
+        start = time.perf_counter()
+        if route is None:
+            with span("route"):
+                route = scan_agent.process(request)
+        part_id = route.get("part_id") or request.part_id or "UNKNOWN"
+        agents = [name for name in route.get("next_agents", []) if name in self.runners]
+        logger.info(f"Scan {part_id}: {route['route']} -> {agents}")
+
+        with scan_rows():
+            await self._load_shared_rows(db, request, route, agents)
+            agent_results, short_circuit = await self.run_agents(db, request, route, agents)
+        with span("risk"):
+            risk = self._score(route, agent_results)
+
+        council = self.use_council if use_council is None else use_council
+        verdict = None
+        # A short-circuited scan is already decided; don't wait on the LLM
+        if council and not short_circuit:
+            with span("council"):
+                verdict = await self._council_verdict(part_id, request, agent_results, risk)
+        if verdict is None:
+            verdict = self._risk_verdict(agent_results, risk)
+
+        with span("record"):
+            scan = {
+                "part_id": part_id,
+                "location": request.location,
+                "latitude": request.latitude,
+                "longitude": request.longitude,
+                "scan_type": request.scan_type.value,
+                "courier_id": request.courier_id,
+                "qr_valid": bool(route.get("qr_valid")),
+                "risk_level": risk.risk_level.value,
+                "verdict": verdict.verdict.value
+            }
+            # Off the event loop: the insert may wait up to the busy timeout for SQLite's writer lock
+            if history is not None:
+                scan_id = await asyncio.to_thread(history.add, scan)
+            else:
+                scan_id = await asyncio.to_thread(DatabaseQueries.record_scan, db, scan, commit)
+            if scan_id is None:
+                # Never make an id up: it could collide with a real scan_history row
+                logger.warning(f"Scan {part_id}: audit row not recorded, returning scan_id=None")
+
+        metrics.observe_scan(risk.risk_level.value, verdict.verdict.value)
+        return AuditResponse(
+            scan_id=scan_id,
+            part_id=part_id,
+            verdict=verdict,
+            risk_score=risk,
+            agent_results=agent_results,
+            product_info=PRODUCT_CATALOG.get(part_id, UNKNOWN_PRODUCT),
+            skipped_agents=short_circuit["skipped"] if short_circuit else [],
+            short_circuit=short_circuit,
+            processing_time_ms=round((time.perf_counter() - start) * 1000, 2)
+        )
+
+    async def run_batch(
+        self,
+        db: Session,
+        requests: List[ScanRequest],
+        concurrency: int = SCAN_BATCH_CONCURRENCY,
+        use_council: bool = False
+    ) -> AsyncIterator[Tuple[int, Union[AuditResponse, Exception]]]:
+        """
+        Audit a pallet of scans with bounded concurrency
+
+        QR payloads are validated in one pass, parts and couriers for the
+        whole batch are loaded with bulk IN queries, then `concurrency`
+        workers run the per-item pipelines. The Council is off by default:
+        a pallet's worth of LLM verdicts would dominate the batch. Results
+        are written through a ScanHistoryWriter (one COPY per commit chunk
+        on PostgreSQL). The bulk loads, inserts and commits run in worker
+        threads, so a locked ledger never stalls the event loop.
+
+        Yields:
+            (index into requests, AuditResponse or the exception it raised)
+            in completion order
+        """
+        routes = scan_agent.process_batch(requests)
+        part_ids = {route.get("part_id") for route in routes if route.get("part_id")}
+        courier_ids = {request.courier_id for request in requests}
+        items = iter(enumerate(zip(requests, routes)))
+        finished: asyncio.Queue = asyncio.Queue()
+        history = ScanHistoryWriter(db)
+
+        async def worker():
+            # Workers share one iterator, so each item is taken exactly once
+            for index, (request, route) in items:
+                try:
+                    result = await self.run(db, request, use_council=use_council, route=route, history=history)
+                except Exception as e:
+                    result = e
+                await finished.put((index, result))
+
+        rows = await asyncio.to_thread(load_batch_rows, db, part_ids, courier_ids)
+        with prefetched_rows(db, rows=rows):
+            # Tasks copy the context here, so they keep the prefetched rows
+            workers = [asyncio.create_task(worker()) for _ in range(min(concurrency, len(requests)))]
+        try:
+            ready = []
+            for _ in range(len(requests)):
+                ready.append(await finished.get())
+                # Commit in chunks, and whenever no other result is waiting;
+                # a result goes out only once the commit holding its row is done
+                if len(ready) >= SCAN_BATCH_COMMIT_EVERY or finished.empty():
+                    await asyncio.to_thread(history.commit)
+                    for index, result in ready:
+                        yield index, _confirmed(history, result)
+                    ready = []
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.to_thread(history.commit)
+
+    async def run_stream(
+        self,
+        db: Session,
+        requests: AsyncIterator[Union[ScanRequest, Exception]],
+        max_in_flight: int = SCAN_STREAM_MAX_IN_FLIGHT,
+        ordered: bool = False,
+        use_council: bool = False
+    ) -> AsyncIterator[Tuple[int, Union[AuditResponse, Exception]]]:
+        """
+        Audit an open-ended feed of scans as they arrive
+
+        A scan holds one of `max_in_flight` slots from the moment it is read
+        until its result has been yielded, so a slow consumer or a slow scan
+        stops the feed from being read further and memory stays flat however
+        long the stream runs. Items that failed to parse arrive as exceptions
+        and are passed through as that item's result.
+
+        Args:
+            db: Database session shared by the agents
+            requests: Parsed scans (or parse errors) in arrival order
+            max_in_flight: Scans admitted but not yet yielded
+            ordered: Yield in arrival order instead of completion order
+            use_council: Ask the Council LLM for each verdict
+
+        Yields:
+            (arrival index, AuditResponse or the exception it raised)
+
+        Raises:
+            Whatever the feed itself raised, after every admitted scan is out
+        """
+        slots = asyncio.Semaphore(max_in_flight)
+        finished: asyncio.Queue = asyncio.Queue()
+        tasks = set()
+        total = None
+        history = ScanHistoryWriter(db)
+
+        async def audit(index: int, request: Union[ScanRequest, Exception]):
+            result = request
+            if isinstance(request, ScanRequest):
+                try:
+                    result = await self.run(db, request, use_council=use_council, history=history)
+                except Exception as e:
+                    result = e
+            await finished.put((index, result))
+
+        async def feed():
+            nonlocal total
+            count = 0
+            try:
+                async for request in requests:
+                    await slots.acquire()
+                    task = asyncio.create_task(audit(count, request))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                    count += 1
+            finally:
+                total = count
+                await finished.put(None)
+
+        feeder = asyncio.create_task(feed())
+        held: Dict[int, Union[AuditResponse, Exception]] = {}
+        ready: List[Tuple[int, Union[AuditResponse, Exception]]] = []
+        emitted = 0
+        try:
+            while total is None or emitted < total:
+                item = await finished.get()
+                if item is not None:
+                    held[item[0]] = item[1]
+                    if ordered:
+                        while emitted + len(ready) in held:
+                            ready.append((emitted + len(ready), held.pop(emitted + len(ready))))
+                    else:
+                        ready.extend((index, held.pop(index)) for index in sorted(held))
+                # Commit in chunks, and whenever the feed goes quiet; a result
+                # goes out only once the commit holding its row is done
+                if ready and (len(ready) >= SCAN_BATCH_COMMIT_EVERY or finished.empty()):
+                    await asyncio.to_thread(history.commit)
+                    for index, result in ready:
+                        yield index, _confirmed(history, result)
+                        emitted += 1
+                        slots.release()
+                    ready = []
+            await feeder
+        finally:
+            feeder.cancel()
+            for task in list(tasks):
+                task.cancel()
+            await asyncio.to_thread(history.commit)
+
+    async def run_agents(
+        self,
+        db: Session,
+        request: ScanRequest,
+        route: Dict[str, Any],
+        agents: List[str]
+    ) -> Tuple[Dict[str, AgentResult], Optional[Dict[str, Any]]]:
+        """
+        Fan out to the routed agents and collect their results
+
+        Returns:
+            Tuple of (results keyed by agent_name, the keys RiskAgent weights
+            by; short-circuit info with the skipped agents, or None)
+        """
+        pending = {
+            asyncio.create_task(self._run_one(name, db, request, route), name=name)
+            for name in agents
+        }
+        results: Dict[str, AgentResult] = {}
+        short_circuit = None
+        try:
+            while pending and short_circuit is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    result = task.result()
+                    rule = next((r for r in self.rules if r.matches(result)), None)
+                    if rule and short_circuit is None:
+                        # Flag it so RiskAgent applies its critical-failure path
+                        result = result.model_copy(update={"details": {**result.details, "critical": True}})
+                        short_circuit = {
+                            "rule": rule.name,
+                            "agent": result.agent_name,
+                            "reason": result.details.get("error"),
+                            "skipped": sorted(f"{t.get_name().title()} Agent" for t in pending)
+                        }
+                    results[result.agent_name] = result
+
+            if short_circuit:
+                logger.info(f"Short-circuit {short_circuit['rule']}: skipping {short_circuit['skipped']}")
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+                pending = set()
+        finally:
+            # Only non-empty if we were cancelled mid-scan
+            for task in pending:
+                task.cancel()
+        return results, short_circuit
+
+    async def _run_one(self, name: str, db: Session, request: ScanRequest, route: Dict[str, Any]) -> AgentResult:
+        """Run one agent under its timeout; errors become a failed result"""
+        timeout = self.agent_timeouts.get(name, self.agent_timeout)
+        agent_start = time.perf_counter()
+        try:
+            with span(f"agent.{name}"):
+                result = await asyncio.wait_for(self.runners[name](db, request, route), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"{name} agent timed out after {timeout}s")
+            metrics.observe_agent(name, "timeout")
+            return AgentResult(
+                agent_name=f"{name.title()} Agent",
+                passed=False,
+                confidence=0.0,
+                details={"error": f"Timed out after {timeout}s", "timed_out": True}
+            )
+        except Exception as e:
+            logger.error(f"{name} agent failed: {e}")
+            metrics.observe_agent(name, "error")
+            return AgentResult(
+                agent_name=f"{name.title()} Agent",
+                passed=False,
+                confidence=0.0,
+                details={"error": str(e) or e.__class__.__name__}
+            )
+        logger.info(f"{name} agent finished in {(time.perf_counter() - agent_start) * 1000:.1f}ms")
+        metrics.observe_agent(name, "pass" if result.passed else "fail")
+        return _as_percent(name, result)
+
+    # --- Agent adapters (normalize each agent's call signature) ---
+
+    async def _run_identity(self, db: Session, request: ScanRequest, route: Dict[str, Any]) -> AgentResult:
+        return await self._db_agent(
+            identity_agent.check_async, identity_agent.check, db,
+            route["part_id"], route.get("serial_hash", ""), route.get("oem_signature", "")
+        )
+
+    async def _run_provenance(self, db: Session, request: ScanRequest, route: Dict[str, Any]) -> AgentResult:
+        return await self._db_agent(
+            provenance_agent.check_async, provenance_agent.verify, db, route["part_id"], request.location
+        )
+
+    async def _run_anomaly(self, db: Session, request: ScanRequest, route: Dict[str, Any]) -> AgentResult:
+        return await self._db_agent(
+            anomaly_agent.check_async, anomaly_agent.check, db,
+            route["part_id"], request.location, request.latitude, request.longitude, datetime.now()
+        )
+
+    async def _run_courier(self, db: Session, request: ScanRequest, route: Dict[str, Any]) -> AgentResult:
+        return await self._db_agent(
+            courier_agent.check_async, courier_agent.verify, db, request.courier_id, request.location
+        )
+
+    async def _run_marketplace(self, db: Session, request: ScanRequest, route: Dict[str, Any]) -> AgentResult:
+        result = await marketplace_agent.verify_product(
+            route["part_id"], "OEM", route.get("serial_hash", "")
+        )
+        return AgentResult(**result)
+
+    async def _run_visual(self, db: Session, request: ScanRequest, route: Dict[str, Any]) -> AgentResult:
+        if request.image_path:
+            image_path = _scan_image(request.image_path)
+            if image_path is None:
+                return AgentResult(
+                    agent_name="Visual Agent",
+                    passed=False,
+                    confidence=0.0,
+                    details={"error": "image_path is outside the scan image directory"}
+                )
+            analysis = await vision_service.analyze_image(image_path, VISUAL_PROMPT)
+            report = _parse_json(analysis.get("analysis"))
+        elif request.user_description:
+            analysis = await vision_service.compare_visual_description(request.user_description, {})
+            report = _parse_json(analysis.get("comparison"))
+        else:
+            return AgentResult(
+                agent_name="Visual Agent",
+                passed=False,
+                confidence=0.0,
+                details={"error": "Visual audit requires either image or description"}
+            )
+
+        if not analysis.get("success"):
+            return AgentResult(
+                agent_name="Visual Agent",
+                passed=False,
+                confidence=0.0,
+                details={"error": analysis.get("error", "Visual analysis failed")}
+            )
+
+        verdict = str(report.get("verdict", "")).upper()
+        try:
+            confidence = min(100.0, max(0.0, float(report.get("confidence", 0))))
+        except (TypeError, ValueError):
+            confidence = 0.0
+        return AgentResult(
+            agent_name="Visual Agent",
+            passed=verdict == Verdict.AUTHENTIC.value,
+            confidence=confidence,
+            details={"verdict": verdict or "UNKNOWN", "report": report, "reused_photo": analysis.get("reused_photo", False)}
+        )
+
+    # --- Aggregation ---
+
+    def _score(self, route: Dict[str, Any], agent_results: Dict[str, AgentResult]) -> RiskScore:
+        visual = agent_results.get("Visual Agent")
+        courier = agent_results.get("Courier Agent")
+        if route["route"] == "PATH_B_VISUAL" and visual and courier:
+            return risk_agent.calculate_visual_only_risk(visual, courier)
+        return risk_agent.calculate_risk(agent_results)
+
+    async def _council_verdict(
+        self,
+        part_id: str,
+        request: ScanRequest,
+        agent_results: Dict[str, AgentResult],
+        risk: RiskScore
+    ) -> Optional[FinalVerdict]:
+        """Ask the Council LLM for the final verdict; None means use the risk-derived one"""
+        reports = {
+            name.lower().replace(" agent", "").strip(): result.model_dump(mode="json")
+            for name, result in agent_results.items()
+        }
+        context = {"part_id": part_id, "location": request.location, "courier_id": request.courier_id}
+        try:
+            council = await asyncio.wait_for(
+                vision_service.synthesize_verdict(reports, context), self.council_timeout
+            )
+        except asyncio.TimeoutError:
+            logger.warning(f"Council timed out after {self.council_timeout}s")
+            return None
+
+        # The canned demo verdict ignores the agents; the risk score is more faithful
+        if not council.get("success") or council.get("model") == "mock-fallback":
+            return None
+
+        ruling = _parse_json(council.get("verdict"))
+        try:
+            return FinalVerdict(
+                verdict=Verdict(str(ruling.get("verdict", "")).upper()),
+                confidence=min(100.0, max(0.0, float(ruling.get("confidence", risk.overall_score)))),
+                risk_level=RiskLevel(str(ruling.get("risk_level", risk.risk_level.value)).upper()),
+                reasoning=str(ruling.get("reasoning", "")),
+                critical_findings=[str(f) for f in ruling.get("critical_findings", [])],
+                recommended_action=str(ruling.get("recommended_action", "")),
+                agent_scores=agent_results
+            )
+        except (ValueError, TypeError) as e:
+            logger.warning(f"Unusable Council verdict ({e}); using risk score")
+            return None
+
+    def _risk_verdict(self, agent_results: Dict[str, AgentResult], risk: RiskScore) -> FinalVerdict:
+        findings = [
+            f"{name}: {result.details.get('error', 'check failed')}"
+            for name, result in agent_results.items() if not result.passed
+        ]
+        return FinalVerdict(
+            verdict=RISK_VERDICTS[risk.risk_level],
+            confidence=risk.overall_score,
+            risk_level=risk.risk_level,
+            reasoning=f"Risk score {risk.overall_score}/100 from {len(agent_results)} agents.",
+            critical_findings=findings,
+            recommended_action=risk_agent._recommend_action(risk.risk_level),
+            agent_scores=agent_results
+        )
+
+def compact_result(index: int, result: Union[AuditResponse, Exception]) -> Dict[str, Any]:
+    """One line per pallet item: verdict, score and what failed"""
+    if isinstance(result, Exception):
+        return {"index": index, "error": str(result) or result.__class__.__name__}
+    return {
+        "index": index,
+        "scan_id": result.scan_id,
+        "part_id": result.part_id,
+        "verdict": result.verdict.verdict.value,
+        "risk_level": result.risk_score.risk_level.value,
+        "score": result.risk_score.overall_score,
+        "failed_agents": sorted(name for name, r in result.agent_results.items() if not r.passed),
+        "short_circuit": result.short_circuit["rule"] if result.short_circuit else None,
+        "ms": result.processing_time_ms
+    }
+
+# Singleton instance
+scan_pipeline = ScanPipeline()
@@ -0,0 +1,174 @@
+import os
+from contextlib import asynccontextmanager
+from typing import Optional, Dict, Any, Iterable, AsyncIterator, Union, NamedTuple, Type
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.elements import TextClause
+from app.tools.db import (
+    DatabaseQueries, RoutingSession, PartRow, CourierRow, SQLALCHEMY_DATABASE_URL, PART_BY_ID, COURIER_BY_ID,
+    PARTS_BY_IDS, COURIERS_BY_IDS, BULK_CHUNK_SIZE, SQLITE_BUSY_TIMEOUT_MS, DB_READ_POOL_SIZE,
+    DB_READ_MAX_OVERFLOW, DB_WRITE_POOL_SIZE, DB_WRITE_MAX_OVERFLOW, DB_POOL_TIMEOUT, apply_pragmas,
+    sqlite_pragmas, memoized_row, read_bind, remember_row
+)
+
+# --- CONFIGURATION ---
+# Async driver used for each sync database backend
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+# Database the repository opens at start-up (defaults to the sync engine's)
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", "")
+
+def async_url(url: Union[str, URL]) -> URL:
+    """The async-driver form of a database URL (sqlite:// -> sqlite+aiosqlite://)"""
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for '{backend}' databases")
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+class AsyncDatabase:
+    """
+    Async engines for the repository, one set per database
+
+    Sessions are opened for the same database as a sync Session (the
+    request's, or a test's temporary ledger), so both layers always agree
+    on where the data lives. SQLite gets the same PRAGMAs and read/write
+    pool split as the sync engines; other backends use one pooled engine.
+    Engines are created on first use and disposed by close() (FastAPI
+    lifespan shutdown).
+    """
+
+    def __init__(self):
+        self._engines: Dict[str, list] = {}
+        self._sessions: Dict[str, async_sessionmaker] = {}
+
+    def _sessionmaker(self, url: Union[str, URL]) -> async_sessionmaker:
+        url = async_url(url)
+        key = url.render_as_string(hide_password=False)
+        if key in self._sessions:
+            return self._sessions[key]
+
+        if url.get_backend_name() == "sqlite":
+            writer = self._sqlite_engine(url, False, DB_WRITE_POOL_SIZE, DB_WRITE_MAX_OVERFLOW)
+            reader = self._sqlite_engine(url, True, DB_READ_POOL_SIZE, DB_READ_MAX_OVERFLOW)
+            self._engines[key] = [writer, reader]
+            maker = async_sessionmaker(
+                sync_session_class=RoutingSession, writer=writer.sync_engine, reader=reader.sync_engine,
+                expire_on_commit=False
+            )
+        else:
+            engine = create_async_engine(
+                url, pool_size=DB_READ_POOL_SIZE, max_overflow=DB_READ_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT
+            )
+            self._engines[key] = [engine]
+            maker = async_sessionmaker(bind=engine, expire_on_commit=False)
+
+        self._sessions[key] = maker
+        return maker
+
+    @staticmethod
+    def _sqlite_engine(url: URL, readonly: bool, pool_size: int, max_overflow: int) -> AsyncEngine:
+        engine = create_async_engine(
+            url,
+            connect_args={"timeout": SQLITE_BUSY_TIMEOUT_MS / 1000},
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=DB_POOL_TIMEOUT
+        )
+        apply_pragmas(engine.sync_engine, sqlite_pragmas(readonly))
+        return engine
+
+    @asynccontextmanager
+    async def session(self, db: Optional[Session] = None) -> AsyncIterator[AsyncSession]:
+        """
+        An AsyncSession on db's database (the configured one without db)
+
+        Like Session, an AsyncSession must not be shared by concurrent
+        tasks: open one per agent call.
+        """
+        url = read_bind(db).url if db is not None else (ASYNC_DATABASE_URL or SQLALCHEMY_DATABASE_URL)
+        async with self._sessionmaker(url)() as session:
+            yield session
+
+    async def start(self) -> None:
+        """Create the configured database's engines (FastAPI lifespan startup)"""
+        self._sessionmaker(ASYNC_DATABASE_URL or SQLALCHEMY_DATABASE_URL)
+
+    async def close(self) -> None:
+        """Dispose every pooled connection (FastAPI lifespan shutdown)"""
+        engines = [engine for group in self._engines.values() for engine in group]
+        self._engines.clear()
+        self._sessions.clear()
+        for engine in engines:
+            await engine.dispose()
+
+class AsyncDatabaseQueries:
+    """
+    Awaitable versions of the DatabaseQueries ledger lookups
+
+    Same SQL, row objects, per-scan memo and ledger cache as the sync
+    methods, so an agent returns the same result whichever layer it reads
+    through.
+    """
+
+    @staticmethod
+    async def get_part_by_id(db: AsyncSession, part_id: str) -> Optional[PartRow]:
+        hit, row = memoized_row(db, "part", part_id)
+        if hit:
+            return row
+        try:
+            result = (await db.execute(PART_BY_ID, {"part_id": part_id})).fetchone()
+            row = DatabaseQueries._row_to_obj(result, PartRow)
+            remember_row(db, "part", part_id, row)
+            return row
+        except Exception as e:
+            print(f"⚠️ DB Read Error (Part): {e}")
+            return None
+
+    @staticmethod
+    async def get_recent_scans(db: AsyncSession, part_id: str, limit: int = 10):
+        # Mirrors the sync stub until scan_history lookups are wired in
+        return []
+
+    @staticmethod
+    async def get_courier_by_id(db: AsyncSession, courier_id: str) -> Optional[CourierRow]:
+        hit, row = memoized_row(db, "courier", courier_id)
+        if hit:
+            return row
+        try:
+            result = (await db.execute(COURIER_BY_ID, {"cid": courier_id})).fetchone()
+            row = DatabaseQueries._row_to_obj(result, CourierRow)
+            remember_row(db, "courier", courier_id, row)
+            return row
+        except Exception as e:
+            print(f"⚠️ DB Read Error (Courier): {e}")
+            return None
+
+    @staticmethod
+    async def _get_many(db: AsyncSession, query: TextClause, record: Type[NamedTuple], column: str,
+                        ids: Iterable[str]) -> Optional[Dict[str, Any]]:
+        ids = list(dict.fromkeys(i for i in ids if i))
+        rows = {}
+        position = record._fields.index(column)
+        try:
+            for start in range(0, len(ids), BULK_CHUNK_SIZE):
+                for row in await db.execute(query, {"ids": ids[start:start + BULK_CHUNK_SIZE]}):
+                    rows[row[position]] = record._make(row)
+        except Exception as e:
+            print(f"⚠️ DB Bulk Read Error ({record.__name__}): {e}")
+            return None
+        return rows
+
+    @staticmethod
+    async def get_parts_by_ids(db: AsyncSession, part_ids: Iterable[str]) -> Optional[Dict[str, PartRow]]:
+        return await AsyncDatabaseQueries._get_many(db, PARTS_BY_IDS, PartRow, "part_id", part_ids)
+
+    @staticmethod
+    async def get_couriers_by_ids(db: AsyncSession, courier_ids: Iterable[str]) -> Optional[Dict[str, CourierRow]]:
+        return await AsyncDatabaseQueries._get_many(db, COURIERS_BY_IDS, CourierRow, "courier_id", courier_ids)
+
+    # Alias for safety
+    get_courier = get_courier_by_id
+
+# Singleton instance
+async_database = AsyncDatabase()
@@ -0,0 +1,215 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any
+
+# --- CONFIGURATION ---
+LLM_CACHE_BACKEND = os.getenv("LLM_CACHE_BACKEND", "memory")  # "memory" or "disk"
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1024"))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "600"))
+LLM_CACHE_PATH = os.getenv(
+    "LLM_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "llm_cache.db")
+)
+
+def normalize_prompt(text: str) -> str:
+    """Collapse whitespace so indentation-only prompt differences share a key"""
+    return " ".join(text.split())
+
+def make_cache_key(path: str, payload: Dict[str, Any]) -> str:
+    """
+    Build a content-addressed key for an Ollama request
+
+    The key covers the endpoint, model, normalized prompt/messages, images,
+    output format and generation options; anything else (stream flags,
+    keep-alive) does not change the answer and is ignored.
+
+    Args:
+        path: Ollama API path (/api/chat or /api/generate)
+        payload: The request body
+
+    Returns:
+        SHA-256 hex digest
+    """
+    normalized = {
+        "path": path,
+        "model": payload.get("model"),
+        "format": payload.get("format"),
+        "options": payload.get("options") or {},
+        "images": payload.get("images") or [],
+    }
+    if "prompt" in payload:
+        normalized["prompt"] = normalize_prompt(payload["prompt"])
+    if "messages" in payload:
+        normalized["messages"] = [
+            {
+                "role": m.get("role"),
+                "content": normalize_prompt(m.get("content", "")),
+                "images": m.get("images") or [],
+            }
+            for m in payload["messages"]
+        ]
+    canonical = json.dumps(normalized, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+class MemoryCacheBackend:
+    """In-process LRU with per-entry expiry"""
+
+    def __init__(self, max_entries: int = LLM_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Dict[str, Any], ttl: float) -> None:
+        self._entries[key] = (value, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key: str) -> bool:
+        return self._entries.pop(key, None) is not None
+
+    def keys(self) -> list:
+        return list(self._entries)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class DiskCacheBackend:
+    """SQLite-backed cache that survives restarts (LRU by last access)"""
+
+    def __init__(self, path: str = LLM_CACHE_PATH, max_entries: int = LLM_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+        CREATE TABLE IF NOT EXISTS llm_cache (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL,
+            expires_at REAL NOT NULL,
+            accessed_at REAL NOT NULL
+        )
+        """)
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Dict[str, Any], ttl: float) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now + ttl, now)
+            )
+            overflow = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM llm_cache WHERE key IN "
+                    "(SELECT key FROM llm_cache ORDER BY accessed_at LIMIT ?)",
+                    (overflow,)
+                )
+                self.evictions += overflow
+            self._conn.commit()
+
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            deleted = self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,)).rowcount
+            self._conn.commit()
+        return deleted > 0
+
+    def keys(self) -> list:
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT key FROM llm_cache ORDER BY accessed_at")]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+class ResponseCache:
+    """
+    Content-addressed cache for LLM responses
+
+    Endpoints opt in per call (llm_client.chat(..., cache=True)); repeated
+    telemetry payloads are then answered without a generation.
+    """
+
+    def __init__(self, backend=None, ttl: float = LLM_CACHE_TTL):
+        self.backend = backend if backend is not None else MemoryCacheBackend()
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        value = self.backend.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key: str, value: Dict[str, Any], ttl: Optional[float] = None) -> None:
+        self.backend.set(key, value, self.ttl if ttl is None else ttl)
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.backend.__class__.__name__,
+            "entries": len(self.backend),
+            "max_entries": self.backend.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.backend.evictions,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+        }
+
+def _build_backend():
+    if LLM_CACHE_BACKEND == "disk":
+        return DiskCacheBackend()
+    return MemoryCacheBackend()
+
+# Singleton instance
+llm_cache = ResponseCache(_build_backend())
@@ -0,0 +1,180 @@
+import logging
+import os
+import threading
+from typing import Optional, Dict, Any, Tuple
+from app.tools.metrics import current_route
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURATION ---
+# Calls per (route, model) that define the baseline prompt size
+LLM_DRIFT_BASELINE_CALLS = int(os.getenv("LLM_DRIFT_BASELINE_CALLS", "20"))
+# Weight of the newest call in the recent prompt-size average
+LLM_DRIFT_ALPHA = float(os.getenv("LLM_DRIFT_ALPHA", "0.1"))
+# Flag when the recent average exceeds the baseline by this fraction
+LLM_DRIFT_THRESHOLD = float(os.getenv("LLM_DRIFT_THRESHOLD", "0.3"))
+# load_duration above this means the model was not resident (seconds)
+LLM_COLD_LOAD_SECONDS = float(os.getenv("LLM_COLD_LOAD_SECONDS", "0.5"))
+
+NS = 1e9
+
+class CallStats:
+    """Running totals for one (route, model) pair"""
+
+    __slots__ = (
+        "calls", "prompt_tokens", "completion_tokens", "load_s", "prompt_eval_s", "eval_s",
+        "total_s", "cold_loads", "last", "baseline_sum", "baseline_calls", "recent", "drifting"
+    )
+
+    def __init__(self):
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.load_s = 0.0
+        self.prompt_eval_s = 0.0
+        self.eval_s = 0.0
+        self.total_s = 0.0
+        self.cold_loads = 0
+        self.last: Dict[str, Any] = {}
+        self.baseline_sum = 0
+        self.baseline_calls = 0
+        self.recent: Optional[float] = None
+        self.drifting = False
+
+    @property
+    def baseline(self) -> Optional[float]:
+        if self.baseline_calls < LLM_DRIFT_BASELINE_CALLS:
+            return None
+        return self.baseline_sum / self.baseline_calls
+
+    def summary(self) -> Dict[str, Any]:
+        baseline = self.baseline
+        return {
+            "calls": self.calls,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "avg_prompt_tokens": round(self.prompt_tokens / self.calls, 1) if self.calls else 0,
+            "avg_completion_tokens": round(self.completion_tokens / self.calls, 1) if self.calls else 0,
+            "prompt_eval_s": round(self.prompt_eval_s, 3),
+            "eval_s": round(self.eval_s, 3),
+            "load_s": round(self.load_s, 3),
+            "total_s": round(self.total_s, 3),
+            "cold_loads": self.cold_loads,
+            "prompt_tokens_per_s": round(self.prompt_tokens / self.prompt_eval_s, 1) if self.prompt_eval_s else None,
+            "completion_tokens_per_s": round(self.completion_tokens / self.eval_s, 1) if self.eval_s else None,
+            "prompt_drift": {
+                "baseline_tokens": round(baseline, 1) if baseline is not None else None,
+                "recent_tokens": round(self.recent, 1) if self.recent is not None else None,
+                "ratio": round(self.recent / baseline, 2) if baseline and self.recent is not None else None,
+                "drifting": self.drifting
+            },
+            "last": self.last
+        }
+
+class GenerationStats:
+    """
+    Per-call Ollama generation statistics, aggregated by route and model
+
+    Every finished generation reports prompt_eval_count, eval_count and the
+    load/prompt_eval/eval/total durations (nanoseconds). They are summed per
+    (API route, model) so prompt-side and completion-side cost can be compared,
+    and each pair's prompt size is watched for upward drift: the first
+    LLM_DRIFT_BASELINE_CALLS calls set a baseline, and a moving average
+    above it by LLM_DRIFT_THRESHOLD is flagged (and logged once).
+
+    Ollama only counts prompt tokens it had to evaluate, so a prompt prefix
+    reused from its KV cache lowers prompt_eval_count; drift therefore
+    reflects evaluated prompt cost, which is what sizing needs.
+    """
+
+    def __init__(self):
+        self._stats: Dict[Tuple[str, str], CallStats] = {}
+        # Sync endpoints run in the threadpool
+        self._lock = threading.Lock()
+
+    def record(self, model: str, response: Dict[str, Any], route: Optional[str] = None) -> None:
+        route = route or current_route()
+        prompt_tokens = response.get("prompt_eval_count") or 0
+        completion_tokens = response.get("eval_count") or 0
+        load_s = (response.get("load_duration") or 0) / NS
+        prompt_eval_s = (response.get("prompt_eval_duration") or 0) / NS
+        eval_s = (response.get("eval_duration") or 0) / NS
+        total_s = (response.get("total_duration") or 0) / NS
+
+        with self._lock:
+            stats = self._stats.setdefault((route, model), CallStats())
+            stats.calls += 1
+            stats.prompt_tokens += prompt_tokens
+            stats.completion_tokens += completion_tokens
+            stats.load_s += load_s
+            stats.prompt_eval_s += prompt_eval_s
+            stats.eval_s += eval_s
+            stats.total_s += total_s
+            if load_s > LLM_COLD_LOAD_SECONDS:
+                stats.cold_loads += 1
+            stats.last = {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "load_ms": round(load_s * 1000, 1),
+                "prompt_eval_ms": round(prompt_eval_s * 1000, 1),
+                "eval_ms": round(eval_s * 1000, 1),
+                "total_ms": round(total_s * 1000, 1)
+            }
+            newly_drifting = self._track_drift(stats, prompt_tokens)
+
+        if newly_drifting:
+            logger.warning(
+                f"Prompt size drift on {route} ({model}): recent {stats.recent:.0f} tokens "
+                f"vs baseline {stats.baseline:.0f}"
+            )
+
+    @staticmethod
+    def _track_drift(stats: CallStats, prompt_tokens: int) -> bool:
+        """Update the drift state; True when the pair has just started drifting"""
+        if not prompt_tokens:
+            return False
+        if stats.baseline_calls < LLM_DRIFT_BASELINE_CALLS:
+            stats.baseline_sum += prompt_tokens
+            stats.baseline_calls += 1
+            stats.recent = stats.baseline_sum / stats.baseline_calls
+            return False
+
+        stats.recent = LLM_DRIFT_ALPHA * prompt_tokens + (1 - LLM_DRIFT_ALPHA) * stats.recent
+        was_drifting = stats.drifting
+        stats.drifting = stats.recent > stats.baseline * (1 + LLM_DRIFT_THRESHOLD)
+        return stats.drifting and not was_drifting
+
+    def stats(self) -> Dict[str, Any]:
+        """Totals across everything, then per route and model"""
+        with self._lock:
+            items = [(route, model, stats.summary()) for (route, model), stats in self._stats.items()]
+
+        prompt_tokens = sum(s["prompt_tokens"] for _, _, s in items)
+        completion_tokens = sum(s["completion_tokens"] for _, _, s in items)
+        prompt_eval_s = sum(s["prompt_eval_s"] for _, _, s in items)
+        eval_s = sum(s["eval_s"] for _, _, s in items)
+        by_route: Dict[str, Dict[str, Any]] = {}
+        for route, model, summary in sorted(items):
+            by_route.setdefault(route, {})[model] = summary
+
+        return {
+            "totals": {
+                "calls": sum(s["calls"] for _, _, s in items),
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "prompt_token_share": round(prompt_tokens / (prompt_tokens + completion_tokens), 3)
+                if prompt_tokens + completion_tokens else None,
+                # Seconds of model compute spent reading prompts vs writing answers
+                "prompt_eval_s": round(prompt_eval_s, 3),
+                "eval_s": round(eval_s, 3)
+            },
+            "drifting": [f"{route} ({model})" for route, model, s in items if s["prompt_drift"]["drifting"]],
+            "routes": by_route
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+# Singleton instance
+generation_stats = GenerationStats()
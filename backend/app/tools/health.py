@@ -0,0 +1,161 @@
+import asyncio
+import os
+import time
+import logging
+from enum import Enum
+from typing import Optional, Dict, Any
+
+logger = logging.getLogger(__name__)
+
+OLLAMA_FAILURE_THRESHOLD = int(os.getenv("OLLAMA_FAILURE_THRESHOLD", "3"))
+OLLAMA_RECOVERY_TIMEOUT = float(os.getenv("OLLAMA_RECOVERY_TIMEOUT", "30"))
+OLLAMA_HEALTH_INTERVAL = float(os.getenv("OLLAMA_HEALTH_INTERVAL", "10"))
+OLLAMA_HEALTH_TIMEOUT = float(os.getenv("OLLAMA_HEALTH_TIMEOUT", "2"))
+
+class CircuitState(str, Enum):
+    CLOSED = "CLOSED"
+    OPEN = "OPEN"
+    HALF_OPEN = "HALF_OPEN"
+
+class CircuitBreaker:
+    """
+    Shared circuit breaker for the Ollama server
+
+    State Logic:
+    - CLOSED: Requests flow normally; consecutive failures are counted
+    - OPEN: Requests are rejected instantly until the recovery timeout elapses
+    - HALF_OPEN: A single trial request is let through; its outcome
+      closes or re-opens the circuit
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = OLLAMA_FAILURE_THRESHOLD,
+        recovery_timeout: float = OLLAMA_RECOVERY_TIMEOUT
+    ):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = CircuitState.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    def allow_request(self) -> bool:
+        """
+        Check whether a request may be sent to Ollama (no I/O, constant time)
+
+        Returns:
+            True if the caller may proceed, False if it should fall back
+        """
+        if self.state == CircuitState.CLOSED:
+            return True
+
+        if self.state == CircuitState.OPEN:
+            if time.monotonic() - self.opened_at < self.recovery_timeout:
+                return False
+            self.state = CircuitState.HALF_OPEN
+            self._trial_in_flight = False
+
+        # HALF_OPEN: only one trial request at a time
+        if self._trial_in_flight:
+            return False
+        self._trial_in_flight = True
+        return True
+
+    @property
+    def is_open(self) -> bool:
+        """True while callers should skip Ollama entirely"""
+        return self.state == CircuitState.OPEN and (
+            time.monotonic() - self.opened_at < self.recovery_timeout
+        )
+
+    def release_trial(self) -> None:
+        """Give back a half-open trial slot whose request was cancelled"""
+        self._trial_in_flight = False
+
+    def record_success(self) -> None:
+        if self.state != CircuitState.CLOSED:
+            logger.info("Ollama circuit CLOSED - server reachable again")
+        self.state = CircuitState.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        self._trial_in_flight = False
+        if self.state == CircuitState.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != CircuitState.OPEN:
+                logger.warning(
+                    f"Ollama circuit OPEN after {self.consecutive_failures} consecutive failures"
+                )
+            self.state = CircuitState.OPEN
+            self.opened_at = time.monotonic()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current breaker state for health endpoints"""
+        return {
+            "state": self.state.value,
+            "consecutive_failures": self.consecutive_failures,
+            "open_for_seconds": round(time.monotonic() - self.opened_at, 1) if self.opened_at else None
+        }
+
+class OllamaHealthMonitor:
+    """
+    Background task that probes Ollama's /api/tags on an interval and feeds
+    the shared circuit breaker, so request paths never probe inline.
+    """
+
+    def __init__(
+        self,
+        breaker: CircuitBreaker,
+        interval: float = OLLAMA_HEALTH_INTERVAL,
+        probe_timeout: float = OLLAMA_HEALTH_TIMEOUT
+    ):
+        self.breaker = breaker
+        self.interval = interval
+        self.probe_timeout = probe_timeout
+        self.last_probe_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self, client) -> None:
+        """
+        Start probing in the background
+
+        Args:
+            client: An OllamaClient (anything with an async list_models(timeout=...))
+        """
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(client))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def probe(self, client) -> bool:
+        """Run a single health probe and update the breaker"""
+        self.last_probe_at = time.time()
+        try:
+            await client.list_models(timeout=self.probe_timeout)
+        except Exception as e:
+            self.last_error = str(e) or e.__class__.__name__
+            self.breaker.record_failure()
+            return False
+        self.last_error = None
+        self.breaker.record_success()
+        return True
+
+    async def _run(self, client) -> None:
+        while True:
+            await self.probe(client)
+            await asyncio.sleep(self.interval)
+
+# Shared instances
+ollama_breaker = CircuitBreaker()
+health_monitor = OllamaHealthMonitor(ollama_breaker)
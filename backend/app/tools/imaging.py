@@ -0,0 +1,215 @@
+import asyncio
+import io
+import multiprocessing
+import os
+import time
+import warnings
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Optional, Tuple, Dict, Any, Callable
+from PIL import Image, ImageOps
+from app.tools.phash import dhash
+
+# --- CONFIGURATION ---
+# Longest edge sent to the vision model; vision encoders work at ~384-1024px
+IMAGE_MAX_DIM = int(os.getenv("IMAGE_MAX_DIM", "1024"))
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", "85"))
+IMAGE_FORMAT = os.getenv("IMAGE_FORMAT", "JPEG").upper()  # JPEG | PNG | WEBP
+
+# Worker pool for decode/resize/encode ("process" uses every core, "thread" is lighter)
+IMAGE_POOL = os.getenv("IMAGE_POOL", "process")
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", str(os.cpu_count() or 2)))
+
+# Safety limits
+IMAGE_MAX_UPLOAD_BYTES = int(os.getenv("IMAGE_MAX_UPLOAD_BYTES", str(20 * 1024 * 1024)))
+IMAGE_MAX_PIXELS = int(os.getenv("IMAGE_MAX_PIXELS", str(50_000_000)))  # ~50 MP
+# Uploads are read this many bytes at a time so an oversized one is dropped early
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+# PIL refuses to decode images above 2x this; we reject anything above 1x below
+Image.MAX_IMAGE_PIXELS = IMAGE_MAX_PIXELS
+
+EXIF_ORIENTATION = 0x0112
+# Modes each target format can store without conversion
+FORMAT_MODES = {
+    "JPEG": ("RGB", "L"),
+    "WEBP": ("RGB", "RGBA"),
+    "PNG": ("RGB", "RGBA", "L", "LA", "P"),
+}
+
+class ImageRejectedError(Exception):
+    """Upload exceeds the byte or pixel limits (decompression bomb); maps to HTTP 413"""
+
+def preprocess_image(
+    contents: bytes,
+    max_dim: int = IMAGE_MAX_DIM,
+    quality: int = IMAGE_QUALITY,
+    target_format: str = IMAGE_FORMAT
+) -> Tuple[bytes, Dict[str, Any]]:
+    """
+    Prepare an uploaded photo for the vision model
+
+    Applies EXIF orientation, downscales so the longest edge is at most
+    max_dim and re-encodes to target_format. If the upload already is in
+    the target format, small enough and upright, the original bytes are
+    returned untouched.
+
+    Args:
+        contents: Raw uploaded bytes
+        max_dim: Maximum width/height in pixels
+        quality: Encoder quality for JPEG/WEBP
+        target_format: Output format understood by PIL
+
+    Returns:
+        Tuple of (image bytes, stats dict with before/after sizes, dHash and timing)
+
+    Raises:
+        ImageRejectedError: If the upload exceeds the byte or pixel limits
+        PIL.UnidentifiedImageError / OSError: If the bytes are not an image
+    """
+    start = time.perf_counter()
+    if len(contents) > IMAGE_MAX_UPLOAD_BYTES:
+        raise ImageRejectedError(f"Image exceeds {IMAGE_MAX_UPLOAD_BYTES} bytes")
+
+    try:
+        # Only the header is parsed here, pixel data is decoded lazily;
+        # the 1x-2x warning band is handled by the explicit check below
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", Image.DecompressionBombWarning)
+            image = Image.open(io.BytesIO(contents))
+    except Image.DecompressionBombError as e:
+        raise ImageRejectedError(str(e)) from e
+    source_format = image.format
+    source_size = image.size
+    if source_size[0] * source_size[1] > IMAGE_MAX_PIXELS:
+        raise ImageRejectedError(
+            f"Image has {source_size[0] * source_size[1]} pixels, limit is {IMAGE_MAX_PIXELS}"
+        )
+    orientation = image.getexif().get(EXIF_ORIENTATION, 1)
+
+    needs_resize = max(source_size) > max_dim
+    needs_rotate = orientation != 1
+    needs_convert = image.mode not in FORMAT_MODES.get(target_format, ("RGB",))
+
+    stats: Dict[str, Any] = {
+        "bytes_in": len(contents),
+        "format_in": source_format,
+        "size_in": list(source_size),
+    }
+
+    if source_format == target_format and not (needs_resize or needs_rotate or needs_convert):
+        stats.update({
+            "phash": format(dhash(image), "016x"),
+            "bytes_out": len(contents),
+            "format_out": source_format,
+            "size_out": list(source_size),
+            "reencoded": False,
+            "ms": round((time.perf_counter() - start) * 1000, 2)
+        })
+        return contents, stats
+
+    if needs_resize and source_format == "JPEG":
+        # Let libjpeg decode at a reduced scale instead of full resolution
+        image.draft("RGB", (max_dim, max_dim))
+
+    image = ImageOps.exif_transpose(image)
+    if needs_convert:
+        image = image.convert("RGB")
+    if max(image.size) > max_dim:
+        image.thumbnail((max_dim, max_dim), Image.LANCZOS)
+
+    output = io.BytesIO()
+    save_kwargs = {"quality": quality} if target_format in ("JPEG", "WEBP") else {}
+    image.save(output, format=target_format, **save_kwargs)
+    data = output.getvalue()
+
+    stats.update({
+        # Hashed after orientation so re-uploads match regardless of EXIF
+        "phash": format(dhash(image), "016x"),
+        "bytes_out": len(data),
+        "format_out": target_format,
+        "size_out": list(image.size),
+        "reencoded": True,
+        "ms": round((time.perf_counter() - start) * 1000, 2)
+    })
+    return data, stats
+
+_executor: Optional[Executor] = None
+_slots: Optional[asyncio.Semaphore] = None
+
+def get_image_executor() -> Executor:
+    """Get or create the shared image worker pool"""
+    global _executor
+    if _executor is None:
+        if IMAGE_POOL == "thread":
+            _executor = ThreadPoolExecutor(max_workers=IMAGE_WORKERS, thread_name_prefix="imaging")
+        else:
+            # spawn: forking a process that already runs event-loop threads is unsafe
+            _executor = ProcessPoolExecutor(
+                max_workers=IMAGE_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+    return _executor
+
+def shutdown_image_executor() -> None:
+    """Stop the worker pool (called from the FastAPI lifespan)"""
+    global _executor, _slots
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+    _slots = None
+
+async def _run_in_pool(contents: bytes, fn: Callable, **kwargs) -> Any:
+    """
+    Run fn(contents, **kwargs) in the worker pool
+
+    At most 2 x IMAGE_WORKERS jobs are submitted at once; further callers
+    wait here instead of piling uploads into the pool's unbounded queue.
+    """
+    global _slots
+    # Reject oversized uploads before copying them to a worker
+    if len(contents) > IMAGE_MAX_UPLOAD_BYTES:
+        raise ImageRejectedError(f"Image exceeds {IMAGE_MAX_UPLOAD_BYTES} bytes")
+    if _slots is None:
+        _slots = asyncio.Semaphore(IMAGE_WORKERS * 2)
+
+    async with _slots:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(get_image_executor(), partial(fn, contents, **kwargs))
+
+async def read_upload(upload: Any, limit: Optional[int] = None) -> bytes:
+    """
+    Read an uploaded file into memory, refusing it past `limit` bytes
+
+    The size recorded by the multipart parser is checked first; when it is
+    unknown the file is read in chunks and abandoned at limit + 1 bytes,
+    so an oversized upload is never held in memory whole.
+
+    Args:
+        upload: A FastAPI/Starlette UploadFile
+        limit: Largest accepted upload in bytes, IMAGE_MAX_UPLOAD_BYTES by default
+
+    Raises:
+        ImageRejectedError: If the upload exceeds limit
+    """
+    if limit is None:
+        limit = IMAGE_MAX_UPLOAD_BYTES
+    size = getattr(upload, "size", None)
+    if size is not None and size > limit:
+        raise ImageRejectedError(f"Image exceeds {limit} bytes")
+
+    chunks = []
+    received = 0
+    while received <= limit:
+        chunk = await upload.read(min(UPLOAD_CHUNK_BYTES, limit + 1 - received))
+        if not chunk:
+            break
+        chunks.append(chunk)
+        received += len(chunk)
+    if received > limit:
+        raise ImageRejectedError(f"Image exceeds {limit} bytes")
+    return b"".join(chunks)
+
+async def preprocess_image_async(contents: bytes, **kwargs) -> Tuple[bytes, Dict[str, Any]]:
+    """Run preprocess_image in the worker pool so JPEG work never blocks the event loop"""
+    return await _run_in_pool(contents, preprocess_image, **kwargs)
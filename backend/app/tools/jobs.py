@@ -0,0 +1,327 @@
+import asyncio
+import httpx
+import json
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Dict, Any, List, Callable, Awaitable
+from urllib.parse import urlparse
+from sqlalchemy.orm import Session
+from app.models import ScanRequest, AuditResponse
+from app.tools.db import DatabaseQueries, SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Background workers running queued audits (each may hold a vision model for tens of seconds)
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_MAX_QUEUE = int(os.getenv("JOB_MAX_QUEUE", "256"))
+JOB_RETRY_AFTER = int(os.getenv("JOB_RETRY_AFTER", "30"))
+# Longest a long-poll may hold the connection (seconds)
+JOB_MAX_WAIT = float(os.getenv("JOB_MAX_WAIT", "60"))
+# Callbacks only go to local webhooks
+JOB_CALLBACK_HOSTS = os.getenv("JOB_CALLBACK_HOSTS", "localhost,127.0.0.1,::1")
+JOB_CALLBACK_TIMEOUT = float(os.getenv("JOB_CALLBACK_TIMEOUT", "10"))
+JOB_CALLBACK_RETRIES = int(os.getenv("JOB_CALLBACK_RETRIES", "3"))
+# A running job's claim lasts this long and is renewed every third of it;
+# a worker that dies loses its jobs to the others once the lease runs out
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+# A long-poll re-reads the job this often, to see jobs finished by a sibling worker
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1"))
+
+FINISHED = ("DONE", "FAILED")
+
+Runner = Callable[[Session, ScanRequest], Awaitable[AuditResponse]]
+
+class JobQueueFullError(Exception):
+    """Raised when too many jobs are waiting; maps to HTTP 429"""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Audit job queue is full")
+        self.retry_after = retry_after
+
+class CallbackRejectedError(ValueError):
+    """Raised for callback URLs outside JOB_CALLBACK_HOSTS; maps to HTTP 400"""
+
+def _now(offset: float = 0) -> str:
+    # Same UTC format as SQLite's CURRENT_TIMESTAMP (created_at), so timestamps compare as text
+    return (datetime.now(timezone.utc) + timedelta(seconds=offset)).strftime("%Y-%m-%d %H:%M:%S")
+
+class JobQueue:
+    """
+    Background audits for scans too slow to hold a connection open
+
+    Submitting persists the job to scan_jobs and returns its id at once;
+    a fixed pool of workers runs the scans. Clients poll, long-poll, or
+    name a local webhook that receives the finished job.
+
+    Several queues (uvicorn workers, or a restart next to a live sibling)
+    may share scan_jobs: a worker claims a job with one conditional UPDATE
+    and holds it under a lease it keeps renewing, so each job runs once.
+    Every JOB_LEASE_SECONDS (and at start) the queue picks up QUEUED jobs
+    and RUNNING jobs whose lease expired; stop() hands its running jobs
+    back as QUEUED. The queue is started and stopped by the FastAPI
+    lifespan (see main.py).
+    """
+
+    def __init__(
+        self,
+        workers: int = JOB_WORKERS,
+        max_queue: int = JOB_MAX_QUEUE,
+        session_factory: Callable[[], Session] = SessionLocal,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        lease: float = JOB_LEASE_SECONDS,
+        poll_interval: float = JOB_POLL_INTERVAL
+    ):
+        self.workers = workers
+        self.lease = lease
+        self.poll_interval = poll_interval
+        # Identifies this queue's claims in scan_jobs.owner
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.max_queue = max_queue
+        self.session_factory = session_factory
+        self.transport = transport
+        self.callback_hosts = {h.strip() for h in JOB_CALLBACK_HOSTS.split(",") if h.strip()}
+        self._runner: Optional[Runner] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        # Job ids in the local queue, so a recovery sweep doesn't add them twice
+        self._queued: set = set()
+        self._finished: Dict[str, asyncio.Event] = {}
+        # Long-polls currently holding each event; the last one out drops it
+        self._waiters: Dict[str, int] = {}
+        self._running = 0
+        self._http: Optional[httpx.AsyncClient] = None
+
+    async def start(self, runner: Runner) -> None:
+        """Create scan_jobs if needed, pick up claimable jobs and start the workers"""
+        if self._tasks:
+            return
+        self._runner = runner
+        self._queue = asyncio.Queue()
+        self._queued = set()
+        self._http = httpx.AsyncClient(timeout=JOB_CALLBACK_TIMEOUT, transport=self.transport)
+
+        await self._query(DatabaseQueries.ensure_job_table)
+        await self._recover()
+
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._sweep()))
+
+    async def stop(self) -> None:
+        """Cancel the workers and hand their jobs back as QUEUED for the next start (or a sibling)"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        released = await self._query(DatabaseQueries.release_jobs, self.owner)
+        if released:
+            logger.info(f"Released {released} interrupted audit job(s)")
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    async def _query(self, query: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run a DatabaseQueries call on its own session in a worker thread, off the event loop"""
+        def call():
+            db = self.session_factory()
+            try:
+                return query(db, *args, **kwargs)
+            finally:
+                db.close()
+        return await asyncio.to_thread(call)
+
+    def _enqueue(self, job_id: str) -> None:
+        if job_id not in self._queued:
+            self._queued.add(job_id)
+            self._queue.put_nowait(job_id)
+
+    async def _recover(self) -> None:
+        """Queue QUEUED jobs and RUNNING jobs whose worker stopped renewing its lease"""
+        claimable = await self._query(DatabaseQueries.get_claimable_jobs, _now())
+        fresh = [job.job_id for job in claimable if job.job_id not in self._queued]
+        for job_id in fresh:
+            self._enqueue(job_id)
+        if fresh:
+            logger.info(f"Picked up {len(fresh)} unclaimed audit job(s)")
+
+    async def _sweep(self) -> None:
+        while True:
+            await asyncio.sleep(self.lease)
+            try:
+                await self._recover()
+            except Exception as e:
+                logger.error(f"Audit job recovery failed: {e}")
+
+    def check_callback(self, callback_url: Optional[str]) -> None:
+        if callback_url is None:
+            return
+        parsed = urlparse(callback_url)
+        if parsed.scheme not in ("http", "https") or parsed.hostname not in self.callback_hosts:
+            raise CallbackRejectedError(
+                f"Callback must be an http(s) URL on {', '.join(sorted(self.callback_hosts))}"
+            )
+
+    async def submit(self, request: ScanRequest, callback_url: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Persist and enqueue one audit
+
+        Raises:
+            CallbackRejectedError: callback_url is not a local webhook
+            JobQueueFullError: max_queue jobs are already waiting
+        """
+        self.check_callback(callback_url)
+        if self._queue is None:
+            raise RuntimeError("Job queue not started")
+        if self._queue.qsize() >= self.max_queue:
+            raise JobQueueFullError(JOB_RETRY_AFTER)
+
+        job_id = uuid.uuid4().hex
+        await self._query(DatabaseQueries.create_job, {
+            "job_id": job_id,
+            "status": "QUEUED",
+            "request": request.model_dump_json(),
+            "callback_url": callback_url
+        })
+        job = await self.get(job_id)
+        self._enqueue(job_id)
+        return job
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self._view(await self._query(DatabaseQueries.get_job, job_id))
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """
+        Long-poll: return the job once it finishes, or as it stands after `timeout` seconds
+
+        A job finished by this queue wakes the poll at once; one finished
+        by a sibling queue (another uvicorn worker) is seen on the next
+        re-read, every poll_interval seconds.
+        """
+        if timeout <= 0:
+            return await self.get(job_id)
+        # Registered before the first read, so a job finishing during it still sets the event
+        event = self._finished.setdefault(job_id, asyncio.Event())
+        self._waiters[job_id] = self._waiters.get(job_id, 0) + 1
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + min(timeout, JOB_MAX_WAIT)
+        try:
+            while True:
+                job = await self.get(job_id)
+                remaining = deadline - loop.time()
+                if job is None or job["status"] in FINISHED or remaining <= 0:
+                    return job
+                try:
+                    await asyncio.wait_for(event.wait(), min(remaining, self.poll_interval))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self._waiters[job_id] -= 1
+            if not self._waiters[job_id]:
+                del self._waiters[job_id]
+                if self._finished.get(job_id) is event:
+                    del self._finished[job_id]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": len(self._tasks),
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "running": self._running,
+            "max_queue": self.max_queue,
+            "owner": self.owner,
+            "lease_seconds": self.lease
+        }
+
+    async def _work(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            self._queued.discard(job_id)
+            self._running += 1
+            try:
+                await self._run_job(job_id)
+            except Exception as e:
+                logger.error(f"Audit job {job_id} crashed: {e}")
+            finally:
+                self._running -= 1
+                self._queue.task_done()
+
+    async def _run_job(self, job_id: str) -> None:
+        # Finished, or running under another worker's live lease
+        if not await self._query(DatabaseQueries.claim_job, job_id, self.owner, _now(), _now(self.lease)):
+            return
+        job = await self._query(DatabaseQueries.get_job, job_id)
+        heartbeat = asyncio.create_task(self._renew_lease(job_id))
+        db = self.session_factory()
+        try:
+            request = ScanRequest.model_validate_json(job.request)
+            result = await self._runner(db, request)
+        except Exception as e:
+            logger.warning(f"Audit job {job_id} failed: {e}")
+            fields = {"status": "FAILED", "error": str(e) or e.__class__.__name__}
+        else:
+            fields = {"status": "DONE", "result": result.model_dump_json()}
+        finally:
+            heartbeat.cancel()
+            db.close()
+        # Only if the job is still ours: a worker that lost its lease must not report it
+        recorded = await self._query(
+            DatabaseQueries.update_job, job_id,
+            held_by=self.owner, finished_at=_now(), lease_expires_at=None, **fields
+        )
+        if not recorded:
+            logger.warning(f"Audit job {job_id}: lease lost to another worker, result discarded")
+            return
+
+        finished = await self.get(job_id)
+        event = self._finished.pop(job_id, None)
+        if event is not None:
+            event.set()
+        if finished.get("callback_url"):
+            await self._deliver(finished)
+
+    async def _renew_lease(self, job_id: str) -> None:
+        """Keep extending this worker's claim while the audit runs"""
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            held = await self._query(DatabaseQueries.renew_job_lease, job_id, self.owner, _now(self.lease))
+            if not held:
+                logger.warning(f"Audit job {job_id}: lease taken over by another worker")
+                return
+
+    async def _deliver(self, job: Dict[str, Any]) -> None:
+        """POST the finished job to its webhook, with exponential backoff"""
+        status = "FAILED"
+        for attempt in range(JOB_CALLBACK_RETRIES):
+            try:
+                response = await self._http.post(job["callback_url"], json=job)
+                if response.status_code < 400:
+                    status = "DELIVERED"
+                    break
+                status = f"FAILED: HTTP {response.status_code}"
+            except httpx.HTTPError as e:
+                status = f"FAILED: {e!r}"
+            if attempt + 1 < JOB_CALLBACK_RETRIES:
+                await asyncio.sleep(2 ** attempt)
+        logger.info(f"Audit job {job['job_id']} callback: {status}")
+
+        await self._query(DatabaseQueries.update_job, job["job_id"], callback_status=status)
+
+    @staticmethod
+    def _view(job) -> Optional[Dict[str, Any]]:
+        if job is None:
+            return None
+        return {
+            "job_id": job.job_id,
+            "status": job.status,
+            "created_at": job.created_at,
+            "started_at": job.started_at,
+            "finished_at": job.finished_at,
+            "result": json.loads(job.result) if job.result else None,
+            "error": job.error,
+            "callback_url": job.callback_url,
+            "callback_status": job.callback_status
+        }
+
+# Singleton instance (started by the FastAPI lifespan)
+job_queue = JobQueue()
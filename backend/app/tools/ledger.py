@@ -1,6 +1,6 @@
 import hashlib
 import hmac
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from cryptography.hazmat.primitives import hashes, serialization
 from cryptography.hazmat.primitives.asymmetric import rsa, padding
 from cryptography.hazmat.backends import default_backend
@@ -208,6 +208,20 @@ class CryptoLedger:
                 "confidence": 0
             }
     
+    @staticmethod
+    def verify_qr_batch(qr_payloads: List[Optional[str]]) -> List[Optional[Dict[str, Any]]]:
+        """
+        Verify many QR payloads in one pass (pallet / container scans)
+        
+        Args:
+            qr_payloads: Raw QR code data per item; None for items without a QR
+            
+        Returns:
+            Validation results in input order (None where no payload was given)
+        """
+        verify = CryptoLedger.verify_qr_integrity
+        return [verify(qr) if qr else None for qr in qr_payloads]
+    
     @staticmethod
     def generate_mock_qr_data(part_id: str, oem_id: str) -> str:
         """
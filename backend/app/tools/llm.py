@@ -0,0 +1,361 @@
+import httpx
+import os
+import json
+import time
+from typing import Optional, Dict, Any, List, AsyncIterator
+from dotenv import load_dotenv
+from app.tools.health import CircuitBreaker, CircuitState, ollama_breaker
+from app.tools.cache import ResponseCache, llm_cache, make_cache_key
+from app.tools.singleflight import SingleFlight
+from app.tools.scheduler import InferenceScheduler, Priority, inference_scheduler
+from app.tools.tracing import span, record_span
+from app.tools import metrics
+from app.tools.genstats import generation_stats
+
+load_dotenv()
+
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+
+# Timeouts (seconds): connecting should fail fast, generation may be slow
+OLLAMA_CONNECT_TIMEOUT = float(os.getenv("OLLAMA_CONNECT_TIMEOUT", "5"))
+OLLAMA_READ_TIMEOUT = float(os.getenv("OLLAMA_READ_TIMEOUT", os.getenv("OLLAMA_TIMEOUT", "120")))
+OLLAMA_WRITE_TIMEOUT = float(os.getenv("OLLAMA_WRITE_TIMEOUT", "30"))
+OLLAMA_POOL_TIMEOUT = float(os.getenv("OLLAMA_POOL_TIMEOUT", "10"))
+
+# Connection pool limits
+OLLAMA_MAX_CONNECTIONS = int(os.getenv("OLLAMA_MAX_CONNECTIONS", "32"))
+OLLAMA_MAX_KEEPALIVE = int(os.getenv("OLLAMA_MAX_KEEPALIVE", "16"))
+OLLAMA_KEEPALIVE_EXPIRY = float(os.getenv("OLLAMA_KEEPALIVE_EXPIRY", "60"))
+
+# How long Ollama keeps a model resident after a request ("30m"; "-1m" = forever)
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+
+# Share one upstream generation between identical in-flight requests
+LLM_COALESCE = os.getenv("LLM_COALESCE", "true").lower() == "true"
+
+class LLMUnavailableError(Exception):
+    """Raised when Ollama cannot be reached; callers should use their fallback"""
+
+class CircuitOpenError(LLMUnavailableError):
+    """Raised instantly, without any I/O, while the Ollama circuit is open"""
+
+class OllamaClient:
+    """
+    Async interface to the Ollama HTTP API shared by every LLM-backed endpoint
+
+    All generations go through a single long-lived httpx.AsyncClient, so a
+    slow model only holds its own request open and never blocks the event
+    loop, and TCP connections to Ollama are pooled and reused across calls.
+    The client is opened and closed by the FastAPI lifespan (see main.py).
+
+    Every call first checks the shared circuit breaker, so when Ollama is
+    down callers fail over in microseconds instead of waiting on a timeout.
+    Identical concurrent requests are coalesced into one generation, and
+    every generation waits for a per-model slot in the inference scheduler.
+    """
+
+    def __init__(
+        self,
+        base_url: str = OLLAMA_BASE_URL,
+        timeout: Optional[httpx.Timeout] = None,
+        limits: Optional[httpx.Limits] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        cache: Optional[ResponseCache] = None,
+        scheduler: Optional[InferenceScheduler] = None
+    ):
+        self.base_url = base_url
+        self.timeout = timeout or httpx.Timeout(
+            connect=OLLAMA_CONNECT_TIMEOUT,
+            read=OLLAMA_READ_TIMEOUT,
+            write=OLLAMA_WRITE_TIMEOUT,
+            pool=OLLAMA_POOL_TIMEOUT
+        )
+        self.limits = limits or httpx.Limits(
+            max_connections=OLLAMA_MAX_CONNECTIONS,
+            max_keepalive_connections=OLLAMA_MAX_KEEPALIVE,
+            keepalive_expiry=OLLAMA_KEEPALIVE_EXPIRY
+        )
+        self.transport = transport
+        self.keep_alive = OLLAMA_KEEP_ALIVE
+        self.breaker = breaker or ollama_breaker
+        self.cache = cache or llm_cache
+        self.coalesce = LLM_COALESCE
+        self.flights = SingleFlight()
+        self.scheduler = scheduler or inference_scheduler
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Get the pooled HTTP client, opening it lazily if startup() was skipped"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                limits=self.limits,
+                transport=self.transport
+            )
+        return self._client
+
+    async def startup(self) -> None:
+        """Open the connection pool (called from the FastAPI lifespan)"""
+        self._get_client()
+
+    async def shutdown(self) -> None:
+        """Close the connection pool (called from the FastAPI lifespan)"""
+        await self.close()
+
+    def _admit(self) -> bool:
+        """
+        Pass the circuit breaker or raise CircuitOpenError
+
+        Returns True when this request holds the half-open trial: unless
+        its outcome is recorded, it must be released once the request ends.
+        """
+        if not self.breaker.allow_request():
+            raise CircuitOpenError("Ollama circuit open - using fallback")
+        return self.breaker.state == CircuitState.HALF_OPEN
+
+    def _settle(self, status_code: int) -> None:
+        """Record Ollama's answer with the breaker; 4xx (e.g. unknown model) still proves it is up"""
+        if status_code >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+    async def _post(self, path: str, payload: Dict[str, Any], priority: Priority) -> Dict[str, Any]:
+        trial = self._admit()
+        model = payload["model"]
+        queued = time.perf_counter()
+        try:
+            async with self.scheduler.slot(model, priority):
+                record_span("ollama.queue_wait", queued, model=model)
+                with span("ollama.generate", model=model, path=path) as generate_span, \
+                        metrics.LLM_IN_FLIGHT.labels(model).track_inprogress():
+                    response = await self._get_client().post(path, json=payload)
+                    self._settle(response.status_code)
+                    trial = False
+        except httpx.TransportError as e:
+            self.breaker.record_failure()
+            trial = False
+            metrics.observe_generation_error(model)
+            raise LLMUnavailableError(f"Ollama unreachable: {e!r}") from e
+        finally:
+            # Cancelled, refused by the scheduler or failed before Ollama answered
+            if trial:
+                self.breaker.release_trial()
+
+        if response.is_error:
+            metrics.observe_generation_error(model)
+        response.raise_for_status()
+        result = response.json()
+        metrics.observe_generation(model, result)
+        generation_stats.record(model, result)
+        if generate_span is not None:
+            generate_span.attributes.update({
+                key: result[key] for key in ("prompt_eval_count", "eval_count") if key in result
+            })
+        return result
+
+    async def _request(
+        self,
+        path: str,
+        payload: Dict[str, Any],
+        cache: bool,
+        priority: Priority
+    ) -> Dict[str, Any]:
+        """
+        Serve from the response cache when the caller opted in, otherwise
+        join (or start) the single shared call for this exact request
+        """
+        if not cache and not self.coalesce:
+            return await self._post(path, payload, priority)
+
+        key = make_cache_key(path, payload)
+        if cache:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        async def fetch() -> Dict[str, Any]:
+            result = await self._post(path, payload, priority)
+            if cache:
+                self.cache.set(key, result)
+            return result
+
+        if not self.coalesce:
+            return await fetch()
+        return await self.flights.do(key, fetch)
+
+    async def chat(
+        self,
+        model: str,
+        messages: List[Dict[str, Any]],
+        format: Optional[str] = None,
+        options: Optional[Dict[str, Any]] = None,
+        cache: bool = False,
+        priority: Priority = Priority.PIPELINE
+    ) -> Dict[str, Any]:
+        """
+        Run a non-streaming chat completion
+
+        Args:
+            model: Ollama model name (e.g. llama3)
+            messages: Chat messages in Ollama format
+            format: Optional output format ("json")
+            options: Optional generation options (temperature, num_predict, ...)
+            cache: Serve identical requests from the response cache
+            priority: Scheduling priority (INTERACTIVE jumps PIPELINE work)
+
+        Returns:
+            Raw Ollama response; the text is in response['message']['content']
+        """
+        payload: Dict[str, Any] = {
+            "model": model, "messages": messages, "stream": False, "keep_alive": self.keep_alive
+        }
+        if format:
+            payload["format"] = format
+        if options:
+            payload["options"] = options
+        return await self._request("/api/chat", payload, cache, priority)
+
+    async def generate(
+        self,
+        model: str,
+        prompt: str,
+        images: Optional[List[str]] = None,
+        format: Optional[str] = None,
+        options: Optional[Dict[str, Any]] = None,
+        cache: bool = False,
+        priority: Priority = Priority.PIPELINE
+    ) -> Dict[str, Any]:
+        """
+        Run a non-streaming completion against /api/generate
+
+        Args:
+            model: Ollama model name
+            prompt: The full prompt
+            images: Optional list of base64-encoded images
+            format: Optional output format ("json")
+            options: Optional generation options
+            cache: Serve identical requests from the response cache
+            priority: Scheduling priority (INTERACTIVE jumps PIPELINE work)
+
+        Returns:
+            Raw Ollama response; the text is in response['response']
+        """
+        payload: Dict[str, Any] = {
+            "model": model, "prompt": prompt, "stream": False, "keep_alive": self.keep_alive
+        }
+        if images:
+            payload["images"] = images
+        if format:
+            payload["format"] = format
+        if options:
+            payload["options"] = options
+        return await self._request("/api/generate", payload, cache, priority)
+
+    async def chat_stream(
+        self,
+        model: str,
+        messages: List[Dict[str, Any]],
+        options: Optional[Dict[str, Any]] = None,
+        priority: Priority = Priority.INTERACTIVE
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream a chat completion chunk by chunk as Ollama produces tokens
+
+        Streams are never cached or coalesced: each caller owns its generation.
+
+        Args:
+            model: Ollama model name
+            messages: Chat messages in Ollama format
+            options: Optional generation options
+            priority: Scheduling priority (streams are operator-facing by default)
+
+        Yields:
+            Raw Ollama chunks; the token is in chunk['message']['content'] and
+            the last chunk has done=True plus the generation statistics
+        """
+        trial = self._admit()
+        payload: Dict[str, Any] = {
+            "model": model, "messages": messages, "stream": True, "keep_alive": self.keep_alive
+        }
+        if options:
+            payload["options"] = options
+
+        try:
+            async with self.scheduler.slot(model, priority):
+                async with self._get_client().stream("POST", "/api/chat", json=payload) as response:
+                    self._settle(response.status_code)
+                    trial = False
+                    if response.status_code != 200:
+                        await response.aread()
+                        metrics.observe_generation_error(model)
+                    response.raise_for_status()
+
+                    with metrics.LLM_IN_FLIGHT.labels(model).track_inprogress():
+                        async for line in response.aiter_lines():
+                            if line.strip():
+                                chunk = json.loads(line)
+                                if chunk.get("done"):
+                                    metrics.observe_generation(model, chunk)
+                                    generation_stats.record(model, chunk)
+                                yield chunk
+        except httpx.TransportError as e:
+            self.breaker.record_failure()
+            trial = False
+            metrics.observe_generation_error(model)
+            raise LLMUnavailableError(f"Ollama unreachable: {e!r}") from e
+        finally:
+            # Cancelled, refused by the scheduler, failed before Ollama answered
+            # or closed early by the consumer (GeneratorExit) before the answer
+            if trial:
+                self.breaker.release_trial()
+
+    async def load_model(self, model: str, keep_alive: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Load a model into memory without generating (used for warm-up)
+
+        An /api/generate call with no prompt makes Ollama load the model and
+        pin it for keep_alive. It bypasses the cache, coalescing and the
+        scheduler since it does not occupy a generation slot.
+
+        Args:
+            model: Ollama model name
+            keep_alive: Residency duration, defaults to OLLAMA_KEEP_ALIVE
+
+        Returns:
+            Raw Ollama response (includes load_duration in nanoseconds)
+        """
+        response = await self._get_client().post(
+            "/api/generate",
+            json={"model": model, "keep_alive": keep_alive or self.keep_alive}
+        )
+        response.raise_for_status()
+        return response.json()
+
+    async def list_models(self, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Fetch the locally available models from /api/tags
+
+        Args:
+            timeout: Optional override for the whole request
+
+        Returns:
+            Raw Ollama response with a 'models' list
+        """
+        kwargs: Dict[str, Any] = {}
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+        response = await self._get_client().get("/api/tags", **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+    async def close(self) -> None:
+        """Close the underlying HTTP client"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+# Singleton instance
+llm_client = OllamaClient()
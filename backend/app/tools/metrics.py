@@ -0,0 +1,176 @@
+import os
+import time
+from contextvars import ContextVar
+from typing import Optional, Dict, Any, Callable
+from prometheus_client import (
+    CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, CONTENT_TYPE_LATEST, generate_latest
+)
+from prometheus_client import multiprocess
+from starlette.types import ASGIApp, Receive, Scope, Send, Message
+
+# Set PROMETHEUS_MULTIPROC_DIR (an empty directory, before start-up) when
+# uvicorn runs several workers: each process writes its samples there and
+# /metrics merges them, whichever worker answers the scrape.
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR", "")
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+# Scans take milliseconds (Path A) to a minute (vision models)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+TOKENS_PER_SECOND_BUCKETS = (1, 5, 10, 20, 40, 80, 160, 320, 640)
+
+HTTP_LATENCY = Histogram(
+    "veriguard_http_request_duration_seconds",
+    "Request latency by route template",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS
+)
+AGENT_RESULTS = Counter(
+    "veriguard_agent_results_total",
+    "Scan pipeline agent outcomes",
+    ["agent", "outcome"]
+)
+SCAN_RISK_LEVELS = Counter(
+    "veriguard_scan_risk_level_total",
+    "Audited scans by risk level",
+    ["risk_level"]
+)
+SCAN_VERDICTS = Counter(
+    "veriguard_scan_verdict_total",
+    "Audited scans by final verdict",
+    ["verdict"]
+)
+LLM_IN_FLIGHT = Gauge(
+    "veriguard_llm_in_flight",
+    "Ollama generations holding a scheduler slot",
+    ["model"],
+    multiprocess_mode="livesum"
+)
+LLM_REQUESTS = Counter(
+    "veriguard_llm_requests_total",
+    "Ollama generations by outcome",
+    ["model", "outcome"]
+)
+LLM_TOKENS = Counter(
+    "veriguard_llm_tokens_total",
+    "Tokens processed by Ollama (prompt = prompt_eval_count, completion = eval_count)",
+    ["model", "kind"]
+)
+LLM_PROMPT_EVAL = Histogram(
+    "veriguard_llm_prompt_eval_seconds",
+    "Ollama prompt_eval_duration",
+    ["model"],
+    buckets=LATENCY_BUCKETS
+)
+LLM_EVAL = Histogram(
+    "veriguard_llm_eval_seconds",
+    "Ollama eval_duration (token generation)",
+    ["model"],
+    buckets=LATENCY_BUCKETS
+)
+LLM_TOKENS_PER_SECOND = Histogram(
+    "veriguard_llm_tokens_per_second",
+    "Generation speed (eval_count / eval_duration)",
+    ["model"],
+    buckets=TOKENS_PER_SECOND_BUCKETS
+)
+
+# Scope of the request being served; the router fills in scope["endpoint"]
+# before any handler code runs, so the template can be resolved lazily
+_request_scope: ContextVar[Optional[Scope]] = ContextVar("request_scope", default=None)
+_templates: Dict[Callable, str] = {}
+
+def route_template(scope: Scope) -> str:
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return "unmatched"
+    if not _templates:
+        # Routes are fixed once the app is serving; map endpoints to their templates once
+        _templates.update({
+            route.endpoint: route.path
+            for route in scope["app"].routes if hasattr(route, "endpoint")
+        })
+    return _templates.get(endpoint, "unmatched")
+
+def current_route() -> str:
+    """Route template of the request being served ("background" outside a request)"""
+    scope = _request_scope.get()
+    return route_template(scope) if scope is not None else "background"
+
+def observe_agent(name: str, outcome: str) -> None:
+    """outcome: pass | fail | timeout | error"""
+    AGENT_RESULTS.labels(name, outcome).inc()
+
+def observe_scan(risk_level: str, verdict: str) -> None:
+    SCAN_RISK_LEVELS.labels(risk_level).inc()
+    SCAN_VERDICTS.labels(verdict).inc()
+
+def observe_generation(model: str, response: Dict[str, Any]) -> None:
+    """Record the statistics Ollama returns with a finished generation (durations in ns)"""
+    LLM_REQUESTS.labels(model, "ok").inc()
+    prompt_tokens = response.get("prompt_eval_count")
+    completion_tokens = response.get("eval_count")
+    prompt_ns = response.get("prompt_eval_duration")
+    eval_ns = response.get("eval_duration")
+
+    if prompt_tokens:
+        LLM_TOKENS.labels(model, "prompt").inc(prompt_tokens)
+    if completion_tokens:
+        LLM_TOKENS.labels(model, "completion").inc(completion_tokens)
+    if prompt_ns:
+        LLM_PROMPT_EVAL.labels(model).observe(prompt_ns / 1e9)
+    if eval_ns:
+        LLM_EVAL.labels(model).observe(eval_ns / 1e9)
+        if completion_tokens:
+            LLM_TOKENS_PER_SECOND.labels(model).observe(completion_tokens / (eval_ns / 1e9))
+
+def observe_generation_error(model: str) -> None:
+    LLM_REQUESTS.labels(model, "error").inc()
+
+def render() -> bytes:
+    """Prometheus text exposition for /metrics"""
+    if PROMETHEUS_MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+def mark_process_dead() -> None:
+    """Drop this worker's live gauges from the shared directory (lifespan shutdown)"""
+    if PROMETHEUS_MULTIPROC_DIR:
+        multiprocess.mark_process_dead(os.getpid())
+
+class MetricsMiddleware:
+    """
+    Per-route request latency, labelled by route template (/api/scan/jobs/{job_id})
+    rather than the raw path so label cardinality stays bounded
+
+    Plain ASGI rather than BaseHTTPMiddleware: it adds no task per request,
+    and streamed responses are timed until their last chunk.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        token = _request_scope.set(scope)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_scope.reset(token)
+            HTTP_LATENCY.labels(scope["method"], route_template(scope), str(status)).observe(
+                time.perf_counter() - start
+            )
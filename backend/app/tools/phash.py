@@ -0,0 +1,150 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Tuple
+from PIL import Image
+
+# --- CONFIGURATION ---
+# Max differing bits (of 64) for two photos to count as the same item
+PHASH_MAX_DISTANCE = int(os.getenv("PHASH_MAX_DISTANCE", "6"))
+PHASH_MAX_ENTRIES = int(os.getenv("PHASH_MAX_ENTRIES", "4096"))
+# Long enough to catch a counterfeit photo reused across a day of scans
+PHASH_TTL = float(os.getenv("PHASH_TTL", "86400"))
+
+HASH_SIZE = 8  # 8x8 gradient bits = 64-bit hash
+
+def dhash(image: Image.Image, hash_size: int = HASH_SIZE) -> int:
+    """
+    Difference hash of an image
+
+    Shrinks to (hash_size + 1) x hash_size grayscale and records whether
+    each pixel is brighter than its right neighbour. Robust to rescaling,
+    recompression and small exposure changes, so re-photographed or
+    re-uploaded items land within a few bits of each other.
+    """
+    if image.format == "JPEG":
+        # Decode at reduced scale; only a 9x8 thumbnail is needed
+        image.draft("L", (hash_size * 8, hash_size * 8))
+    small = image.convert("L").resize((hash_size + 1, hash_size), Image.LANCZOS)
+    pixels = small.tobytes()
+    width = hash_size + 1
+
+    value = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            left = pixels[row * width + col]
+            right = pixels[row * width + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+class PerceptualIndex:
+    """
+    Near-duplicate lookup from image hash to a previous analysis
+
+    Entries are namespaced (model + prompt) so a hit is only reused for the
+    same question asked of the same model. Lookups try the exact hash first
+    and then scan the namespace for the closest live hash within
+    max_distance. The scan is linear in the number of entries, which is
+    only acceptable because max_entries bounds it: at a few thousand 64-bit
+    entries it costs well under a millisecond per upload.
+    """
+
+    def __init__(
+        self,
+        max_distance: int = PHASH_MAX_DISTANCE,
+        max_entries: int = PHASH_MAX_ENTRIES,
+        ttl: float = PHASH_TTL
+    ):
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple[str, int], Dict[str, Any]]" = OrderedDict()
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def lookup(self, namespace: str, image_hash: str) -> Optional[Dict[str, Any]]:
+        """
+        Find a cached analysis for a near-duplicate image
+
+        Args:
+            namespace: Model/prompt the analysis belongs to
+            image_hash: Hex dHash of the new image
+
+        Returns:
+            Dict with analysis, match_distance and times_seen, or None
+        """
+        value = int(image_hash, 16)
+        now = time.monotonic()
+        best_key, best_distance = None, self.max_distance + 1
+        expired = []
+
+        exact = self._entries.get((namespace, value))
+        if exact is not None and exact["expires_at"] >= now:
+            best_key, best_distance = (namespace, value), 0
+        else:
+            for key, candidate in self._entries.items():
+                if key[0] != namespace:
+                    continue
+                if candidate["expires_at"] < now:
+                    expired.append(key)
+                    continue
+                distance = hamming_distance(key[1], value)
+                if distance < best_distance:
+                    best_key, best_distance = key, distance
+            for key in expired:
+                del self._entries[key]
+
+        if best_key is None:
+            self.misses += 1
+            return None
+
+        entry = self._entries[best_key]
+        self.hits += 1
+        entry["times_seen"] += 1
+        entry["last_seen"] = time.time()
+        self._entries.move_to_end(best_key)
+        return {
+            "analysis": entry["analysis"],
+            "match_distance": best_distance,
+            "times_seen": entry["times_seen"],
+            "first_seen": entry["first_seen"]
+        }
+
+    def record(self, namespace: str, image_hash: str, analysis: Any) -> None:
+        """Store the analysis of a newly seen image"""
+        key = (namespace, int(image_hash, 16))
+        now = time.time()
+        self._entries[key] = {
+            "analysis": analysis,
+            "times_seen": 1,
+            "first_seen": now,
+            "last_seen": now,
+            "expires_at": time.monotonic() + self.ttl
+        }
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_distance": self.max_distance,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+        }
+
+# Singleton instance
+photo_index = PerceptualIndex()
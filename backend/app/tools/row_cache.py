@@ -0,0 +1,131 @@
+import os
+import threading
+from typing import Optional, Dict, Any, Tuple, Hashable
+from app.tools.cache import MemoryCacheBackend
+
+# --- CONFIGURATION ---
+LEDGER_CACHE = os.getenv("LEDGER_CACHE", "true").lower() == "true"
+# Rows kept per database (LRU beyond that)
+LEDGER_CACHE_MAX_ENTRIES = int(os.getenv("LEDGER_CACHE_MAX_ENTRIES", "10000"))
+# Seconds a row is served without re-reading the ledger
+LEDGER_CACHE_TTL = float(os.getenv("LEDGER_CACHE_TTL", "60"))
+# Unknown ids are remembered for less time, so a newly registered part shows up quickly
+LEDGER_CACHE_NEGATIVE_TTL = float(os.getenv("LEDGER_CACHE_NEGATIVE_TTL", "10"))
+
+# Stored for ids the ledger does not have (None means "not cached")
+NOT_FOUND = object()
+
+class RowCache:
+    """
+    Read-through cache for parts_ledger and courier_manifest rows
+
+    Entries are keyed by database, then (kind, id), so the sync and async
+    layers share them while separate ledgers (tests, benchmarks) never
+    see each other's rows. Unknown ids are cached too, for
+    LEDGER_CACHE_NEGATIVE_TTL. The cache is per process: writes made
+    through DatabaseQueries invalidate it, changes made elsewhere (or in
+    another worker) show up once the TTL runs out or after invalidate().
+    """
+
+    def __init__(
+        self,
+        max_entries: int = LEDGER_CACHE_MAX_ENTRIES,
+        ttl: float = LEDGER_CACHE_TTL,
+        negative_ttl: float = LEDGER_CACHE_NEGATIVE_TTL,
+        enabled: bool = LEDGER_CACHE
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.enabled = enabled
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._databases: Dict[Hashable, MemoryCacheBackend] = {}
+        # Agent threads and the event loop both read through the cache
+        self._lock = threading.Lock()
+
+    def get(self, database: Hashable, kind: str, key: str) -> Tuple[bool, Any]:
+        """(True, row or None for a known-missing id) on a hit, (False, None) on a miss"""
+        if not self.enabled:
+            return False, None
+        with self._lock:
+            backend = self._databases.get(database)
+            value = backend.get((kind, key)) if backend is not None else None
+            if value is None:
+                self.misses += 1
+                return False, None
+            if value is NOT_FOUND:
+                self.negative_hits += 1
+                return True, None
+            self.hits += 1
+            return True, value
+
+    def put(self, database: Hashable, kind: str, key: str, row: Any) -> None:
+        """Remember a row just read from the ledger (None: the id does not exist)"""
+        if not self.enabled:
+            return
+        with self._lock:
+            backend = self._databases.get(database)
+            if backend is None:
+                backend = self._databases[database] = MemoryCacheBackend(self.max_entries)
+            if row is None:
+                backend.set((kind, key), NOT_FOUND, self.negative_ttl)
+            else:
+                backend.set((kind, key), row, self.ttl)
+
+    def invalidate(self, kind: Optional[str] = None, key: Optional[str] = None,
+                   database: Optional[Hashable] = None) -> int:
+        """
+        Drop cached rows
+
+        Args:
+            kind: "part" or "courier" (None: every row)
+            key: The part_id / courier_id (None: every row of kind)
+            database: Only this database's entries (None: all of them)
+
+        Returns:
+            Number of entries dropped
+        """
+        with self._lock:
+            if database is None:
+                backends = list(self._databases.values())
+            else:
+                backends = [self._databases[database]] if database in self._databases else []
+            dropped = 0
+            for backend in backends:
+                if kind is not None and key is not None:
+                    dropped += backend.delete((kind, key))
+                    continue
+                for entry in backend.keys():
+                    if kind is None or entry[0] == kind:
+                        dropped += backend.delete(entry)
+            self.invalidations += dropped
+            return dropped
+
+    def clear(self) -> None:
+        with self._lock:
+            self._databases.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = sum(len(backend) for backend in self._databases.values())
+            evictions = sum(backend.evictions for backend in self._databases.values())
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": entries,
+            "max_entries_per_database": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "negative_ttl_seconds": self.negative_ttl,
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "evictions": evictions,
+            "hit_rate": round((self.hits + self.negative_hits) / lookups, 3) if lookups else 0.0
+        }
+
+# Singleton instance
+row_cache = RowCache()
@@ -0,0 +1,188 @@
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from typing import Optional, Dict, Any, List, AsyncIterator
+
+# --- CONFIGURATION ---
+# Default concurrent generations per model; match Ollama's OLLAMA_NUM_PARALLEL
+OLLAMA_NUM_PARALLEL = int(os.getenv("OLLAMA_NUM_PARALLEL", "4"))
+# Per-model overrides, e.g. "llama3=4,moondream=2,llama3.2-vision=1"
+OLLAMA_MODEL_PARALLEL = os.getenv("OLLAMA_MODEL_PARALLEL", "")
+# Requests allowed to wait per model before new ones are rejected with 429
+OLLAMA_MAX_QUEUE = int(os.getenv("OLLAMA_MAX_QUEUE", "64"))
+# Retry-After hint (seconds) when estimating wait is not possible
+OLLAMA_RETRY_AFTER = int(os.getenv("OLLAMA_RETRY_AFTER", "5"))
+
+def _parse_model_limits(spec: str) -> Dict[str, int]:
+    limits = {}
+    for item in spec.split(","):
+        if "=" in item:
+            model, limit = item.split("=", 1)
+            limits[model.strip()] = max(1, int(limit))
+    return limits
+
+class Priority(IntEnum):
+    """Lower value is served first"""
+    INTERACTIVE = 0  # Operator-facing chat
+    PIPELINE = 1     # Scan pipeline / agent endpoints
+
+class QueueFullError(Exception):
+    """Raised when a model's wait queue is full; maps to HTTP 429"""
+
+    def __init__(self, model: str, retry_after: int):
+        super().__init__(f"Inference queue for '{model}' is full")
+        self.model = model
+        self.retry_after = retry_after
+
+class ModelQueue:
+    """
+    Admission control for a single model
+
+    At most `limit` generations run at once (Ollama's parallel slots);
+    further callers wait in a priority heap of at most `max_queue` entries.
+    When a slot frees up, waiting requests are released in priority order
+    so that they fill the server's parallel slots together and Ollama can
+    batch them.
+    """
+
+    def __init__(self, model: str, limit: int, max_queue: int):
+        self.model = model
+        self.limit = limit
+        self.max_queue = max_queue
+        self.active = 0
+        self._waiters: List[tuple] = []
+        self._sequence = itertools.count()
+
+        # Metrics
+        self.admitted = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.avg_service_time = 0.0
+
+    @property
+    def depth(self) -> int:
+        return sum(1 for entry in self._waiters if not entry[2].done())
+
+    def retry_after(self) -> int:
+        """Rough time until a queue slot frees up, for the Retry-After header"""
+        if not self.avg_service_time:
+            return OLLAMA_RETRY_AFTER
+        batches = (self.depth // self.limit) + 1
+        return max(1, int(batches * self.avg_service_time))
+
+    async def acquire(self, priority: Priority) -> float:
+        """
+        Wait for a free slot
+
+        Returns:
+            Seconds spent queued
+
+        Raises:
+            QueueFullError: If the queue is already at max_queue
+        """
+        start = time.perf_counter()
+        if self.active < self.limit and not self.depth:
+            self.active += 1
+            self._record_admit(0.0)
+            return 0.0
+
+        if self.depth >= self.max_queue:
+            self.rejected += 1
+            raise QueueFullError(self.model, self.retry_after())
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (int(priority), next(self._sequence), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            # If the slot was handed over just before cancellation, pass it on
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+        waited = time.perf_counter() - start
+        self._record_admit(waited)
+        return waited
+
+    def release(self, service_time: Optional[float] = None) -> None:
+        """Free a slot and hand it to the highest-priority waiter"""
+        if service_time is not None:
+            # Exponential moving average of generation time
+            self.avg_service_time = (
+                service_time if not self.avg_service_time
+                else 0.8 * self.avg_service_time + 0.2 * service_time
+            )
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                # Slot ownership moves straight to the waiter
+                future.set_result(None)
+                return
+        self.active -= 1
+
+    def _record_admit(self, waited: float) -> None:
+        self.admitted += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "queue_depth": self.depth,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "avg_wait_ms": round(self.total_wait / self.admitted * 1000, 2) if self.admitted else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 2),
+            "avg_service_ms": round(self.avg_service_time * 1000, 2)
+        }
+
+class InferenceScheduler:
+    """Per-model admission control in front of every Ollama model call"""
+
+    def __init__(
+        self,
+        default_limit: int = OLLAMA_NUM_PARALLEL,
+        model_limits: Optional[Dict[str, int]] = None,
+        max_queue: int = OLLAMA_MAX_QUEUE
+    ):
+        self.default_limit = default_limit
+        self.model_limits = model_limits if model_limits is not None else _parse_model_limits(OLLAMA_MODEL_PARALLEL)
+        self.max_queue = max_queue
+        self._queues: Dict[str, ModelQueue] = {}
+
+    def queue_for(self, model: str) -> ModelQueue:
+        queue = self._queues.get(model)
+        if queue is None:
+            limit = self.model_limits.get(model, self.default_limit)
+            queue = ModelQueue(model, limit, self.max_queue)
+            self._queues[model] = queue
+        return queue
+
+    @asynccontextmanager
+    async def slot(self, model: str, priority: Priority = Priority.PIPELINE) -> AsyncIterator[float]:
+        """
+        Hold one generation slot for `model`
+
+        Yields:
+            Seconds the caller spent queued
+        """
+        queue = self.queue_for(model)
+        waited = await queue.acquire(priority)
+        start = time.perf_counter()
+        try:
+            yield waited
+        finally:
+            queue.release(time.perf_counter() - start)
+
+    def stats(self) -> Dict[str, Any]:
+        return {model: queue.stats() for model, queue in self._queues.items()}
+
+# Singleton instance
+inference_scheduler = InferenceScheduler()
@@ -0,0 +1,72 @@
+import asyncio
+from typing import Dict, Any, Callable, Awaitable
+
+class _Flight:
+    """One shared upstream call and the number of callers waiting on it"""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent calls into a single upstream call
+
+    The first caller for a key starts the call as a background task; every
+    caller (including the first) awaits it through asyncio.shield, so a
+    caller that is cancelled (e.g. a client disconnect) only stops waiting.
+    The shared call is cancelled only when its last waiter has gone.
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run fn() once per key among concurrent callers
+
+        Args:
+            key: Identity of the call (equal keys share one result)
+            fn: Zero-argument coroutine function performing the call
+
+        Returns:
+            The shared result (treat as read-only, it is handed to every waiter)
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.create_task(fn()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+            self.leaders += 1
+        else:
+            self.coalesced += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.task.done():
+                flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+
+    def _forget(self, key: str, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        # Mark the exception retrieved when every waiter already left
+        if not flight.task.cancelled():
+            flight.task.exception()
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "leaders": self.leaders,
+            "coalesced": self.coalesced
+        }
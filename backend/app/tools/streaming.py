@@ -0,0 +1,78 @@
+import json
+from typing import Optional, Any, AsyncIterator
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+# Headers that stop proxies (nginx, Next.js dev server) from buffering streams
+STREAM_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no"
+}
+
+def sse_event(data: Any, event: Optional[str] = None) -> str:
+    """
+    Format one Server-Sent Event
+
+    Args:
+        data: JSON-serializable payload
+        event: Optional event name (clients default to "message")
+
+    Returns:
+        The wire-format event, terminated by a blank line
+    """
+    lines = []
+    if event:
+        lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+
+class LineTooLongError(ValueError):
+    """An NDJSON line grew past the configured limit without a newline"""
+
+async def ndjson_lines(chunks: AsyncIterator[bytes], max_line_bytes: int) -> AsyncIterator[bytes]:
+    """
+    Split a streamed request body into NDJSON lines as the bytes arrive
+
+    Only the current partial line is buffered, so memory stays flat no
+    matter how long the stream runs. Blank lines are skipped.
+
+    Args:
+        chunks: Raw body chunks (e.g. Request.stream())
+        max_line_bytes: Longest line accepted
+
+    Yields:
+        One line at a time, without the trailing newline
+
+    Raises:
+        LineTooLongError: A line exceeded max_line_bytes
+    """
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if len(line) > max_line_bytes:
+                raise LineTooLongError(f"NDJSON line exceeds {max_line_bytes} bytes")
+            if line.strip():
+                yield line
+        if len(buffer) > max_line_bytes:
+            raise LineTooLongError(f"NDJSON line exceeds {max_line_bytes} bytes")
+    if buffer.strip():
+        yield buffer
+
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that leaves the request body to the endpoint
+
+    Starlette's StreamingResponse listens on receive() for disconnects,
+    which would swallow body chunks still being uploaded. Use this when
+    the response is written while the request body is read (NDJSON
+    ingest); a disconnect then surfaces as ClientDisconnect from
+    Request.stream() instead.
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
@@ -0,0 +1,230 @@
+import asyncio
+import httpx
+import json
+import logging
+import os
+import secrets
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional, Dict, Any, List, Iterator, Set
+
+logger = logging.getLogger(__name__)
+
+# Where finished traces go: "json" (append to TRACE_EXPORT_PATH), "otlp"
+# (POST to TRACE_OTLP_ENDPOINT), both ("json,otlp") or nothing ("")
+TRACE_EXPORT = os.getenv("TRACE_EXPORT", "")
+TRACE_EXPORT_PATH = os.getenv(
+    "TRACE_EXPORT_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "traces.jsonl")
+)
+# OTLP/HTTP JSON receiver (an OpenTelemetry Collector, Jaeger, or any local stand-in)
+TRACE_OTLP_ENDPOINT = os.getenv("TRACE_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+TRACE_SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "veriguardx-backend")
+
+class Span:
+    """One timed stage; times are perf_counter seconds"""
+
+    __slots__ = ("name", "span_id", "parent_id", "start", "end", "attributes")
+
+    def __init__(self, name: str, parent_id: Optional[str], start: float, attributes: Dict[str, Any]):
+        self.name = name
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.start = start
+        self.end = start
+        self.attributes = attributes
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end - self.start) * 1000
+
+class Trace:
+    """
+    Spans recorded while handling one scan
+
+    Spans nest (an agent span contains its DB and Ollama spans), so stage
+    totals in breakdown() overlap and do not sum to the scan's total.
+    """
+
+    def __init__(self, name: str, attributes: Optional[Dict[str, Any]] = None):
+        self.trace_id = secrets.token_hex(16)
+        self.wall_start_ns = time.time_ns()
+        self.root = Span(name, None, time.perf_counter(), attributes or {})
+        self.spans: List[Span] = []
+
+    def breakdown(self) -> Dict[str, Any]:
+        """Per-stage totals plus the individual spans, in milliseconds"""
+        stages: Dict[str, Dict[str, Any]] = {}
+        for span in self.spans:
+            stage = stages.setdefault(span.name, {"count": 0, "ms": 0.0})
+            stage["count"] += 1
+            stage["ms"] += span.duration_ms
+        for stage in stages.values():
+            stage["ms"] = round(stage["ms"], 2)
+
+        return {
+            "trace_id": self.trace_id,
+            "total_ms": round(self.root.duration_ms, 2),
+            "stages": stages,
+            "spans": [
+                {
+                    "name": span.name,
+                    "start_ms": round((span.start - self.root.start) * 1000, 2),
+                    "duration_ms": round(span.duration_ms, 2),
+                    "parent": span.parent_id,
+                    "span_id": span.span_id,
+                    **({"attributes": span.attributes} if span.attributes else {})
+                }
+                for span in sorted(self.spans, key=lambda s: s.start)
+            ]
+        }
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """OTLP/JSON ExportTraceServiceRequest for this trace"""
+        def unix_nano(t: float) -> str:
+            return str(self.wall_start_ns + int((t - self.root.start) * 1e9))
+
+        def encode(span: Span) -> Dict[str, Any]:
+            encoded = {
+                "traceId": self.trace_id,
+                "spanId": span.span_id,
+                "name": span.name,
+                "kind": 1,
+                "startTimeUnixNano": unix_nano(span.start),
+                "endTimeUnixNano": unix_nano(span.end),
+                "attributes": [
+                    {"key": key, "value": {"stringValue": str(value)}}
+                    for key, value in span.attributes.items()
+                ]
+            }
+            if span.parent_id:
+                encoded["parentSpanId"] = span.parent_id
+            return encoded
+
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [
+                    {"key": "service.name", "value": {"stringValue": TRACE_SERVICE_NAME}}
+                ]},
+                "scopeSpans": [{
+                    "scope": {"name": "app.tools.tracing"},
+                    "spans": [encode(self.root)] + [encode(span) for span in self.spans]
+                }]
+            }]
+        }
+
+_trace: ContextVar[Optional[Trace]] = ContextVar("trace", default=None)
+_parent: ContextVar[Optional[str]] = ContextVar("trace_parent", default=None)
+
+def current_trace() -> Optional[Trace]:
+    return _trace.get()
+
+@contextmanager
+def start_trace(name: str, **attributes) -> Iterator[Trace]:
+    """
+    Record spans for everything run inside the block
+
+    Tasks created inside the block copy the context, so agent tasks add
+    their spans to the same trace.
+    """
+    trace = Trace(name, attributes)
+    trace_token = _trace.set(trace)
+    parent_token = _parent.set(trace.root.span_id)
+    try:
+        yield trace
+    finally:
+        trace.root.end = time.perf_counter()
+        _parent.reset(parent_token)
+        _trace.reset(trace_token)
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Optional[Span]]:
+    """Time the block as a child of the current span (a no-op outside a trace)"""
+    trace = _trace.get()
+    if trace is None:
+        yield None
+        return
+    current = Span(name, _parent.get(), time.perf_counter(), attributes)
+    token = _parent.set(current.span_id)
+    try:
+        yield current
+    finally:
+        current.end = time.perf_counter()
+        _parent.reset(token)
+        trace.spans.append(current)
+
+def record_span(name: str, start: float, end: Optional[float] = None, **attributes) -> None:
+    """Record an interval measured elsewhere (perf_counter seconds), e.g. a queue wait"""
+    trace = _trace.get()
+    if trace is None:
+        return
+    recorded = Span(name, _parent.get(), start, attributes)
+    recorded.end = end if end is not None else time.perf_counter()
+    trace.spans.append(recorded)
+
+class TraceExporter:
+    """
+    Ships finished traces off the request path
+
+    Exports run as background tasks: a slow or missing collector never
+    adds latency to a scan, and export failures are only logged.
+    """
+
+    def __init__(
+        self,
+        targets: str = TRACE_EXPORT,
+        path: str = TRACE_EXPORT_PATH,
+        endpoint: str = TRACE_OTLP_ENDPOINT,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        self.targets = {t.strip().lower() for t in targets.split(",") if t.strip()}
+        self.path = path
+        self.endpoint = endpoint
+        self.transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._pending: Set[asyncio.Task] = set()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.targets)
+
+    def submit(self, trace: Trace) -> None:
+        if not self.enabled:
+            return
+        task = asyncio.create_task(self._export(trace.to_otlp()))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def flush(self) -> None:
+        """Wait for exports in flight (shutdown and tests)"""
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+
+    async def close(self) -> None:
+        await self.flush()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _export(self, payload: Dict[str, Any]) -> None:
+        if "json" in self.targets:
+            try:
+                await asyncio.to_thread(self._append, json.dumps(payload))
+            except OSError as e:
+                logger.warning(f"Trace export to {self.path} failed: {e}")
+        if "otlp" in self.targets:
+            if self._client is None:
+                self._client = httpx.AsyncClient(timeout=5, transport=self.transport)
+            try:
+                response = await self._client.post(self.endpoint, json=payload)
+                response.raise_for_status()
+            except httpx.HTTPError as e:
+                logger.warning(f"Trace export to {self.endpoint} failed: {e!r}")
+
+    def _append(self, line: str) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+# Singleton instance
+trace_exporter = TraceExporter()
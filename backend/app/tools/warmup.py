@@ -0,0 +1,111 @@
+import asyncio
+import os
+import time
+import logging
+from typing import Optional, Dict, Any, List
+from app.tools.llm import OllamaClient
+from app.tools.vision import VISION_MODEL, REASONING_MODEL
+
+logger = logging.getLogger(__name__)
+
+# Models hard-coded in main.py and council.py, plus the OllamaVision models
+DEFAULT_WARM_MODELS = ["llama3", "moondream", VISION_MODEL, REASONING_MODEL]
+# Comma-separated override, e.g. "llama3,moondream"
+OLLAMA_WARM_MODELS = os.getenv("OLLAMA_WARM_MODELS", "")
+# Re-pin interval in seconds (0 = only warm at startup); keep below OLLAMA_KEEP_ALIVE
+OLLAMA_WARM_REFRESH = float(os.getenv("OLLAMA_WARM_REFRESH", "0"))
+OLLAMA_WARM_RETRY = float(os.getenv("OLLAMA_WARM_RETRY", "30"))
+
+def configured_models() -> List[str]:
+    if OLLAMA_WARM_MODELS.strip():
+        models = [m.strip() for m in OLLAMA_WARM_MODELS.split(",") if m.strip()]
+    else:
+        models = DEFAULT_WARM_MODELS
+    # Preserve order, drop duplicates (VISION/REASONING may match the defaults)
+    return list(dict.fromkeys(models))
+
+class ModelWarmer:
+    """
+    Preloads models at startup and keeps them resident
+
+    Runs in the background so the API starts serving immediately; the root
+    health endpoint reports per-model readiness while loads are in flight.
+    Models that fail to load are retried every OLLAMA_WARM_RETRY seconds.
+    Residency itself comes from keep_alive, which llm_client also sends on
+    every request.
+    """
+
+    def __init__(
+        self,
+        models: Optional[List[str]] = None,
+        refresh_interval: float = OLLAMA_WARM_REFRESH,
+        retry_interval: float = OLLAMA_WARM_RETRY
+    ):
+        self.models = models if models is not None else configured_models()
+        self.refresh_interval = refresh_interval
+        self.retry_interval = retry_interval
+        self._status: Dict[str, Dict[str, Any]] = {
+            model: {"state": "PENDING"} for model in self.models
+        }
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self, client: OllamaClient) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(client))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def warm(self, client: OllamaClient, model: str) -> bool:
+        """Load one model and record its readiness"""
+        if self._status.get(model, {}).get("state") != "READY":
+            self._status[model] = {"state": "LOADING"}
+        start = time.perf_counter()
+        try:
+            result = await client.load_model(model)
+        except Exception as e:
+            logger.warning(f"Warm-up failed for {model}: {e}")
+            self._status[model] = {"state": "FAILED", "error": str(e) or e.__class__.__name__}
+            return False
+
+        self._status[model] = {
+            "state": "READY",
+            "warm_ms": round((time.perf_counter() - start) * 1000, 1),
+            # Ollama reports durations in nanoseconds
+            "load_ms": round(result.get("load_duration", 0) / 1e6, 1),
+            "keep_alive": client.keep_alive,
+            "warmed_at": time.time()
+        }
+        logger.info(f"Model {model} ready ({self._status[model]['warm_ms']}ms)")
+        return True
+
+    async def _run(self, client: OllamaClient) -> None:
+        pending = list(self.models)
+        while True:
+            # One at a time: loading several models at once competes for VRAM
+            failed = [m for m in pending if not await self.warm(client, m)]
+
+            if failed:
+                pending = failed
+                await asyncio.sleep(self.retry_interval)
+            elif self.refresh_interval > 0:
+                pending = list(self.models)
+                await asyncio.sleep(self.refresh_interval)
+            else:
+                return
+
+    def readiness(self) -> Dict[str, Dict[str, Any]]:
+        return dict(self._status)
+
+    @property
+    def all_ready(self) -> bool:
+        return all(s["state"] == "READY" for s in self._status.values())
+
+# Singleton instance
+model_warmer = ModelWarmer()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Agent Execution Benchmark for VeriGuardX
+Runs N concurrent Path A scans (Council off, marketplace stubbed out) with
+the DB-bound agents' sync checks (ASYNC_AGENT_DB off) inline on the
+event loop and then in agent thread pools of increasing size. Every SQL statement is given DB_LATENCY_MS of
+extra latency (disk or network round trip) so blocking I/O is visible,
+as it would be against a busy disk or a remote database.
+
+At most IN_FLIGHT scans run at once, as behind a loaded server, so the
+connection pool is never the bottleneck. The ledger row cache is off, so
+every scan pays for its queries.
+
+Reports scans/sec and the worst event-loop stall seen by a 10ms ticker:
+inline, scans serialize behind each query; with the pool, throughput grows
+with the worker count and the loop stays responsive.
+
+python bench_agents.py [n_scans] [db_latency_ms]
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+import init_db
+from app.models import AgentResult, ScanRequest
+from app.pipeline import ScanPipeline
+from app.tools.row_cache import row_cache
+
+IN_FLIGHT = 16
+
+async def ticker(stop: asyncio.Event, stalls: list):
+    """Measures how late a 10ms sleep wakes up, i.e. how blocked the loop is"""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.01)
+        stalls.append(time.perf_counter() - start - 0.01)
+
+async def no_marketplace(db, request, route):
+    return AgentResult(agent_name="Marketplace Agent", passed=True, confidence=0.95, details={})
+
+def make_engine(directory: str, latency: float):
+    path = os.path.join(directory, "supply_chain.db")
+    init_db.init_db(path)
+    engine = create_engine(
+        f"sqlite:///{path}",
+        connect_args={"check_same_thread": False},
+        # Each scan holds its own session plus one per pooled agent call
+        pool_size=IN_FLIGHT * 5,
+        max_overflow=0
+    )
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def slow_io(*args):
+        time.sleep(latency)
+
+    return engine
+
+async def run(engine, workers: int, n: int):
+    pipeline = ScanPipeline(use_council=False, agent_timeout=60, agent_workers=workers, async_db=False)
+    pipeline.runners["marketplace"] = no_marketplace
+    scan = ScanRequest(part_id="B08N5KWB9H", location="Warehouse-A", courier_id="TRUSTED-001")
+    make_session = sessionmaker(bind=engine)
+    slots = asyncio.Semaphore(IN_FLIGHT)
+
+    async def one():
+        async with slots:
+            db = make_session()
+            try:
+                await pipeline.run(db, scan)
+            finally:
+                db.close()
+
+    stop, stalls = asyncio.Event(), []
+    tick = asyncio.create_task(ticker(stop, stalls))
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(n)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await tick
+    pipeline.shutdown()
+    return elapsed, max(stalls, default=0.0)
+
+async def main(directory: str, n: int, latency_ms: float):
+    row_cache.enabled = False
+    engine = make_engine(directory, latency_ms / 1000)
+    print("VeriGuardX Agent Execution Benchmark")
+    print("=" * 50)
+    print(f"Scans: {n}, DB latency: {latency_ms}ms/statement, cores: {os.cpu_count()}\n")
+
+    for workers in (0, 1, 2, 4, 8, 16, 32):
+        elapsed, stall = await run(engine, workers, n)
+        label = "inline" if workers == 0 else f"pool x{workers}"
+        print(f"{label:<10} {elapsed:6.2f}s  {n / elapsed:7.1f} scans/s  "
+              f"max loop stall {stall * 1000:7.1f}ms")
+
+if __name__ == "__main__":
+    n_scans = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    db_latency = float(sys.argv[2]) if len(sys.argv) > 2 else 2
+    with tempfile.TemporaryDirectory() as ledger_dir:
+        asyncio.run(main(ledger_dir, n_scans, db_latency))
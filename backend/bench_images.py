@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Image Preprocessing Benchmark for VeriGuardX
+Compares decode/resize/encode of phone-sized JPEGs run inline on the event
+loop against the imaging thread pool and process pool. Reports
+preprocessing requests/sec and the worst event-loop stall seen by a
+10ms ticker while the batch runs.
+
+python bench_images.py [n_images] [megapixels]
+"""
+
+import asyncio
+import io
+import os
+import sys
+import time
+from PIL import Image
+
+from app.tools import imaging
+
+def make_photo(megapixels: float) -> bytes:
+    """Noisy 4:3 JPEG, roughly what a phone camera uploads"""
+    width = int((megapixels * 1e6 * 4 / 3) ** 0.5)
+    height = int(width * 3 / 4)
+    image = Image.effect_noise((width, height), 64).convert("RGB")
+    output = io.BytesIO()
+    image.save(output, format="JPEG", quality=92)
+    return output.getvalue()
+
+async def ticker(stop: asyncio.Event, stalls: list):
+    """Measures how late a 10ms sleep wakes up, i.e. how blocked the loop is"""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.01)
+        stalls.append(time.perf_counter() - start - 0.01)
+
+async def run(mode: str, photo: bytes, n: int):
+    async def one():
+        if mode == "inline":
+            imaging.preprocess_image(photo)
+        else:
+            await imaging.preprocess_image_async(photo)
+
+    if mode != "inline":
+        imaging.IMAGE_POOL = mode
+        imaging.shutdown_image_executor()
+        # Start the workers outside the timed section
+        await asyncio.gather(*(imaging.preprocess_image_async(photo) for _ in range(imaging.IMAGE_WORKERS)))
+
+    stop, stalls = asyncio.Event(), []
+    tick = asyncio.create_task(ticker(stop, stalls))
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(n)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await tick
+    imaging.shutdown_image_executor()
+    return elapsed, max(stalls, default=0.0)
+
+async def main(n: int, megapixels: float):
+    photo = make_photo(megapixels)
+    print("VeriGuardX Image Preprocessing Benchmark")
+    print("=" * 50)
+    print(f"Images: {n} x {megapixels}MP JPEG ({len(photo) // 1024} KB), "
+          f"workers: {imaging.IMAGE_WORKERS}, cores: {os.cpu_count()}\n")
+
+    for mode in ("inline", "thread", "process"):
+        elapsed, stall = await run(mode, photo, n)
+        print(f"{mode:<8} {elapsed:6.2f}s  {n / elapsed:7.1f} img/s  "
+              f"max loop stall {stall * 1000:7.1f}ms")
+
+if __name__ == "__main__":
+    n_images = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    mp = float(sys.argv[2]) if len(sys.argv) > 2 else 12
+    asyncio.run(main(n_images, mp))
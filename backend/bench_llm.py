@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Ollama Client Benchmark for VeriGuardX
+Compares a fresh httpx.AsyncClient per call (the old OllamaVision pattern)
+against the pooled OllamaClient, using a local keep-alive HTTP stub that
+counts TCP connections.
+
+python bench_llm.py [n_requests] [concurrency]
+"""
+
+import asyncio
+import json
+import sys
+import time
+import httpx
+
+from app.tools.llm import OllamaClient
+
+BODY = json.dumps({"model": "llama3.2", "response": "{}", "done": True}).encode()
+
+class StubOllama:
+    """Minimal HTTP/1.1 keep-alive server that answers every request with BODY"""
+
+    def __init__(self):
+        self.connections = 0
+        self.requests = 0
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = 0
+                for line in head.decode().split("\r\n"):
+                    if line.lower().startswith("content-length:"):
+                        length = int(line.split(":", 1)[1])
+                if length:
+                    await reader.readexactly(length)
+                self.requests += 1
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    b"Content-Length: " + str(len(BODY)).encode() + b"\r\n\r\n" + BODY
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+async def per_call_clients(base_url: str, n: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            async with httpx.AsyncClient(timeout=120.0) as client:
+                response = await client.post(
+                    f"{base_url}/api/generate",
+                    json={"model": "llama3.2", "prompt": "ping", "stream": False}
+                )
+                response.json()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(n)))
+    return time.perf_counter() - start
+
+async def pooled_client(base_url: str, n: int, concurrency: int) -> float:
+    client = OllamaClient(base_url=base_url)
+    await client.startup()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await client.generate(model="llama3.2", prompt="ping")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(n)))
+    elapsed = time.perf_counter() - start
+    await client.shutdown()
+    return elapsed
+
+async def main(n: int, concurrency: int):
+    print("VeriGuardX Ollama Client Benchmark")
+    print("=" * 50)
+    print(f"Requests: {n}, concurrency: {concurrency}\n")
+
+    for name, runner in (("per-call AsyncClient", per_call_clients), ("pooled OllamaClient", pooled_client)):
+        stub = StubOllama()
+        server = await asyncio.start_server(stub.handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        elapsed = await runner(f"http://127.0.0.1:{port}", n, concurrency)
+        server.close()
+        await server.wait_closed()
+        print(f"{name:<22} {elapsed:6.2f}s  {n / elapsed:8.0f} req/s  "
+              f"{stub.connections:5d} TCP connections for {stub.requests} requests")
+
+if __name__ == "__main__":
+    n_requests = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    n_concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    asyncio.run(main(n_requests, n_concurrency))
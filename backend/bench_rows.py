@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Ledger Row Benchmark for VeriGuardX
+Compares the previous row path (SELECT *, a text() statement built per
+call, dict(zip(keys, row)) -> SimpleNamespace per row) with the current
+one (explicit column projection, statements built once, PartRow
+NamedTuples) on a ledger of N parts:
+  convert  rows -> objects only, already fetched
+  bulk     get_parts_by_ids for the whole ledger (pallet prefetch)
+  lookup   get_part_by_id one part at a time
+and reports rows/sec plus the memory held by N row objects. The ledger
+row cache is off, so every lookup reaches SQLite.
+
+python bench_rows.py [n_parts] [rounds]
+"""
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+from sqlalchemy import bindparam, create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+import init_db
+from app.tools.db import BULK_CHUNK_SIZE, DatabaseQueries, PartRow, select_rows
+from app.tools.row_cache import row_cache
+
+# The columns the old code assumed SELECT * returned, in order
+LEGACY_KEYS = ["id", "part_id", "oem_signature", "serial_hash", "manufacturing_date", "current_location"]
+
+def make_session(directory: str, n: int):
+    path = os.path.join(directory, "supply_chain.db")
+    with contextlib.redirect_stdout(io.StringIO()):
+        init_db.init_db(path)
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    db = sessionmaker(bind=engine)()
+    db.execute(
+        text("""
+        INSERT INTO parts_ledger (part_id, oem_signature, serial_hash, manufacturing_date, current_location)
+        VALUES (:part_id, 'OEM-SIG', :serial_hash, '2024-01-01', 'Warehouse-A')
+        """),
+        [{"part_id": f"BENCH-{i:06d}", "serial_hash": f"hash-{i}"} for i in range(n)]
+    )
+    db.commit()
+    return db
+
+# --- Previous implementation, kept here for comparison ---
+
+def legacy_row(row, keys):
+    if not row:
+        return None
+    return SimpleNamespace(**dict(zip(keys, row)))
+
+def legacy_convert(rows):
+    return [legacy_row(row, LEGACY_KEYS) for row in rows]
+
+def legacy_get_part(db, part_id):
+    result = db.execute(text("SELECT * FROM parts_ledger WHERE part_id = :part_id"), {"part_id": part_id}).fetchone()
+    return legacy_row(result, LEGACY_KEYS)
+
+def legacy_get_parts(db, part_ids):
+    query = text("SELECT * FROM parts_ledger WHERE part_id IN :ids").bindparams(bindparam("ids", expanding=True))
+    rows = {}
+    for start in range(0, len(part_ids), BULK_CHUNK_SIZE):
+        for row in db.execute(query, {"ids": part_ids[start:start + BULK_CHUNK_SIZE]}):
+            obj = legacy_row(row, LEGACY_KEYS)
+            rows[obj.part_id] = obj
+    return rows
+
+# --- Current implementation ---
+
+def current_convert(rows):
+    return [DatabaseQueries._row_to_obj(row, PartRow) for row in rows]
+
+def best_of(rounds: int, fn, *args) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def retained_bytes(fn, *args) -> int:
+    tracemalloc.start()
+    kept = fn(*args)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return size
+
+def main(directory: str, n: int, rounds: int):
+    row_cache.enabled = False
+    db = make_session(directory, n)
+    part_ids = [f"BENCH-{i:06d}" for i in range(n)]
+    sample = part_ids[:min(n, 2000)]
+    fetched = db.execute(text("SELECT * FROM parts_ledger WHERE part_id LIKE 'BENCH-%'")).fetchall()
+    projected = db.execute(select_rows(PartRow, "parts_ledger", "part_id LIKE 'BENCH-%'")).fetchall()
+
+    print("VeriGuardX Ledger Row Benchmark")
+    print("=" * 50)
+    print(f"Parts: {n}, best of {rounds} rounds\n")
+    print(f"{'':<10}{'previous':>16}{'current':>16}{'speed-up':>10}")
+
+    cases = [
+        ("convert", len(fetched), (legacy_convert, fetched), (current_convert, projected)),
+        ("bulk", n, (legacy_get_parts, db, part_ids), (DatabaseQueries.get_parts_by_ids, db, part_ids)),
+        ("lookup", len(sample),
+         (lambda: [legacy_get_part(db, pid) for pid in sample],),
+         (lambda: [DatabaseQueries.get_part_by_id(db, pid) for pid in sample],)),
+    ]
+    for label, count, legacy, current in cases:
+        before = best_of(rounds, *legacy)
+        after = best_of(rounds, *current)
+        print(f"{label:<10}{count / before:>10.0f} rows/s{count / after:>10.0f} rows/s{before / after:>9.2f}x")
+
+    before = retained_bytes(legacy_convert, fetched)
+    after = retained_bytes(current_convert, projected)
+    print(f"\n{n} rows held: {before / 1024:.0f} KiB as SimpleNamespace, {after / 1024:.0f} KiB as PartRow")
+
+if __name__ == "__main__":
+    n_parts = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    n_rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    with tempfile.TemporaryDirectory() as ledger_dir:
+        main(ledger_dir, n_parts, n_rounds)
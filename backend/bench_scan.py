@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Scan Throughput Benchmark for VeriGuardX
+Audits a pallet of QR-tagged parts two ways against a temporary SQLite
+ledger (Council off, no Ollama needed):
+
+  per-item  one POST /api/scan per part (the pre-batch workflow)
+  batch     one POST /api/scan/batch for the whole pallet
+
+Reports items/sec and SQL statements per item.
+
+python bench_scan.py [n_items] [concurrency]
+"""
+
+import asyncio
+import hashlib
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import httpx
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+import init_db
+from app.main import app
+from app.pipeline import scan_pipeline
+from app.tools.db import get_db
+from app.tools.ledger import crypto_ledger
+
+PER_ITEM_SAMPLE = 500  # Per-item run is extrapolated from this many scans
+
+def seed_ledger(directory: str, n: int) -> str:
+    """Ledger with n parts (valid serial hashes) and 50 couriers"""
+    path = os.path.join(directory, "supply_chain.db")
+    init_db.init_db(path)
+    conn = sqlite3.connect(path)
+    conn.executemany(
+        "INSERT INTO parts_ledger (part_id, oem_signature, serial_hash, manufacturing_date, current_location) "
+        "VALUES (?, ?, ?, ?, ?)",
+        [
+            (f"PLT-{i:06d}", "SIG", hashlib.sha256(f"PLT-{i:06d}".encode()).hexdigest(), "2024-01-01", "Warehouse-A")
+            for i in range(n)
+        ]
+    )
+    conn.executemany(
+        "INSERT INTO courier_manifest (courier_id, clearance_level, assigned_route) VALUES (?, ?, ?)",
+        [(f"DOCK-{i:02d}", "LEVEL_3", "ROUTE_1") for i in range(50)]
+    )
+    conn.commit()
+    conn.close()
+    return path
+
+def pallet(n: int) -> list:
+    return [
+        {
+            "qr_data": crypto_ledger.generate_mock_qr_data(f"PLT-{i:06d}", "OEM1"),
+            "location": "Warehouse-A",
+            "courier_id": f"DOCK-{i % 50:02d}",
+            "scan_type": "QR_SCAN"
+        }
+        for i in range(n)
+    ]
+
+async def per_item(client: httpx.AsyncClient, scans: list, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(scan):
+        async with semaphore:
+            response = await client.post("/api/scan", json=scan)
+            assert response.status_code == 200, response.text
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(scan) for scan in scans))
+    return time.perf_counter() - start
+
+async def batch(client: httpx.AsyncClient, scans: list, concurrency: int) -> float:
+    start = time.perf_counter()
+    response = await client.post(f"/api/scan/batch?concurrency={concurrency}", json={"scans": scans})
+    assert response.status_code == 200, response.text
+    assert response.json()["count"] == len(scans)
+    return time.perf_counter() - start
+
+async def main(directory: str, n: int, concurrency: int):
+    db_path = seed_ledger(directory, n)
+    engine = create_engine(f"sqlite:///{db_path}", connect_args={"check_same_thread": False})
+    statements = 0
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count(*args):
+        nonlocal statements
+        statements += 1
+
+    def session_override():
+        db = sessionmaker(bind=engine)()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = session_override
+    scan_pipeline.use_council = False
+    scans = pallet(n)
+
+    print("VeriGuardX Scan Throughput Benchmark")
+    print("=" * 50)
+    print(f"Items: {n}, concurrency: {concurrency}\n")
+
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=None) as client:
+            sample = scans[:min(PER_ITEM_SAMPLE, n)]
+            statements = 0
+            elapsed = await per_item(client, sample, concurrency)
+            print(f"{'per-item /api/scan':<20} {len(sample) / elapsed:8.0f} items/s  "
+                  f"{statements / len(sample):5.1f} SQL/item  "
+                  f"(~{elapsed * n / len(sample):.1f}s for {n})")
+
+            statements = 0
+            elapsed = await batch(client, scans, concurrency)
+            print(f"{'/api/scan/batch':<20} {n / elapsed:8.0f} items/s  "
+                  f"{statements / n:5.1f} SQL/item  ({elapsed:.1f}s for {n})")
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+        engine.dispose()
+
+if __name__ == "__main__":
+    n_items = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    n_concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 512
+    with tempfile.TemporaryDirectory() as ledger_dir:
+        asyncio.run(main(ledger_dir, n_items, n_concurrency))
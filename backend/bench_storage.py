@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Storage Benchmark for VeriGuardX
+Runs a mixed read/write load (ledger lookups and scan_history inserts)
+from several threads against two SQLite setups:
+  default  the previous engine: rollback journal, default pool, no PRAGMAs
+  tuned    WAL, synchronous=NORMAL, cache/mmap PRAGMAs, separate read and
+           write pools behind RoutingSession
+and reports operations/sec, p95 latency and writes lost to "database is
+locked". The ledger row cache is off, so every lookup reaches SQLite.
+
+python bench_storage.py [threads] [seconds] [write_percent]
+"""
+
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import init_db
+from app.tools.db import DatabaseQueries, RoutingSession, create_sqlite_engine, DB_READ_POOL_SIZE
+from app.tools.row_cache import row_cache
+
+SCAN = {
+    "part_id": "B08N5KWB9H", "location": "Warehouse-A", "latitude": None, "longitude": None,
+    "scan_type": "bench", "courier_id": "TRUSTED-001", "qr_valid": 1, "risk_level": "LOW", "verdict": "AUTHENTIC"
+}
+
+def fresh_db(directory: str, name: str) -> str:
+    path = os.path.join(directory, f"{name}.db")
+    with contextlib.redirect_stdout(io.StringIO()):
+        init_db.init_db(path)
+    return f"sqlite:///{path}"
+
+def default_sessions(directory: str):
+    engine = create_engine(fresh_db(directory, "default"), connect_args={"check_same_thread": False})
+    return sessionmaker(bind=engine)
+
+def tuned_sessions(directory: str, threads: int):
+    url = fresh_db(directory, "tuned")
+    writer = create_sqlite_engine(url)
+    reader = create_sqlite_engine(url, readonly=True, pool_size=max(threads, DB_READ_POOL_SIZE))
+    return sessionmaker(class_=RoutingSession, writer=writer, reader=reader)
+
+def worker(make_session, write_percent: int, deadline: float, results: dict, lock: threading.Lock):
+    latencies, lost = [], 0
+    rng = random.Random()
+    while time.perf_counter() < deadline:
+        db = make_session()
+        start = time.perf_counter()
+        try:
+            if rng.randrange(100) < write_percent:
+                if DatabaseQueries.record_scan(db, SCAN) is None:
+                    lost += 1
+            else:
+                DatabaseQueries.get_part_by_id(db, "B08N5KWB9H")
+                DatabaseQueries.get_courier_by_id(db, "TRUSTED-001")
+        finally:
+            db.close()
+        latencies.append(time.perf_counter() - start)
+    with lock:
+        results["latencies"].extend(latencies)
+        results["lost"] += lost
+
+def run(make_session, threads: int, seconds: float, write_percent: int):
+    results, lock = {"latencies": [], "lost": 0}, threading.Lock()
+    deadline = time.perf_counter() + seconds
+    pool = [
+        threading.Thread(target=worker, args=(make_session, write_percent, deadline, results, lock))
+        for _ in range(threads)
+    ]
+    # Lock errors are counted, not printed
+    with contextlib.redirect_stdout(io.StringIO()):
+        for t in pool:
+            t.start()
+        for t in pool:
+            t.join()
+
+    latencies = sorted(results["latencies"])
+    p95 = latencies[int(len(latencies) * 0.95)] if latencies else 0.0
+    return len(latencies) / seconds, p95, results["lost"]
+
+def main(directory: str, threads: int, seconds: float, write_percent: int):
+    row_cache.enabled = False
+    print("VeriGuardX Storage Benchmark")
+    print("=" * 50)
+    print(f"Threads: {threads}, {seconds}s per setup, {write_percent}% writes\n")
+
+    setups = (("default", default_sessions(directory)), ("tuned", tuned_sessions(directory, threads)))
+    for label, make_session in setups:
+        ops, p95, lost = run(make_session, threads, seconds, write_percent)
+        print(f"{label:<8} {ops:8.0f} ops/s  p95 {p95 * 1000:7.2f}ms  locked writes lost {lost}")
+
+if __name__ == "__main__":
+    n_threads = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    duration = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+    writes = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+    with tempfile.TemporaryDirectory() as ledger_dir:
+        main(ledger_dir, n_threads, duration, writes)
@@ -0,0 +1,134 @@
+"""
+Shared helpers and fixtures for the VeriGuardX test scripts
+
+The helpers are plain functions and context managers, so each
+test_*.py keeps working as a script (python test_x.py): main() uses them
+directly, the pytest fixtures below wrap them with tmp_path. Anything
+that swaps a global (the app's get_db dependency, llm_client's
+transport) restores the previous value on exit, even when the test fails.
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+from contextlib import asynccontextmanager, contextmanager
+from typing import List, Optional
+import httpx
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+
+import init_db
+from app.main import app
+from app.models import AgentResult
+from app.tools.db import get_db
+from app.tools.llm import llm_client
+
+class Ledgers:
+    """
+    Fresh SQLite ledgers seeded by init_db, one file each
+
+    Files live under `directory` (a temporary one, removed on close, when
+    none is given); init_db.DB_PATH and the app's own ledger are never
+    touched. Calling the object opens a session on a new ledger.
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        self._temporary = None if directory else tempfile.TemporaryDirectory()
+        self.directory = str(directory) if directory else self._temporary.name
+        self._created = 0
+        self._engines: List[Engine] = []
+        self._sessions: List[Session] = []
+
+    def path(self) -> str:
+        """Seed a new ledger and return its file path"""
+        path = os.path.join(self.directory, f"supply_chain-{self._created}.db")
+        self._created += 1
+        init_db.init_db(path)
+        return path
+
+    def sessionmaker(self, path: Optional[str] = None, **connect_args) -> sessionmaker:
+        """Sessions on the ledger at path (a new one by default)"""
+        engine = create_engine(
+            f"sqlite:///{path or self.path()}", connect_args={"check_same_thread": False, **connect_args}
+        )
+        self._engines.append(engine)
+        return sessionmaker(bind=engine)
+
+    def __call__(self) -> Session:
+        session = self.sessionmaker()()
+        self._sessions.append(session)
+        return session
+
+    def close(self) -> None:
+        for session in self._sessions:
+            session.close()
+        for engine in self._engines:
+            engine.dispose()
+        if self._temporary is not None:
+            self._temporary.cleanup()
+
+    def __enter__(self) -> "Ledgers":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+@contextmanager
+def serving(session: Session):
+    """Answer the app's get_db dependency with session"""
+    previous = app.dependency_overrides.get(get_db)
+    app.dependency_overrides[get_db] = lambda: session
+    try:
+        yield session
+    finally:
+        if previous is None:
+            app.dependency_overrides.pop(get_db, None)
+        else:
+            app.dependency_overrides[get_db] = previous
+
+@asynccontextmanager
+async def simulated_ollama(handler):
+    """Send llm_client's requests to handler (an httpx.MockTransport handler)"""
+    previous = llm_client.transport
+    llm_client.transport = httpx.MockTransport(handler)
+    # Pooled clients were built on the old transport
+    await llm_client.close()
+    try:
+        yield llm_client
+    finally:
+        await llm_client.close()
+        llm_client.transport = previous
+
+def fake_ollama(content: str, delay: float = 0, **fields):
+    """
+    A simulated Ollama server answering every request with content
+
+    /api/chat replies carry it as the assistant message, /api/generate as
+    the response; `fields` (token counts, durations) are added to the body.
+    """
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if delay:
+            await asyncio.sleep(delay)
+        body = {"model": json.loads(request.content).get("model"), "done": True, **fields}
+        if request.url.path.endswith("/api/chat"):
+            body["message"] = {"role": "assistant", "content": content}
+        else:
+            body["response"] = content
+        return httpx.Response(200, json=body)
+    return handler
+
+async def no_marketplace(db, request, route):
+    """Marketplace runner that passes without calling out to the marketplace LLM"""
+    return AgentResult(agent_name="Marketplace Agent", passed=True, confidence=0.95, details={})
+
+@pytest.fixture
+def ledgers(tmp_path):
+    with Ledgers(tmp_path) as opened:
+        yield opened
+
+@pytest.fixture
+def ledger(ledgers) -> Session:
+    return ledgers()
@@ -9,10 +9,52 @@ DB_PATH = os.path.join(BASE_DIR, "app", "data", "supply_chain.db")
 # Ensure directory exists
 os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
 
-def init_db():
-    print(f"⚡ Initializing Database at: {DB_PATH}...")
+# A postgresql+psycopg:// URL primes that database instead (see app/tools/db.py)
+DATABASE_URL = os.getenv("DATABASE_URL", "")
+
+# Same tables as the SQLite ledger, in PostgreSQL types
+POSTGRES_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS parts_ledger (
+        id SERIAL PRIMARY KEY,
+        part_id TEXT UNIQUE NOT NULL,
+        oem_signature TEXT,
+        serial_hash TEXT,
+        manufacturing_date TEXT,
+        current_location TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS courier_manifest (
+        id SERIAL PRIMARY KEY,
+        courier_id TEXT UNIQUE NOT NULL,
+        clearance_level TEXT,
+        assigned_route TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS scan_history (
+        scan_id BIGSERIAL PRIMARY KEY,
+        part_id TEXT NOT NULL,
+        location TEXT,
+        latitude DOUBLE PRECISION,
+        longitude DOUBLE PRECISION,
+        scan_type TEXT,
+        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        courier_id TEXT,
+        qr_valid BOOLEAN,
+        risk_level TEXT,
+        verdict TEXT
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_scan_part ON scan_history(part_id)"
+]
+
+def init_db(path: str = ""):
+    path = path or DB_PATH
+    print(f"⚡ Initializing Database at: {path}...")
     
-    conn = sqlite3.connect(DB_PATH)
+    conn = sqlite3.connect(path)
     cursor = conn.cursor()
 
     # Table: parts_ledger
@@ -37,6 +79,23 @@ def init_db():
     )
     """)
 
+    # Table: scan_history (audit trail written by the /api/scan pipeline)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS scan_history (
+        scan_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        part_id TEXT NOT NULL,
+        location TEXT,
+        latitude REAL,
+        longitude REAL,
+        scan_type TEXT,
+        timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
+        courier_id TEXT,
+        qr_valid INTEGER,
+        risk_level TEXT,
+        verdict TEXT
+    )
+    """)
+
     # Insert Demo Data
     try:
         cursor.execute("""
@@ -60,5 +119,35 @@ def init_db():
     conn.close()
     print("\n🚀 Database successfully primed! You are ready to record.")
 
+def init_postgres(url: str = DATABASE_URL):
+    print(f"⚡ Initializing PostgreSQL database at: {url.rsplit('@', 1)[-1]}...")
+
+    from sqlalchemy import create_engine, text
+    engine = create_engine(url)
+    with engine.begin() as conn:
+        for statement in POSTGRES_SCHEMA:
+            conn.execute(text(statement))
+
+        # Insert Demo Data
+        added = conn.execute(text("""
+        INSERT INTO parts_ledger (part_id, oem_signature, serial_hash, manufacturing_date, current_location)
+        VALUES ('B08N5KWB9H', 'SONY-SIG-998877', 'HASH-1234-ABCD', '2023-11-15', 'Warehouse-A')
+        ON CONFLICT (part_id) DO NOTHING
+        """)).rowcount
+        print("   ✅ Added Demo Item: Sony Alpha 7 IV (B08N5KWB9H)" if added else "   ℹ️  Demo Item already exists.")
+
+        added = conn.execute(text("""
+        INSERT INTO courier_manifest (courier_id, clearance_level, assigned_route)
+        VALUES ('TRUSTED-001', 'LEVEL_5', 'ROUTE_66')
+        ON CONFLICT (courier_id) DO NOTHING
+        """)).rowcount
+        print("   ✅ Added Trusted Courier: TRUSTED-001" if added else "   ℹ️  Courier already exists.")
+
+    engine.dispose()
+    print("\n🚀 Database successfully primed! You are ready to record.")
+
 if __name__ == "__main__":
-    init_db()
\ No newline at end of file
+    if DATABASE_URL.startswith("postgresql"):
+        init_postgres()
+    else:
+        init_db()
\ No newline at end of file
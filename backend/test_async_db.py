@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Async Repository Test Script for VeriGuardX
+Checks that AsyncDatabaseQueries returns the same ledger rows as the sync
+DatabaseQueries, that async sessions open on the same database as the
+sync session they are given, that batch prefetches are honoured, and
+that a scan gives the same verdict whether its agents await the async
+repository or run their sync checks in the thread pool.
+
+Runs against a temporary SQLite ledger, no backend needed:
+python test_async_db.py
+"""
+
+import asyncio
+from sqlalchemy import event
+
+from app.models import ScanRequest
+from app.pipeline import ScanPipeline
+from app.tools.async_db import AsyncDatabase, AsyncDatabaseQueries, async_url
+from app.tools.db import DatabaseQueries, prefetched_rows, get_db_context
+from conftest import Ledgers, no_marketplace
+
+async def run_lookup_test(db):
+    database = AsyncDatabase()
+    async with database.session(db) as session:
+        part = await AsyncDatabaseQueries.get_part_by_id(session, "B08N5KWB9H")
+        courier = await AsyncDatabaseQueries.get_courier_by_id(session, "TRUSTED-001")
+        ghost = await AsyncDatabaseQueries.get_part_by_id(session, "GHOST-SKU-999")
+        bulk = await AsyncDatabaseQueries.get_parts_by_ids(session, ["B08N5KWB9H", "GHOST-SKU-999"])
+    await database.close()
+    return part, courier, ghost, bulk
+
+async def run_prefetch_test(db):
+    database = AsyncDatabase()
+    async with database.session(db) as session:
+        statements = []
+        event.listen(session.sync_session.reader, "before_cursor_execute", lambda *args: statements.append(args[2]))
+        with prefetched_rows(db, part_ids=["B08N5KWB9H"]):
+            part = await AsyncDatabaseQueries.get_part_by_id(session, "B08N5KWB9H")
+    await database.close()
+    return part, statements
+
+async def run_scan(db, async_db: bool):
+    pipeline = ScanPipeline(use_council=False, async_db=async_db)
+    pipeline.runners["marketplace"] = no_marketplace
+    known = await pipeline.run(db, ScanRequest(part_id="B08N5KWB9H", location="Warehouse-A", courier_id="TRUSTED-001"))
+    ghost = await pipeline.run(db, ScanRequest(part_id="GHOST-SKU-999", location="Warehouse-A", courier_id="TRUSTED-001"))
+    pipeline.shutdown()
+    return known, ghost
+
+def test_async_lookups_match_sync(ledger):
+    part, courier, ghost, bulk = asyncio.run(run_lookup_test(ledger))
+
+    assert part == DatabaseQueries.get_part_by_id(ledger, "B08N5KWB9H")
+    assert courier == DatabaseQueries.get_courier_by_id(ledger, "TRUSTED-001")
+    assert ghost is None
+    assert list(bulk) == ["B08N5KWB9H"]
+
+def test_prefetched_rows_skip_the_query(ledger):
+    part, statements = asyncio.run(run_prefetch_test(ledger))
+
+    assert part.serial_hash == "HASH-1234-ABCD"
+    assert statements == []
+
+def test_async_and_threaded_agents_agree(ledgers):
+    async_known, async_ghost = asyncio.run(run_scan(ledgers(), async_db=True))
+    pool_known, pool_ghost = asyncio.run(run_scan(ledgers(), async_db=False))
+
+    assert async_known.verdict.verdict == pool_known.verdict.verdict
+    assert async_known.risk_score.risk_level == pool_known.risk_score.risk_level
+    assert async_ghost.short_circuit["rule"] == pool_ghost.short_circuit["rule"] == "PART_NOT_FOUND"
+    for name in ("Identity Agent", "Provenance Agent", "Courier Agent"):
+        async_result, pool_result = async_known.agent_results[name], pool_known.agent_results[name]
+        assert (async_result.passed, async_result.details) == (pool_result.passed, pool_result.details)
+
+def test_async_urls_and_sync_adapter():
+    assert str(async_url("sqlite:///ledger.db")) == "sqlite+aiosqlite:///ledger.db"
+    assert async_url("postgresql://u:p@db/ledger").drivername == "postgresql+asyncpg"
+    with get_db_context() as db:
+        assert db.is_active
+
+def main():
+    print("VeriGuardX Async Repository Test")
+    print("=" * 50)
+    with Ledgers() as ledgers:
+        part, courier, _, _ = asyncio.run(run_lookup_test(ledgers()))
+        print(f"Part: {part}")
+        print(f"Courier: {courier}")
+        known, _ = asyncio.run(run_scan(ledgers(), async_db=True))
+        print(f"Scan verdict (async agents): {known.verdict.verdict.value}")
+
+if __name__ == "__main__":
+    main()
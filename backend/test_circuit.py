@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Ollama Circuit Breaker Test Script for VeriGuardX
+Checks that after OLLAMA_FAILURE_THRESHOLD failed generations the circuit
+opens and LLM endpoints answer 503 without contacting Ollama, that once
+the recovery timeout passes exactly one trial request is let through
+while the others keep failing fast, and that the trial's outcome closes
+or re-opens the circuit. Also checks that a trial ending any other way
+(an unexpected error before Ollama answers, on a plain or a streamed
+call) gives the trial back, and that a stream consumer stopping early
+still leaves the outcome recorded.
+
+Runs in-process against a simulated Ollama server, no backend needed:
+python test_circuit.py
+"""
+
+import asyncio
+import itertools
+import json
+from contextlib import asynccontextmanager
+import httpx
+
+from app.main import app
+from app.tools.health import CircuitBreaker, CircuitState
+from app.tools.llm import llm_client
+from conftest import simulated_ollama
+
+FAILURE_THRESHOLD = 3
+_couriers = itertools.count()
+
+class FlakyOllama:
+    """A simulated Ollama server that refuses connections while `down`"""
+
+    def __init__(self, delay: float = 0):
+        self.down = True
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.calls += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.down:
+            raise httpx.ConnectError("Connection refused", request=request)
+        body = {"model": json.loads(request.content).get("model"), "done": True}
+        body["message"] = {"role": "assistant", "content": "IDENTITY_VERIFIED"}
+        return httpx.Response(200, json=body)
+
+@asynccontextmanager
+async def breaker_client(ollama: FlakyOllama, breaker: CircuitBreaker):
+    """An app client whose LLM calls go to ollama through breaker"""
+    previous = llm_client.breaker
+    llm_client.breaker = breaker
+    try:
+        async with simulated_ollama(ollama):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                yield client
+    finally:
+        llm_client.breaker = previous
+
+def identify(client: httpx.AsyncClient):
+    # A new payload every call, so the response cache never answers for Ollama
+    return client.post("/api/identity_agent", json={"courier": f"circuit-{next(_couriers)}"})
+
+async def run_open_test():
+    """Ollama is down: the threshold'th failure opens the circuit"""
+    ollama = FlakyOllama()
+    breaker = CircuitBreaker(failure_threshold=FAILURE_THRESHOLD, recovery_timeout=60)
+    async with breaker_client(ollama, breaker) as client:
+        failures = [await identify(client) for _ in range(FAILURE_THRESHOLD)]
+        calls_when_opened = ollama.calls
+        rejected = await identify(client)
+    return failures, calls_when_opened, rejected, ollama.calls, breaker.state
+
+async def run_half_open_test(recovers: bool):
+    """The recovery timeout has passed: concurrent requests race for the trial"""
+    ollama = FlakyOllama(delay=0.2)
+    breaker = CircuitBreaker(failure_threshold=FAILURE_THRESHOLD, recovery_timeout=0)
+    for _ in range(FAILURE_THRESHOLD):
+        breaker.record_failure()
+    ollama.down = not recovers
+    async with breaker_client(ollama, breaker) as client:
+        responses = await asyncio.gather(*(identify(client) for _ in range(4)))
+    return [r.status_code for r in responses], ollama.calls, breaker.state
+
+def half_open_breaker() -> CircuitBreaker:
+    breaker = CircuitBreaker(failure_threshold=FAILURE_THRESHOLD, recovery_timeout=0)
+    for _ in range(FAILURE_THRESHOLD):
+        breaker.record_failure()
+    return breaker
+
+async def broken_transport(request: httpx.Request) -> httpx.Response:
+    raise RuntimeError("transport bug")
+
+async def run_trial_error_test(stream: bool):
+    """The half-open trial fails with an error that says nothing about Ollama"""
+    breaker = half_open_breaker()
+    messages = [{"role": "user", "content": f"circuit-{next(_couriers)}"}]
+    async with breaker_client(broken_transport, breaker):
+        try:
+            if stream:
+                async for _ in llm_client.chat_stream("llama3", messages):
+                    pass
+            else:
+                await llm_client.chat("llama3", messages)
+        except RuntimeError as e:
+            error = str(e)
+    return error, breaker.state, breaker.allow_request()
+
+async def run_early_stop_test():
+    """The half-open trial is a stream whose consumer stops after one chunk"""
+    ollama = FlakyOllama()
+    ollama.down = False
+    breaker = half_open_breaker()
+    async with breaker_client(ollama, breaker):
+        chunks = llm_client.chat_stream("llama3", [{"role": "user", "content": f"circuit-{next(_couriers)}"}])
+        await chunks.__anext__()
+        await chunks.aclose()
+    return breaker.state, breaker.allow_request()
+
+def test_threshold_failures_open_circuit_and_skip_ollama():
+    failures, calls_when_opened, rejected, calls, state = asyncio.run(run_open_test())
+
+    assert [r.status_code for r in failures] == [503] * FAILURE_THRESHOLD
+    assert calls_when_opened == FAILURE_THRESHOLD
+    assert state == CircuitState.OPEN
+    assert rejected.status_code == 503
+    assert "circuit open" in rejected.json()["detail"]
+    assert calls == FAILURE_THRESHOLD, "open circuit still sent the request to Ollama"
+
+def test_half_open_lets_one_trial_through_and_closes():
+    codes, calls, state = asyncio.run(run_half_open_test(recovers=True))
+
+    assert calls == 1
+    assert sorted(codes) == [200, 503, 503, 503]
+    assert state == CircuitState.CLOSED
+
+def test_failed_trial_reopens_circuit():
+    codes, calls, state = asyncio.run(run_half_open_test(recovers=False))
+
+    assert calls == 1
+    assert codes == [503] * 4
+    assert state == CircuitState.OPEN
+
+def test_unexpected_error_releases_trial():
+    for stream in (False, True):
+        error, state, trial_free = asyncio.run(run_trial_error_test(stream))
+
+        assert error == "transport bug"
+        assert state == CircuitState.HALF_OPEN
+        assert trial_free, f"trial left in flight (stream={stream})"
+
+def test_stream_stopped_early_records_trial():
+    state, allowed = asyncio.run(run_early_stop_test())
+
+    assert state == CircuitState.CLOSED
+    assert allowed
+
+def main():
+    print("VeriGuardX Ollama Circuit Breaker Test")
+    print("=" * 50)
+    failures, _, rejected, calls, state = asyncio.run(run_open_test())
+    print(f"Ollama down: {[r.status_code for r in failures]}, circuit {state.value}")
+    print(f"Next call: {rejected.status_code} ({rejected.json()['detail']}), Ollama calls: {calls}")
+
+    codes, calls, state = asyncio.run(run_half_open_test(recovers=True))
+    print(f"\nHalf-open, Ollama back: {codes}, Ollama calls: {calls}, circuit {state.value}")
+    codes, calls, state = asyncio.run(run_half_open_test(recovers=False))
+    print(f"Half-open, Ollama still down: {codes}, Ollama calls: {calls}, circuit {state.value}")
+    for stream in (False, True):
+        _, state, trial_free = asyncio.run(run_trial_error_test(stream))
+        print(f"Trial {'stream ' if stream else ''}fails unexpectedly: circuit {state.value}, trial free: {trial_free}")
+
+if __name__ == "__main__":
+    main()
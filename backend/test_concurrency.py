@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+LLM Concurrency Test Script for VeriGuardX
+Verifies that slow Ollama generations do not block the event loop:
+the health route must stay fast while N generations are in flight.
+Also checks that identical in-flight requests share one generation and
+that a full model queue answers 429 with Retry-After.
+
+Runs in-process against a simulated Ollama server, no backend needed:
+python test_concurrency.py
+"""
+
+import asyncio
+import json
+import time
+import httpx
+
+from app.main import app
+from app.tools.llm import llm_client, OllamaClient
+from app.tools.health import CircuitBreaker
+from app.tools.scheduler import InferenceScheduler, Priority
+from conftest import fake_ollama, simulated_ollama
+
+GENERATION_DELAY = 1.0  # Simulated seconds per generation
+N_GENERATIONS = 8
+HEALTH_BUDGET = 0.25  # Max acceptable health-check latency while loaded
+
+# Simulated Ollama server: every generation takes GENERATION_DELAY
+slow_ollama = fake_ollama("FLAG: safe", delay=GENERATION_DELAY)
+
+async def run_load_test():
+    """Fire N generations and poll health while they run"""
+    transport = httpx.ASGITransport(app=app)
+    async with simulated_ollama(slow_ollama):
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            start = time.perf_counter()
+            generations = [
+                asyncio.create_task(client.post("/api/identity_agent", json={"user": f"courier-{i}"}))
+                for i in range(N_GENERATIONS)
+            ]
+
+            # Let the generations start before probing health
+            await asyncio.sleep(0.1)
+            health_latencies = []
+            while not all(task.done() for task in generations):
+                probe_start = time.perf_counter()
+                response = await client.get("/")
+                health_latencies.append(time.perf_counter() - probe_start)
+                assert response.status_code == 200
+                await asyncio.sleep(0.05)
+
+            responses = await asyncio.gather(*generations)
+            total = time.perf_counter() - start
+    return responses, health_latencies, total
+
+def test_health_stays_fast_under_llm_load():
+    responses, health_latencies, total = asyncio.run(run_load_test())
+
+    assert all(r.status_code == 200 for r in responses)
+    assert health_latencies, "health route was never probed"
+    assert max(health_latencies) < HEALTH_BUDGET, f"health p100 {max(health_latencies):.3f}s"
+    # Generations must overlap, not run back to back
+    assert total < GENERATION_DELAY * N_GENERATIONS / 2, f"generations serialized ({total:.2f}s)"
+
+async def run_coalescing_test(cancel_one: bool):
+    """Fire N identical requests against a counting Ollama stub"""
+    upstream_calls = 0
+
+    async def counting_ollama(request: httpx.Request) -> httpx.Response:
+        nonlocal upstream_calls
+        upstream_calls += 1
+        await asyncio.sleep(GENERATION_DELAY / 4)
+        return httpx.Response(200, json={"message": {"role": "assistant", "content": "CHAIN_VERIFIED"}})
+
+    client = OllamaClient(transport=httpx.MockTransport(counting_ollama), breaker=CircuitBreaker())
+    messages = [{"role": "user", "content": "Verify the custody chain for PX-99-AF"}]
+    waiters = [asyncio.create_task(client.chat("llama3", messages)) for _ in range(N_GENERATIONS)]
+
+    if cancel_one:
+        # The first caller disconnects mid-generation
+        await asyncio.sleep(0.05)
+        waiters[0].cancel()
+
+    results = await asyncio.gather(*waiters, return_exceptions=True)
+    await client.close()
+    return upstream_calls, results
+
+def test_identical_requests_share_one_generation():
+    upstream_calls, results = asyncio.run(run_coalescing_test(cancel_one=False))
+
+    assert upstream_calls == 1
+    assert all(r["message"]["content"] == "CHAIN_VERIFIED" for r in results)
+
+def test_cancelled_waiter_does_not_cancel_shared_call():
+    upstream_calls, results = asyncio.run(run_coalescing_test(cancel_one=True))
+
+    assert upstream_calls == 1
+    assert isinstance(results[0], asyncio.CancelledError)
+    assert all(r["message"]["content"] == "CHAIN_VERIFIED" for r in results[1:])
+
+async def run_backpressure_test():
+    """One slot and a two-deep queue: the 4th and 5th distinct requests must bounce"""
+    default_scheduler = llm_client.scheduler
+    llm_client.scheduler = InferenceScheduler(default_limit=1, max_queue=2)
+
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with simulated_ollama(slow_ollama):
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                tasks = []
+                for i in range(5):
+                    tasks.append(asyncio.create_task(client.post("/api/provenance_agent", json={"pallet": i})))
+                    await asyncio.sleep(0.01)
+                responses = await asyncio.gather(*tasks)
+    finally:
+        llm_client.scheduler = default_scheduler
+    return responses
+
+async def run_priority_test():
+    """Interactive work queued behind pipeline work must be admitted first"""
+    scheduler = InferenceScheduler(default_limit=1, max_queue=8)
+    order = []
+
+    async def job(name: str, priority: Priority):
+        async with scheduler.slot("llama3", priority):
+            order.append(name)
+            await asyncio.sleep(0.01)
+
+    holder = asyncio.create_task(job("holder", Priority.PIPELINE))
+    await asyncio.sleep(0)
+    queued = [asyncio.create_task(job(f"pipeline-{i}", Priority.PIPELINE)) for i in range(3)]
+    await asyncio.sleep(0)
+    chat = asyncio.create_task(job("chat", Priority.INTERACTIVE))
+    await asyncio.gather(holder, chat, *queued)
+    return order
+
+def test_full_queue_returns_429_with_retry_after():
+    responses = asyncio.run(run_backpressure_test())
+    codes = sorted(r.status_code for r in responses)
+
+    assert codes == [200, 200, 200, 429, 429]
+    assert all(r.headers.get("retry-after") for r in responses if r.status_code == 429)
+
+def test_interactive_priority_jumps_pipeline_queue():
+    order = asyncio.run(run_priority_test())
+
+    assert order[:2] == ["holder", "chat"]
+
+def main():
+    print("VeriGuardX LLM Concurrency Test")
+    print("=" * 50)
+    responses, health_latencies, total = asyncio.run(run_load_test())
+
+    print(f"Generations: {N_GENERATIONS} x {GENERATION_DELAY}s simulated")
+    print(f"Wall time: {total:.2f}s")
+    print(f"Health probes: {len(health_latencies)}, max latency {max(health_latencies) * 1000:.1f}ms")
+    print(json.dumps(responses[0].json())[:80])
+
+    if max(health_latencies) < HEALTH_BUDGET and total < GENERATION_DELAY * N_GENERATIONS / 2:
+        print("✅ PASS: Event loop stays responsive while generations run")
+    else:
+        print("❌ FAIL: Event loop blocked by LLM calls")
+
+    upstream_calls, results = asyncio.run(run_coalescing_test(cancel_one=True))
+    survivors = [r for r in results[1:] if isinstance(r, dict)]
+    print(f"\nIdentical requests: {N_GENERATIONS}, upstream generations: {upstream_calls}")
+    if upstream_calls == 1 and len(survivors) == N_GENERATIONS - 1:
+        print("✅ PASS: Requests coalesced; cancelled waiter did not kill the shared call")
+    else:
+        print("❌ FAIL: Requests were not coalesced correctly")
+
+    responses = asyncio.run(run_backpressure_test())
+    codes = [r.status_code for r in responses]
+    print(f"\nBurst of 5 with 1 slot + queue of 2: {codes}")
+    if sorted(codes) == [200, 200, 200, 429, 429]:
+        print("✅ PASS: Full queue sheds load with 429 + Retry-After")
+    else:
+        print("❌ FAIL: Queue did not apply backpressure")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Configuration Test Script for VeriGuardX
+Checks that settings written in a .env file reach the modules that read
+them at import time (the ledger's DATABASE_URL, the LLM response and row
+cache TTLs, the inference scheduler's per-model limits, the SQLite
+PRAGMAs run on each ledger connection), which only holds when app.main
+loads .env before importing them.
+
+Each check imports the app in a fresh interpreter started in a temporary
+directory holding the .env, no backend needed:
+python test_config.py
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+BACKEND = os.path.dirname(os.path.abspath(__file__))
+
+DOTENV = {
+    "DATABASE_URL": "sqlite:///dotenv-ledger.db",
+    "LLM_CACHE_TTL": "42",
+    "LEDGER_CACHE_TTL": "7",
+    "OLLAMA_NUM_PARALLEL": "9",
+    "OLLAMA_MODEL_PARALLEL": "llama3=3,moondream=1",
+    "SQLITE_BUSY_TIMEOUT_MS": "1234",
+    "SQLITE_SYNCHRONOUS": "FULL",
+    "SQLITE_CACHE_SIZE_KB": "2048"
+}
+# Module attributes read once app.main is imported, with the value expected from DOTENV
+SETTINGS = {
+    "app.tools.db.DATABASE_URL": "sqlite:///dotenv-ledger.db",
+    "app.tools.cache.LLM_CACHE_TTL": 42.0,
+    "app.tools.row_cache.LEDGER_CACHE_TTL": 7.0
+}
+# The shared inference scheduler is built at import time from the OLLAMA_* limits
+SCHEDULER = {
+    "app.tools.scheduler.inference_scheduler.default_limit": 9,
+    "app.tools.scheduler.inference_scheduler.model_limits": {"llama3": 3, "moondream": 1},
+    "app.tools.llm.llm_client.scheduler is app.tools.scheduler.inference_scheduler": True
+}
+# PRAGMAs as a new connection of the ledger's writer engine reports them
+PRAGMA = "app.tools.db.engine.connect().exec_driver_sql('PRAGMA {}').scalar()"
+SQLITE = {
+    "app.tools.db.SQLITE_BUSY_TIMEOUT_MS": 1234,
+    PRAGMA.format("busy_timeout"): 1234,
+    PRAGMA.format("synchronous"): 2,  # FULL
+    PRAGMA.format("cache_size"): -2048
+}
+
+def settings_from_dotenv(directory: str, dotenv: dict, names) -> dict:
+    """
+    Import app.main in a new interpreter whose working directory holds a
+    .env, and evaluate each of names (dotted expressions under app) there
+    """
+    with open(os.path.join(directory, ".env"), "w") as f:
+        f.writelines(f"{key}={value}\n" for key, value in dotenv.items())
+    script = "\n".join([
+        "import json",
+        "import app.main",
+        "print(json.dumps({name: eval(name) for name in %r}))" % list(names)
+    ])
+    # Variables already in the environment win over .env, so leave them out
+    env = {key: value for key, value in os.environ.items() if key not in dotenv}
+    env["PYTHONPATH"] = BACKEND
+    # python -c has no script path, so load_dotenv() searches from the working directory
+    result = subprocess.run(
+        [sys.executable, "-c", script], cwd=directory, env=env,
+        capture_output=True, text=True, timeout=120
+    )
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def test_dotenv_settings_reach_app_modules(tmp_path):
+    assert settings_from_dotenv(str(tmp_path), DOTENV, SETTINGS) == SETTINGS
+
+def test_scheduler_limits_come_from_dotenv(tmp_path):
+    assert settings_from_dotenv(str(tmp_path), DOTENV, SCHEDULER) == SCHEDULER
+
+def test_sqlite_pragmas_come_from_dotenv(tmp_path):
+    assert settings_from_dotenv(str(tmp_path), DOTENV, SQLITE) == SQLITE
+
+def main():
+    print("VeriGuardX Configuration Test")
+    print("=" * 50)
+    with tempfile.TemporaryDirectory() as directory:
+        expected = {**SETTINGS, **SCHEDULER, **SQLITE}
+        values = settings_from_dotenv(directory, DOTENV, expected)
+    for name, value in values.items():
+        print(f"{name} = {value!r} (expected {expected[name]!r})")
+
+if __name__ == "__main__":
+    main()
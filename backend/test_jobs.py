@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Audit Job Test Script for VeriGuardX
+Checks that POST /api/scan/jobs answers 202 at once while the audit runs
+in the background, that clients can poll, long-poll or receive a webhook
+callback, and that a job interrupted by a shutdown finishes after the
+next start. With two queues on one database (two uvicorn workers), a
+job runs exactly once: a live worker's job is never taken over, while
+one left behind by a dead worker is picked up once its lease expires.
+Also checks that long-polls which time out leave nothing behind, and
+that a long-poll wakes for a job finishing during its first status read
+or finished by a sibling queue.
+
+Runs in-process against a temporary SQLite database, no backend needed:
+python test_jobs.py
+"""
+
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
+import httpx
+
+from app.main import app
+from app.models import AgentResult, ScanRequest
+from app.pipeline import ScanPipeline
+from app.tools.db import DatabaseQueries
+from app.tools.jobs import JobQueue, job_queue
+from conftest import Ledgers
+
+AUDIT_DELAY = 0.5
+
+def visual_scan() -> dict:
+    return ScanRequest(
+        part_id="B08N5KWB9H", location="Warehouse-A", courier_id="TRUSTED-001",
+        scan_type="VISUAL_INSPECTION", user_description="Scuffed box, logo misaligned"
+    ).model_dump()
+
+def slow_runner(delay: float):
+    """A scan whose visual agent takes `delay` seconds (no Ollama involved)"""
+    pipeline = ScanPipeline(use_council=False)
+
+    async def visual(db, request, route):
+        await asyncio.sleep(delay)
+        return AgentResult(agent_name="Visual Agent", passed=True, confidence=90, details={"verdict": "AUTHENTIC"})
+
+    pipeline.runners["visual"] = visual
+    return pipeline.run
+
+@asynccontextmanager
+async def app_job_queue(factory, runner):
+    """The app's job_queue started on factory's ledger, stopped and restored afterwards"""
+    default_factory = job_queue.session_factory
+    job_queue.session_factory = factory
+    try:
+        await job_queue.start(runner)
+        yield job_queue
+    finally:
+        await job_queue.stop()
+        job_queue.session_factory = default_factory
+
+async def run_poll_test(factory):
+    transport = httpx.ASGITransport(app=app)
+    async with app_job_queue(factory, slow_runner(AUDIT_DELAY)):
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            start = time.perf_counter()
+            submitted = await client.post("/api/scan/jobs", json=visual_scan())
+            submit_time = time.perf_counter() - start
+
+            status_url = submitted.headers["location"]
+            polled = await client.get(status_url)
+            finished = await client.get(f"{status_url}?wait=5")
+            missing = await client.get("/api/scan/jobs/nope")
+    return submitted, submit_time, polled, finished, missing
+
+async def run_restart_test(factory):
+    first = JobQueue(workers=1, session_factory=factory)
+    await first.start(slow_runner(60))
+    job = await first.submit(ScanRequest(**visual_scan()))
+    await asyncio.sleep(0.1)
+    interrupted = await first.get(job["job_id"])
+    await first.stop()
+
+    second = JobQueue(workers=1, session_factory=factory)
+    await second.start(slow_runner(0))
+    finished = await second.wait(job["job_id"], 5)
+    await second.stop()
+    return interrupted, finished
+
+def counting_runner(runs: list, delay: float = 0):
+    run = slow_runner(delay)
+
+    async def counted(db, request):
+        runs.append(request.part_id)
+        return await run(db, request)
+    return counted
+
+async def run_sibling_test(factory):
+    """Worker B starts while worker A is still running a job"""
+    a = JobQueue(workers=1, session_factory=factory)
+    await a.start(slow_runner(60))
+    job = await a.submit(ScanRequest(**visual_scan()))
+    await asyncio.sleep(0.1)
+
+    runs = []
+    b = JobQueue(workers=1, session_factory=factory, lease=0.2)
+    await b.start(counting_runner(runs))
+    await asyncio.sleep(0.5)
+    db = factory()
+    row = DatabaseQueries.get_job(db, job["job_id"])
+    db.close()
+    await b.stop()
+    await a.stop()
+    return runs, row, a.owner
+
+async def run_expired_lease_test(factory):
+    """A job left RUNNING by a worker that died without releasing it"""
+    jobs = JobQueue(workers=0, session_factory=factory)
+    await jobs.start(slow_runner(0))
+    job = await jobs.submit(ScanRequest(**visual_scan()))
+    db = factory()
+    DatabaseQueries.update_job(
+        db, job["job_id"], status="RUNNING", owner="dead-host:1:0", lease_expires_at="2000-01-01 00:00:00"
+    )
+    db.close()
+
+    runs = []
+    survivor = JobQueue(workers=1, session_factory=factory)
+    await survivor.start(counting_runner(runs))
+    finished = await survivor.wait(job["job_id"], 5)
+    await survivor.stop()
+    await jobs.stop()
+    return runs, finished
+
+async def run_double_claim_test(factory):
+    """Two queues that both have the same QUEUED job in their local queue"""
+    seed = JobQueue(workers=0, session_factory=factory)
+    await seed.start(slow_runner(0))
+    job = await seed.submit(ScanRequest(**visual_scan()))
+
+    runs = []
+    queues = [JobQueue(workers=1, session_factory=factory) for _ in range(2)]
+    for queue in queues:
+        await queue.start(counting_runner(runs, 0.2))
+    finished = await queues[0].wait(job["job_id"], 5)
+    for queue in queues + [seed]:
+        await queue.stop()
+    return runs, finished
+
+async def run_wait_timeout_test(factory):
+    jobs = JobQueue(workers=1, session_factory=factory)
+    await jobs.start(slow_runner(60))
+    job = await jobs.submit(ScanRequest(**visual_scan()))
+    polls = await asyncio.gather(*(jobs.wait(job["job_id"], 0.1) for _ in range(3)))
+    leftover = dict(jobs._finished), dict(jobs._waiters)
+    await jobs.stop()
+    return polls, leftover
+
+async def run_finish_during_read_test(factory):
+    """The job finishes while wait() is reading its status for the first time"""
+    jobs = JobQueue(workers=0, session_factory=factory)
+    await jobs.start(slow_runner(0))
+    job = await jobs.submit(ScanRequest(**visual_scan()))
+    read = jobs.get
+
+    async def get_then_finish(job_id):
+        before = await read(job_id)
+        if before["status"] == "QUEUED":
+            await jobs._run_job(job_id)
+        return before
+
+    jobs.get = get_then_finish
+    start = time.perf_counter()
+    finished = await jobs.wait(job["job_id"], 5)
+    elapsed = time.perf_counter() - start
+    await jobs.stop()
+    return finished, elapsed
+
+async def run_sibling_finish_test(factory):
+    """A long-poll on one queue for a job another queue runs"""
+    poller = JobQueue(workers=0, session_factory=factory, poll_interval=0.1)
+    await poller.start(slow_runner(0))
+    job = await poller.submit(ScanRequest(**visual_scan()))
+
+    sibling = JobQueue(workers=1, session_factory=factory)
+    await sibling.start(slow_runner(0.2))
+    start = time.perf_counter()
+    finished = await poller.wait(job["job_id"], 5)
+    elapsed = time.perf_counter() - start
+    await sibling.stop()
+    await poller.stop()
+    return finished, elapsed
+
+async def run_callback_test(factory):
+    delivered = []
+
+    async def webhook(request: httpx.Request) -> httpx.Response:
+        delivered.append((str(request.url), json.loads(request.content)))
+        return httpx.Response(204)
+
+    jobs = JobQueue(session_factory=factory, transport=httpx.MockTransport(webhook))
+    await jobs.start(slow_runner(0))
+    job = await jobs.submit(ScanRequest(**visual_scan()), "http://localhost:9000/hooks/audit")
+    await jobs.wait(job["job_id"], 5)
+    await asyncio.sleep(0.1)
+    final = await jobs.get(job["job_id"])
+    await jobs.stop()
+    return delivered, final
+
+async def run_rejected_callback_test(factory):
+    transport = httpx.ASGITransport(app=app)
+    async with app_job_queue(factory, slow_runner(0)):
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.post(
+                "/api/scan/jobs", params={"callback_url": "http://169.254.169.254/latest"}, json=visual_scan()
+            )
+    return response
+
+def test_submit_returns_202_and_long_poll_gets_result(ledgers):
+    submitted, submit_time, polled, finished, missing = asyncio.run(run_poll_test(ledgers.sessionmaker()))
+
+    assert submitted.status_code == 202
+    assert submit_time < AUDIT_DELAY, f"submit waited for the audit ({submit_time:.2f}s)"
+    assert polled.json()["status"] in ("QUEUED", "RUNNING")
+    assert finished.json()["status"] == "DONE"
+    assert finished.json()["result"]["part_id"] == "B08N5KWB9H"
+    assert missing.status_code == 404
+
+def test_interrupted_job_resumes_after_restart(ledgers):
+    interrupted, finished = asyncio.run(run_restart_test(ledgers.sessionmaker()))
+
+    assert interrupted["status"] == "RUNNING"
+    assert finished["status"] == "DONE"
+
+def test_live_workers_job_is_not_taken_over(ledgers):
+    runs, row, owner = asyncio.run(run_sibling_test(ledgers.sessionmaker()))
+
+    assert runs == []
+    assert row.status == "RUNNING" and row.owner == owner
+
+def test_expired_lease_is_recovered(ledgers):
+    runs, finished = asyncio.run(run_expired_lease_test(ledgers.sessionmaker()))
+
+    assert runs == ["B08N5KWB9H"]
+    assert finished["status"] == "DONE"
+
+def test_job_is_claimed_once(ledgers):
+    runs, finished = asyncio.run(run_double_claim_test(ledgers.sessionmaker()))
+
+    assert runs == ["B08N5KWB9H"]
+    assert finished["status"] == "DONE"
+
+def test_timed_out_long_poll_leaves_no_waiter(ledgers):
+    polls, (events, waiters) = asyncio.run(run_wait_timeout_test(ledgers.sessionmaker()))
+
+    assert [poll["status"] for poll in polls] == ["RUNNING"] * 3
+    assert events == {} and waiters == {}
+
+def test_job_finishing_during_first_read_wakes_long_poll(ledgers):
+    finished, elapsed = asyncio.run(run_finish_during_read_test(ledgers.sessionmaker()))
+
+    assert finished["status"] == "DONE"
+    assert elapsed < 1, f"long-poll slept through the finished job ({elapsed:.2f}s)"
+
+def test_job_finished_by_sibling_wakes_long_poll(ledgers):
+    finished, elapsed = asyncio.run(run_sibling_finish_test(ledgers.sessionmaker()))
+
+    assert finished["status"] == "DONE"
+    assert elapsed < 2, f"long-poll waited out its timeout ({elapsed:.2f}s)"
+
+def test_finished_job_is_posted_to_local_webhook(ledgers):
+    delivered, final = asyncio.run(run_callback_test(ledgers.sessionmaker()))
+
+    assert len(delivered) == 1
+    url, body = delivered[0]
+    assert url == "http://localhost:9000/hooks/audit"
+    assert body["status"] == "DONE"
+    assert final["callback_status"] == "DELIVERED"
+
+def test_remote_callback_is_rejected(ledgers):
+    response = asyncio.run(run_rejected_callback_test(ledgers.sessionmaker()))
+
+    assert response.status_code == 400
+
+def main():
+    print("VeriGuardX Audit Job Test")
+    print("=" * 50)
+    with Ledgers() as ledgers:
+        submitted, submit_time, polled, finished, _ = asyncio.run(run_poll_test(ledgers.sessionmaker()))
+        print(f"Submit: {submitted.status_code} in {submit_time * 1000:.0f}ms")
+        print(f"Poll: {polled.json()['status']}, long-poll: {finished.json()['status']}")
+
+        interrupted, finished = asyncio.run(run_restart_test(ledgers.sessionmaker()))
+        print(f"\nRestart: {interrupted['status']} before, {finished['status']} after")
+
+        delivered, final = asyncio.run(run_callback_test(ledgers.sessionmaker()))
+        print(f"\nWebhook: {len(delivered)} delivery, {final['callback_status']}")
+
+if __name__ == "__main__":
+    main()
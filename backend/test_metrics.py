@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Metrics Test Script for VeriGuardX
+Checks that GET /metrics exposes per-route latency histograms, agent
+pass/fail counters, the risk-level distribution and Ollama token and
+duration statistics, and that samples from several worker processes are
+merged when PROMETHEUS_MULTIPROC_DIR is set.
+
+Runs in-process against a temporary SQLite ledger and a simulated
+Ollama server, no backend needed:
+python test_metrics.py
+"""
+
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import httpx
+from prometheus_client.parser import text_string_to_metric_families
+
+from app.main import app
+from app.models import ScanRequest
+from conftest import Ledgers, fake_ollama, serving, simulated_ollama
+
+WORKER_SCRIPT = """
+from app.tools import metrics
+metrics.observe_scan("LOW", "AUTHENTIC")
+"""
+
+RENDER_SCRIPT = """
+import sys
+from app.tools import metrics
+sys.stdout.write(metrics.render().decode())
+"""
+
+VERDICT = {"verdict": "AUTHENTIC", "confidence": 95, "risk_level": "LOW"}
+GENERATION = {
+    "prompt_eval_count": 400, "prompt_eval_duration": 200_000_000,
+    "eval_count": 50, "eval_duration": 1_000_000_000
+}
+
+def sample(text: str, name: str, **labels) -> float:
+    """Value of one sample in the Prometheus text exposition"""
+    for family in text_string_to_metric_families(text):
+        for metric in family.samples:
+            if metric.name == name and metric.labels == labels:
+                return metric.value
+    return 0.0
+
+async def run_scan_and_scrape(session):
+    scan = ScanRequest(part_id="B08N5KWB9H", location="Warehouse-A", courier_id="TRUSTED-001")
+    transport = httpx.ASGITransport(app=app)
+    with serving(session):
+        async with simulated_ollama(fake_ollama(json.dumps(VERDICT), **GENERATION)):
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                before = (await client.get("/metrics")).text
+                await client.post("/api/scan", json=scan.model_dump())
+                await client.get("/api/scan/jobs/does-not-exist")
+                after = await client.get("/metrics")
+    return before, after
+
+def run_workers(n: int) -> str:
+    with tempfile.TemporaryDirectory() as directory:
+        env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": directory}
+        for _ in range(n):
+            subprocess.run([sys.executable, "-c", WORKER_SCRIPT], env=env, check=True)
+        return subprocess.run(
+            [sys.executable, "-c", RENDER_SCRIPT], env=env, check=True, capture_output=True, text=True
+        ).stdout
+
+def test_metrics_cover_routes_agents_risk_and_llm(ledger):
+    before, response = asyncio.run(run_scan_and_scrape(ledger))
+    text = response.text
+
+    def delta(name, **labels):
+        return sample(text, name, **labels) - sample(before, name, **labels)
+
+    assert response.headers["content-type"].startswith("text/plain")
+    assert delta("veriguard_http_request_duration_seconds_count",
+                 method="POST", route="/api/scan", status="200") == 1
+    # Route template, not the raw path, so job ids don't explode label cardinality
+    assert delta("veriguard_http_request_duration_seconds_count",
+                 method="GET", route="/api/scan/jobs/{job_id}", status="404") == 1
+    assert delta("veriguard_agent_results_total", agent="identity", outcome="pass") == 1
+    assert delta("veriguard_scan_risk_level_total", risk_level="LOW") == 1
+    assert delta("veriguard_llm_tokens_total", model="llama3.2", kind="prompt") == 400
+    assert delta("veriguard_llm_tokens_total", model="llama3.2", kind="completion") == 50
+    assert delta("veriguard_llm_eval_seconds_sum", model="llama3.2") == 1.0
+    assert sample(text, "veriguard_llm_in_flight", model="llama3.2") == 0
+
+def test_multiprocess_samples_are_merged():
+    text = run_workers(3)
+
+    assert sample(text, "veriguard_scan_risk_level_total", risk_level="LOW") == 3
+
+def main():
+    print("VeriGuardX Metrics Test")
+    print("=" * 50)
+    with Ledgers() as ledgers:
+        _, response = asyncio.run(run_scan_and_scrape(ledgers()))
+    for line in response.text.splitlines():
+        if line.startswith(("veriguard_agent_results_total", "veriguard_scan_", "veriguard_llm_tokens_total")):
+            print(line)
+    print(f"\n3 workers, merged: {sample(run_workers(3), 'veriguard_scan_risk_level_total', risk_level='LOW'):.0f} LOW scans")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Perceptual Photo Cache Test Script for VeriGuardX
+Checks that a re-photographed / re-encoded item maps to the cached
+analysis of the original upload, skips the vision model and is flagged
+as a reused photo, while an unrelated photo still goes to the model.
+Also checks that the scan pipeline's vision call hashes the oriented
+photo (an EXIF-rotated copy matches the upright one) and still sends
+files it cannot decode to the model, and that a lookup whose nearest
+entry has expired still finds a live one within range.
+
+Runs in-process against a simulated Ollama server, no backend needed:
+python test_phash.py
+"""
+
+import asyncio
+import io
+import os
+import tempfile
+from contextlib import asynccontextmanager
+import httpx
+from PIL import Image, ImageDraw
+
+from app.main import app
+from app.tools import imaging
+from app.tools.phash import PerceptualIndex, photo_index, hamming_distance
+from app.tools.vision import vision_service
+from conftest import simulated_ollama
+
+def make_photo(seed: int, size=(1600, 1200), quality=90) -> bytes:
+    """Synthetic part photo: shapes positioned by seed"""
+    image = Image.new("RGB", size, (200, 200, 190))
+    draw = ImageDraw.Draw(image)
+    w, h = size
+    for i in range(6):
+        x = (seed * 97 + i * 211) % (w - 200)
+        y = (seed * 53 + i * 149) % (h - 200)
+        draw.ellipse([x, y, x + 150 + i * 20, y + 120], fill=(40 * i % 255, 90, 160))
+    draw.rectangle([w // 4, h // 3, w // 2, h // 2], fill=(20, 20, 20))
+    output = io.BytesIO()
+    image.save(output, format="JPEG", quality=quality)
+    return output.getvalue()
+
+def upload_hash(contents: bytes) -> int:
+    """The dHash preprocess_image computes for an upload"""
+    return int(imaging.preprocess_image(contents)[1]["phash"], 16)
+
+def reshoot(contents: bytes) -> bytes:
+    """Same item, uploaded again: smaller, recompressed, slightly brighter"""
+    image = Image.open(io.BytesIO(contents)).resize((1200, 900))
+    image = image.point(lambda v: min(255, v + 6))
+    output = io.BytesIO()
+    image.save(output, format="JPEG", quality=70)
+    return output.getvalue()
+
+@asynccontextmanager
+async def vision_model(handler):
+    """Fresh photo index, thread-pool preprocessing and a simulated vision model"""
+    default_pool = imaging.IMAGE_POOL
+    imaging.IMAGE_POOL = "thread"
+    photo_index.clear()
+    try:
+        async with simulated_ollama(handler):
+            yield
+    finally:
+        imaging.shutdown_image_executor()
+        imaging.IMAGE_POOL = default_pool
+
+async def run_upload_test():
+    """Upload original, re-shot copy and an unrelated photo; count vision calls"""
+    vision_calls = 0
+
+    async def fake_ollama(request: httpx.Request) -> httpx.Response:
+        nonlocal vision_calls
+        vision_calls += 1
+        return httpx.Response(200, json={"message": {"role": "assistant", "content": f"Box, no damage #{vision_calls}"}})
+
+    original = make_photo(1)
+    uploads = [original, reshoot(original), make_photo(7)]
+    transport = httpx.ASGITransport(app=app)
+    results = []
+    async with vision_model(fake_ollama):
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            for contents in uploads:
+                response = await client.post(
+                    "/api/visual_agent",
+                    files={"file": ("part.jpg", contents, "image/jpeg")}
+                )
+                results.append(response.json())
+    return vision_calls, results
+
+def exif_rotated(contents: bytes) -> bytes:
+    """The same photo stored sideways with EXIF orientation 6, as phones do"""
+    image = Image.open(io.BytesIO(contents)).rotate(90, expand=True)
+    exif = image.getexif()
+    exif[imaging.EXIF_ORIENTATION] = 6
+    output = io.BytesIO()
+    image.save(output, format="JPEG", quality=90, exif=exif)
+    return output.getvalue()
+
+async def run_analyze_test(directory: str):
+    """analyze_image on a rotated copy, the upright photo and a non-image file"""
+    vision_calls = 0
+
+    async def fake_ollama(request: httpx.Request) -> httpx.Response:
+        nonlocal vision_calls
+        vision_calls += 1
+        return httpx.Response(200, json={"response": f"Box, no damage #{vision_calls}"})
+
+    files = []
+    for name, contents in (("rotated.jpg", exif_rotated(make_photo(3))), ("upright.jpg", make_photo(3)),
+                           ("broken.jpg", b"not an image")):
+        files.append(os.path.join(directory, name))
+        with open(files[-1], "wb") as f:
+            f.write(contents)
+
+    async with vision_model(fake_ollama):
+        results = [await vision_service.analyze_image(path, "Inspect this part.") for path in files]
+    return vision_calls, results
+
+def run_expired_neighbour_test():
+    """The nearest entry has expired, a slightly farther one is still live"""
+    index = PerceptualIndex(max_distance=6, ttl=60)
+    index.record("moondream", format(0b0000, "016x"), "stale analysis")
+    index.record("moondream", format(0b0111, "016x"), "live analysis")
+    index._entries[("moondream", 0b0000)]["expires_at"] = 0
+    return index.lookup("moondream", format(0b0001, "016x")), index.stats()
+
+def test_reencoded_photo_is_near_duplicate():
+    original = upload_hash(make_photo(1))
+    assert hamming_distance(original, upload_hash(reshoot(make_photo(1)))) <= 6
+    assert hamming_distance(original, upload_hash(make_photo(7))) > 6
+
+def test_expired_nearest_entry_falls_back_to_live_one():
+    match, stats = run_expired_neighbour_test()
+
+    assert match["analysis"] == "live analysis"
+    assert match["match_distance"] == 2
+    assert stats["entries"] == 1 and stats["hits"] == 1
+
+def test_reused_photo_skips_vision_model():
+    vision_calls, (first, again, other) = asyncio.run(run_upload_test())
+
+    assert vision_calls == 2
+    assert first["reused_photo"] is False
+    assert again["reused_photo"] is True
+    assert again["analysis"] == first["analysis"]
+    assert again["times_seen"] == 2
+    assert other["reused_photo"] is False
+
+def test_pipeline_vision_hashes_oriented_photo(tmp_path):
+    vision_calls, (rotated, upright, broken) = asyncio.run(run_analyze_test(str(tmp_path)))
+
+    assert rotated["success"] is True and rotated["reused_photo"] is False
+    assert upright["reused_photo"] is True
+    assert upright["match_distance"] == 0
+    # Undecodable file: no hash, but still analysed
+    assert broken["success"] is True and broken["reused_photo"] is False
+    assert vision_calls == 2
+
+def main():
+    print("VeriGuardX Perceptual Photo Cache Test")
+    print("=" * 50)
+    vision_calls, results = asyncio.run(run_upload_test())
+    for label, result in zip(("original", "re-shot", "unrelated"), results):
+        print(f"{label:<10} reused={result['reused_photo']} distance={result.get('match_distance', '-')} "
+              f"analysis={result['analysis']!r}")
+
+    if vision_calls == 2 and results[1]["reused_photo"] and not results[2]["reused_photo"]:
+        print("✅ PASS: Near-duplicate upload reused cached analysis and was flagged")
+    else:
+        print(f"❌ FAIL: {vision_calls} vision calls for 3 uploads")
+
+    with tempfile.TemporaryDirectory() as directory:
+        vision_calls, results = asyncio.run(run_analyze_test(directory))
+    print(f"\nEXIF-rotated copy, then upright photo: reused={results[1]['reused_photo']}, "
+          f"{vision_calls} vision calls for 3 files")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+PostgreSQL Backend Test Script for VeriGuardX
+Checks that the DatabaseQueries surface behaves the same on PostgreSQL
+(lookups, RETURNING scan ids, jobs), that batch scans reach scan_history
+through COPY rather than row-by-row INSERTs, that a row the COPY cannot
+take is retried alone without losing the others, and that the async
+repository opens asyncpg sessions on the same database.
+
+Needs a throwaway PostgreSQL database (its ledger tables are dropped and
+re-created), e.g. a local instance:
+POSTGRES_TEST_URL=postgresql+psycopg://postgres@localhost/veriguard_test python test_postgres.py
+Skipped when POSTGRES_TEST_URL is not set.
+"""
+
+import asyncio
+import os
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+
+import init_db
+from app.models import ScanRequest
+from app.pipeline import ScanPipeline
+from app.tools.async_db import AsyncDatabase, AsyncDatabaseQueries
+from app.tools.db import DatabaseQueries, create_postgres_engine
+from conftest import no_marketplace
+
+POSTGRES_TEST_URL = os.getenv("POSTGRES_TEST_URL", "")
+
+SCAN = {
+    "part_id": "B08N5KWB9H", "location": "Warehouse-A", "latitude": 52.5, "longitude": 13.4,
+    "scan_type": "test", "courier_id": "TRUSTED-001", "qr_valid": True, "risk_level": "LOW", "verdict": "AUTHENTIC"
+}
+
+def make_session():
+    if not POSTGRES_TEST_URL:
+        pytest.skip("POSTGRES_TEST_URL not set")
+    engine = create_engine(POSTGRES_TEST_URL)
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS scan_history, parts_ledger, courier_manifest, scan_jobs"))
+    engine.dispose()
+    init_db.init_postgres(POSTGRES_TEST_URL)
+    return sessionmaker(bind=create_postgres_engine(POSTGRES_TEST_URL))()
+
+REJECT_SCAN = """
+CREATE OR REPLACE FUNCTION reject_scan() RETURNS trigger AS $$
+BEGIN
+    RAISE EXCEPTION 'scan of % rejected', NEW.part_id;
+END
+$$ LANGUAGE plpgsql
+"""
+
+async def run_batch(db, n: int, part_ids=()):
+    """n scans of the seeded part, then one of each of part_ids"""
+    pipeline = ScanPipeline(use_council=False)
+    pipeline.runners["marketplace"] = no_marketplace
+    scans = [ScanRequest(part_id=part_id, location="Warehouse-A", courier_id="TRUSTED-001")
+             for part_id in ["B08N5KWB9H"] * n + list(part_ids)]
+    results = [result async for _, result in pipeline.run_batch(db, scans)]
+    pipeline.shutdown()
+    return results
+
+async def run_async_lookup(db):
+    database = AsyncDatabase()
+    async with database.session(db) as session:
+        driver = session.sync_session.get_bind().dialect.driver
+        part = await AsyncDatabaseQueries.get_part_by_id(session, "B08N5KWB9H")
+    await database.close()
+    return driver, part
+
+def test_queries_match_the_sqlite_surface():
+    db = make_session()
+
+    assert DatabaseQueries.get_part_by_id(db, "B08N5KWB9H").serial_hash == "HASH-1234-ABCD"
+    assert DatabaseQueries.get_courier_by_id(db, "TRUSTED-001").clearance_level == "LEVEL_5"
+    assert DatabaseQueries.get_part_by_id(db, "GHOST-SKU-999") is None
+    assert list(DatabaseQueries.get_parts_by_ids(db, ["B08N5KWB9H", "GHOST-SKU-999"])) == ["B08N5KWB9H"]
+    first, second = DatabaseQueries.record_scan(db, SCAN), DatabaseQueries.record_scan(db, SCAN)
+    assert second == first + 1
+
+    DatabaseQueries.ensure_job_table(db)
+    DatabaseQueries.create_job(db, {"job_id": "job-1", "status": "QUEUED", "request": "{}", "callback_url": None})
+    DatabaseQueries.update_job(db, "job-1", status="RUNNING")
+    assert DatabaseQueries.get_job(db, "job-1").status == "RUNNING"
+    assert [job.job_id for job in DatabaseQueries.get_claimable_jobs(db, "2000-01-01 00:00:00")] == ["job-1"]
+    db.close()
+
+def test_batch_scans_are_copied():
+    db = make_session()
+    inserts = []
+    event.listen(db.get_bind(), "before_cursor_execute",
+                 lambda *args: inserts.append(args[2]) if "INSERT INTO scan_history" in args[2] else None)
+
+    results = asyncio.run(run_batch(db, 50))
+    rows = db.execute(text("SELECT scan_id, qr_valid FROM scan_history ORDER BY scan_id")).fetchall()
+
+    assert inserts == []
+    assert sorted(result.scan_id for result in results) == [row[0] for row in rows]
+    assert len(rows) == 50
+    db.close()
+
+def test_rejected_row_falls_back_to_inserts():
+    db = make_session()
+    db.execute(text(REJECT_SCAN))
+    db.execute(text(
+        "CREATE TRIGGER reject_scan BEFORE INSERT ON scan_history FOR EACH ROW "
+        "WHEN (NEW.part_id = 'REJECTED-SKU') EXECUTE FUNCTION reject_scan()"
+    ))
+    db.commit()
+
+    results = asyncio.run(run_batch(db, 5, part_ids=["REJECTED-SKU"]))
+    stored = [row[0] for row in db.execute(text("SELECT scan_id FROM scan_history ORDER BY scan_id"))]
+
+    rejected = [result for result in results if result.part_id == "REJECTED-SKU"]
+    kept = [result.scan_id for result in results if result.part_id != "REJECTED-SKU"]
+    assert [result.scan_id for result in rejected] == [None]
+    assert sorted(kept) == stored
+    assert len(stored) == 5
+    db.close()
+
+def test_async_repository_uses_asyncpg():
+    db = make_session()
+    driver, part = asyncio.run(run_async_lookup(db))
+
+    assert driver == "asyncpg"
+    assert part == DatabaseQueries.get_part_by_id(db, "B08N5KWB9H")
+    db.close()
+
+def main():
+    print("VeriGuardX PostgreSQL Backend Test")
+    print("=" * 50)
+    if not POSTGRES_TEST_URL:
+        print("Set POSTGRES_TEST_URL to a throwaway database to run")
+        return
+    db = make_session()
+    results = asyncio.run(run_batch(db, 50))
+    print(f"Batch of {len(results)} scans copied, scan_ids {min(r.scan_id for r in results)}..{max(r.scan_id for r in results)}")
+    driver, part = asyncio.run(run_async_lookup(db))
+    print(f"Async lookup via {driver}: {part}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Ledger Row Cache Test Script for VeriGuardX
+Checks that one scan reads its part and courier rows at most once even
+though the Identity and Provenance agents run concurrently, that later
+scans are served from the cache (unknown ids included), that entries
+expire after their TTL and stay within the LRU bound, and that moving a
+part through DatabaseQueries invalidates its cached row, also when the
+caller commits later and another session reads the row meanwhile. Also
+checks that rows are read by column name, not position, whatever the
+table layout, and that a disabled cache is not consulted at all.
+
+Runs against a temporary SQLite ledger, no backend needed:
+python test_row_cache.py
+"""
+
+import asyncio
+import time
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models import ScanRequest
+from app.pipeline import ScanPipeline
+from app.tools.db import DatabaseQueries, PartRow, database_key
+from app.tools.row_cache import RowCache, row_cache
+from conftest import Ledgers, no_marketplace
+
+def ledger_reads(statements: list) -> dict:
+    return {
+        "parts": sum("FROM parts_ledger" in sql for sql in statements),
+        "couriers": sum("FROM courier_manifest" in sql for sql in statements)
+    }
+
+async def run_scans(db, part_id: str, n: int, async_db: bool = True):
+    """n scans of part_id on db (a fresh ledger), with the ledger reads of each"""
+    pipeline = ScanPipeline(use_council=False, async_db=async_db)
+    pipeline.runners["marketplace"] = no_marketplace
+    request = ScanRequest(part_id=part_id, location="Warehouse-A", courier_id="TRUSTED-001")
+
+    reads, results = [], []
+    for _ in range(n):
+        statements = []
+        # Every engine, so the async repository's connections are counted too
+        listener = lambda *args: statements.append(args[2])
+        event.listen(Engine, "before_cursor_execute", listener)
+        try:
+            results.append(await pipeline.run(db, request, commit=False))
+        finally:
+            event.remove(Engine, "before_cursor_execute", listener)
+        reads.append(ledger_reads(statements))
+    pipeline.shutdown()
+    return results, reads
+
+def test_scan_reads_each_row_once(ledgers):
+    for async_db in (True, False):
+        results, reads = asyncio.run(run_scans(ledgers(), "B08N5KWB9H", 1, async_db))
+
+        assert results[0].verdict.verdict.value == "AUTHENTIC"
+        assert reads[0] == {"parts": 1, "couriers": 1}, f"async_db={async_db}: {reads[0]}"
+
+def test_later_scans_are_served_from_cache(ledger):
+    hits = row_cache.hits
+    results, reads = asyncio.run(run_scans(ledger, "B08N5KWB9H", 3))
+
+    assert reads[1:] == [{"parts": 0, "couriers": 0}] * 2
+    assert [r.verdict.verdict.value for r in results] == ["AUTHENTIC"] * 3
+    assert row_cache.hits > hits
+
+def test_unknown_part_is_cached_negatively(ledger):
+    negative_hits = row_cache.negative_hits
+    results, reads = asyncio.run(run_scans(ledger, "GHOST-SKU-999", 2))
+
+    assert reads[0]["parts"] == 1
+    assert reads[1]["parts"] == 0
+    assert [r.short_circuit["rule"] for r in results] == ["PART_NOT_FOUND"] * 2
+    assert row_cache.negative_hits > negative_hits
+
+def test_entries_expire_after_ttl():
+    cache = RowCache(ttl=0.05, negative_ttl=0.02)
+    cache.put("db", "part", "A", {"part_id": "A"})
+    cache.put("db", "part", "GHOST", None)
+
+    assert cache.get("db", "part", "A") == (True, {"part_id": "A"})
+    assert cache.get("db", "part", "GHOST") == (True, None)
+    time.sleep(0.03)
+    assert cache.get("db", "part", "GHOST") == (False, None)
+    assert cache.get("db", "part", "A")[0] is True
+    time.sleep(0.03)
+    assert cache.get("db", "part", "A") == (False, None)
+
+def test_cache_is_bounded_per_database():
+    cache = RowCache(max_entries=2)
+    for key in ("A", "B", "C"):
+        cache.put("db", "part", key, {"part_id": key})
+    cache.put("other", "part", "A", {"part_id": "A"})
+
+    assert cache.get("db", "part", "A") == (False, None)
+    assert cache.stats()["entries"] == 3
+    assert cache.stats()["evictions"] == 1
+    assert cache.get("other", "part", "A")[0] is True
+
+def test_location_change_invalidates_row(ledger):
+    db = ledger
+    before = DatabaseQueries.get_part_by_id(db, "B08N5KWB9H")
+
+    assert DatabaseQueries.update_part_location(db, "B08N5KWB9H", "Dock-7") is True
+    after = DatabaseQueries.get_part_by_id(db, "B08N5KWB9H")
+    assert before.current_location != "Dock-7"
+    assert after.current_location == "Dock-7"
+
+    DatabaseQueries.get_courier_by_id(db, "TRUSTED-001")
+    assert DatabaseQueries.update_courier_clearance(db, "TRUSTED-001", "LEVEL_1") is True
+    assert DatabaseQueries.get_courier_by_id(db, "TRUSTED-001").clearance_level == "LEVEL_1"
+
+def test_uncommitted_move_is_not_recached_stale(ledger):
+    db = ledger
+    reader = sessionmaker(bind=db.get_bind())()
+
+    assert DatabaseQueries.update_part_location(db, "B08N5KWB9H", "Dock-9", commit=False) is True
+    # Another request reads (and caches) the committed row before the writer commits
+    assert DatabaseQueries.get_part_by_id(reader, "B08N5KWB9H").current_location != "Dock-9"
+    db.commit()
+    assert DatabaseQueries.get_part_by_id(reader, "B08N5KWB9H").current_location == "Dock-9"
+
+def test_rows_follow_column_names_not_table_order(ledger):
+    db = ledger
+    # Same columns, different order (and an extra one), as after a migration
+    db.execute(text("DROP TABLE parts_ledger"))
+    db.execute(text("""
+        CREATE TABLE parts_ledger (
+            current_location TEXT, part_id TEXT UNIQUE, notes TEXT, serial_hash TEXT,
+            id INTEGER PRIMARY KEY, manufacturing_date TEXT, oem_signature TEXT
+        )
+    """))
+    db.execute(text("""
+        INSERT INTO parts_ledger (current_location, part_id, notes, serial_hash, id, manufacturing_date, oem_signature)
+        VALUES ('Dock-3', 'MIGRATED-1', 'n/a', 'hash-1', 7, '2024-01-01', 'OEM-SIG')
+    """))
+    db.commit()
+
+    part = DatabaseQueries.get_part_by_id(db, "MIGRATED-1")
+    assert part == PartRow(7, "MIGRATED-1", "OEM-SIG", "hash-1", "2024-01-01", "Dock-3")
+    assert DatabaseQueries.get_parts_by_ids(db, ["MIGRATED-1"]) == {"MIGRATED-1": part}
+
+def test_disabled_cache_stores_nothing():
+    cache = RowCache(enabled=False)
+    cache.put("db", "part", "A", {"part_id": "A"})
+
+    assert cache.get("db", "part", "A") == (False, None)
+    assert cache.stats()["entries"] == 0
+
+def test_database_key_is_built_once_per_engine(ledger):
+    other = sessionmaker(bind=ledger.get_bind())()
+
+    assert database_key(other) is database_key(ledger)
+
+def test_disabled_ledger_cache_is_not_consulted(ledger):
+    db = ledger
+    misses = row_cache.misses
+    row_cache.enabled = False
+    try:
+        rows = [DatabaseQueries.get_part_by_id(db, "B08N5KWB9H") for _ in range(2)]
+    finally:
+        row_cache.enabled = True
+
+    assert rows[0] == rows[1] and rows[0].part_id == "B08N5KWB9H"
+    assert row_cache.misses == misses
+
+def main():
+    print("VeriGuardX Ledger Row Cache Test")
+    print("=" * 50)
+    with Ledgers() as ledgers:
+        results, reads = asyncio.run(run_scans(ledgers(), "B08N5KWB9H", 3))
+        for i, r in enumerate(reads):
+            print(f"Scan {i + 1}: {r['parts']} parts_ledger / {r['couriers']} courier_manifest queries")
+        if reads[0] == {"parts": 1, "couriers": 1} and reads[1:] == [{"parts": 0, "couriers": 0}] * 2:
+            print("✅ PASS: One read per row, later scans served from cache")
+        else:
+            print("❌ FAIL: Ledger rows read more than once")
+
+        results, reads = asyncio.run(run_scans(ledgers(), "GHOST-SKU-999", 2))
+    print(f"\nUnknown part, 2 scans: {[r['parts'] for r in reads]} parts_ledger queries")
+    print(f"\nCache stats: {row_cache.stats()}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,468 @@
+#!/usr/bin/env python3
+"""
+Scan Pipeline Test Script for VeriGuardX
+Checks that POST /api/scan runs the routed agents concurrently (latency
+tracks the slowest agent, not the sum), that a hung agent is cut off by
+its timeout without failing the scan, that cancelling a scan cancels
+the agents still in flight, and that a decisive failure (unknown part)
+ends the scan without waiting for the slower agents, and that a scan
+whose audit row can't be written reports scan_id=None without stalling
+the event loop while it waits for the write lock. Also checks that
+POST /api/scan/batch audits a pallet with one bulk ledger lookup, that
+a batch item whose audit row is refused loses only its own row (every
+scan_id returned is committed and unique), and that POST /api/scan/stream
+bounds the scans in flight on an NDJSON feed, keeps the rows of a feed
+whose middle scan is refused, and ends cleanly when the gate hangs up,
+that the Visual agent only opens image_paths under SCAN_IMAGE_DIR, and
+that each agent's confidence is rescaled to 0-100 from its own scale.
+
+Runs in-process against a temporary SQLite ledger, no backend needed:
+python test_scan_pipeline.py
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import time
+import httpx
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+
+from app import pipeline as pipeline_module
+from app.main import app
+from app.models import AgentResult, ScanRequest
+from app.pipeline import ScanPipeline, scan_pipeline
+from app.tools.vision import vision_service
+from app.tools.db import RoutingSession, create_sqlite_engine
+from conftest import Ledgers, no_marketplace, serving
+
+AGENT_DELAY = 0.3
+
+def slow_agent(name: str, delay: float, log: list = None):
+    async def run(db, request, route):
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            if log is not None:
+                log.append(name)
+            raise
+        return AgentResult(agent_name=f"{name.title()} Agent", passed=True, confidence=0.9, details={})
+    return run
+
+def sony_scan() -> ScanRequest:
+    return ScanRequest(part_id="B08N5KWB9H", location="Warehouse-A", courier_id="TRUSTED-001")
+
+async def run_fan_out_test(db):
+    pipeline = ScanPipeline(use_council=False)
+    for name in pipeline.runners:
+        pipeline.runners[name] = slow_agent(name, AGENT_DELAY)
+
+    start = time.perf_counter()
+    result = await pipeline.run(db, sony_scan())
+    return result, time.perf_counter() - start
+
+async def run_timeout_test(db):
+    pipeline = ScanPipeline(agent_timeout=0.2, use_council=False)
+    pipeline.runners["marketplace"] = slow_agent("marketplace", 10)
+    return await pipeline.run(db, sony_scan())
+
+async def run_cancel_test(db):
+    cancelled = []
+    pipeline = ScanPipeline(agent_timeout=10, use_council=False)
+    for name in pipeline.runners:
+        pipeline.runners[name] = slow_agent(name, 5, cancelled)
+
+    task = asyncio.create_task(pipeline.run(db, sony_scan()))
+    await asyncio.sleep(0.1)
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    await asyncio.sleep(0)
+    return cancelled
+
+async def run_short_circuit_test(db):
+    pipeline = ScanPipeline(agent_timeout=10, use_council=True)
+    pipeline.runners["marketplace"] = slow_agent("marketplace", 5)
+    ghost = ScanRequest(part_id="GHOST-SKU-999", location="Warehouse-A", courier_id="TRUSTED-001")
+
+    start = time.perf_counter()
+    result = await pipeline.run(db, ghost)
+    return result, time.perf_counter() - start
+
+async def run_unrecorded_scan_test(ledgers: Ledgers, busy_timeout: float = 0.1):
+    """Scan while another connection holds SQLite's write lock; also the longest event loop stall"""
+    path = ledgers.path()
+    sessions = ledgers.sessionmaker(path, timeout=busy_timeout)
+    blocker = sqlite3.connect(path)
+    # WAL, as the app's engines use: readers carry on, only the writer waits
+    blocker.execute("PRAGMA journal_mode=WAL")
+    blocker.execute("BEGIN IMMEDIATE")
+    ticks = [time.perf_counter()]
+
+    async def ticker():
+        while True:
+            await asyncio.sleep(0.01)
+            ticks.append(time.perf_counter())
+
+    ticking = asyncio.create_task(ticker())
+    try:
+        result = await ScanPipeline(use_council=False).run(sessions(), sony_scan())
+    finally:
+        ticks.append(time.perf_counter())
+        ticking.cancel()
+        blocker.rollback()
+        blocker.close()
+    return result, max(later - earlier for earlier, later in zip(ticks, ticks[1:]))
+
+async def run_endpoint_test(session):
+    default_council = scan_pipeline.use_council
+    scan_pipeline.use_council = False
+
+    transport = httpx.ASGITransport(app=app)
+    try:
+        with serving(session):
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                known = await client.post("/api/scan", json=sony_scan().model_dump())
+                ghost = await client.post("/api/scan", json={
+                    "part_id": "GHOST-SKU-999", "location": "Warehouse", "courier_id": "TRUSTED-001"
+                })
+    finally:
+        scan_pipeline.use_council = default_council
+    return known, ghost
+
+async def run_batch_endpoint_test(session, stream: bool = False):
+    scans = [sony_scan().model_dump()] * 3 + [
+        {"part_id": "GHOST-SKU-999", "location": "Warehouse-A", "courier_id": "TRUSTED-001"}
+    ]
+
+    statements = []
+    event.listen(session.get_bind(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+    transport = httpx.ASGITransport(app=app)
+    with serving(session):
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.post(f"/api/scan/batch?stream={str(stream).lower()}", json={"scans": scans})
+
+    part_lookups = [sql for sql in statements if "FROM parts_ledger" in sql]
+    return response, part_lookups
+
+def rejecting_ledger(ledgers: Ledgers, part_id: str):
+    """The app's SQLite engines on a ledger whose scan_history refuses rows for part_id"""
+    path = ledgers.path()
+    blocker = sqlite3.connect(path)
+    blocker.execute(f"""
+    CREATE TRIGGER reject_scan BEFORE INSERT ON scan_history WHEN NEW.part_id = '{part_id}'
+    BEGIN SELECT RAISE(ABORT, 'scan rejected'); END
+    """)
+    blocker.commit()
+    blocker.close()
+    url = f"sqlite:///{path}"
+    writer, reader = create_sqlite_engine(url), create_sqlite_engine(url, readonly=True)
+    return sessionmaker(class_=RoutingSession, writer=writer, reader=reader), (writer, reader), path
+
+async def run_batch_with_rejected_row_test(ledgers: Ledgers):
+    """A pallet with one item whose scan_history insert fails"""
+    sessions, engines, path = rejecting_ledger(ledgers, "REJECTED-SKU")
+    pipeline = ScanPipeline(use_council=False)
+    pipeline.runners["marketplace"] = no_marketplace
+    rejected = ScanRequest(part_id="REJECTED-SKU", location="Warehouse-A", courier_id="TRUSTED-001")
+    scans = [sony_scan()] * 3 + [rejected] + [sony_scan()] * 2
+
+    db = sessions()
+    try:
+        results = dict([item async for item in pipeline.run_batch(db, scans, concurrency=2)])
+    finally:
+        db.close()
+        for engine in engines:
+            engine.dispose()
+    stored = {row[0] for row in sqlite3.connect(path).execute("SELECT scan_id FROM scan_history")}
+    return [results[index].scan_id for index in range(len(scans))], stored
+
+async def run_stream_bound_test(db, n: int, max_in_flight: int):
+    pipeline = ScanPipeline(use_council=False)
+    active, peak = 0, 0
+
+    async def counting(db, request, route):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        return AgentResult(agent_name="Identity Agent", passed=True, confidence=0.9, details={})
+
+    for name in pipeline.runners:
+        pipeline.runners[name] = slow_agent(name, 0)
+    pipeline.runners["identity"] = counting
+
+    async def feed():
+        for _ in range(n):
+            yield sony_scan()
+
+    indexes = [index async for index, _ in pipeline.run_stream(
+        db, feed(), max_in_flight=max_in_flight, ordered=True
+    )]
+    return indexes, peak
+
+async def run_stream_endpoint_test(session, body: bytes):
+    transport = httpx.ASGITransport(app=app)
+    with serving(session):
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.post("/api/scan/stream?ordered=true", content=body)
+    return response
+
+async def run_stream_rejected_row_test(ledgers: Ledgers):
+    """An NDJSON feed whose middle scan's audit row is refused"""
+    sessions, engines, path = rejecting_ledger(ledgers, "REJECTED-SKU")
+    rejected = ScanRequest(part_id="REJECTED-SKU", location="Warehouse-A", courier_id="TRUSTED-001")
+    body = "\n".join(scan.model_dump_json() for scan in (sony_scan(), rejected, sony_scan()))
+    db = sessions()
+    try:
+        response = await run_stream_endpoint_test(db, body.encode())
+    finally:
+        db.close()
+        for engine in engines:
+            engine.dispose()
+    stored = {row[0] for row in sqlite3.connect(path).execute("SELECT scan_id FROM scan_history")}
+    return [json.loads(line) for line in response.text.splitlines()], stored
+
+async def run_stream_disconnect_test(session):
+    """The gate sends one scan and hangs up mid-feed, straight through ASGI"""
+    messages = [
+        {"type": "http.request", "body": sony_scan().model_dump_json().encode() + b"\n", "more_body": True},
+        {"type": "http.disconnect"}
+    ]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "POST", "scheme": "http", "path": "/api/scan/stream",
+        "raw_path": b"/api/scan/stream", "root_path": "", "query_string": b"ordered=true",
+        "headers": [(b"content-type", b"application/x-ndjson")],
+        "client": ("127.0.0.1", 50000), "server": ("test", 80)
+    }
+    with serving(session):
+        await asyncio.wait_for(app(scope, receive, send), 10)
+    body = b"".join(m.get("body", b"") for m in sent if m["type"] == "http.response.body")
+    return [json.loads(line) for line in body.decode().splitlines()]
+
+async def run_image_path_test(directory: str, image_paths: list):
+    """The Visual agent on each image_path, with SCAN_IMAGE_DIR=directory and the vision call recorded"""
+    opened = []
+
+    async def analyze_image(path, prompt):
+        opened.append(path)
+        return {"success": True, "analysis": {"verdict": "AUTHENTIC", "confidence": 80}}
+
+    previous = pipeline_module.SCAN_IMAGE_DIR, vision_service.analyze_image
+    pipeline_module.SCAN_IMAGE_DIR = os.path.realpath(directory)
+    vision_service.analyze_image = analyze_image
+    try:
+        pipeline = ScanPipeline(use_council=False)
+        results = [
+            await pipeline._run_visual(None, sony_scan().model_copy(update={"image_path": path}), {})
+            for path in image_paths
+        ]
+    finally:
+        pipeline_module.SCAN_IMAGE_DIR, vision_service.analyze_image = previous
+    return results, opened
+
+async def run_confidence_test(confidences: dict):
+    """Each named agent reports the given confidence on its own scale"""
+    pipeline = ScanPipeline(use_council=False)
+    results = {}
+    for name, confidence in confidences.items():
+        async def report(db, request, route, name=name, confidence=confidence):
+            return AgentResult(agent_name=f"{name.title()} Agent", passed=True, confidence=confidence, details={})
+        pipeline.runners[name] = report
+        results[name] = (await pipeline._run_one(name, None, sony_scan(), {})).confidence
+    return results
+
+def test_agents_run_concurrently(ledger):
+    result, elapsed = asyncio.run(run_fan_out_test(ledger))
+
+    assert len(result.agent_results) == 5
+    assert elapsed < AGENT_DELAY * 2, f"agents serialized ({elapsed:.2f}s)"
+
+def test_hung_agent_times_out_without_failing_scan(ledger):
+    result = asyncio.run(run_timeout_test(ledger))
+    marketplace = result.agent_results["Marketplace Agent"]
+
+    assert marketplace.passed is False
+    assert marketplace.details["timed_out"] is True
+    assert result.agent_results["Identity Agent"].passed is True
+    assert result.processing_time_ms < 2000
+
+def test_cancelled_scan_cancels_agents(ledger):
+    cancelled = asyncio.run(run_cancel_test(ledger))
+
+    assert sorted(cancelled) == ["anomaly", "courier", "identity", "marketplace", "provenance"]
+
+def test_unknown_part_short_circuits_scan(ledger):
+    result, elapsed = asyncio.run(run_short_circuit_test(ledger))
+
+    assert elapsed < 1, f"waited for slow agents ({elapsed:.2f}s)"
+    assert result.short_circuit["rule"] == "PART_NOT_FOUND"
+    # The other ledger agents may still be awaiting their queries and be skipped too
+    assert "Marketplace Agent" in result.skipped_agents
+    assert "Identity Agent" not in result.skipped_agents
+    assert "Marketplace Agent" not in result.agent_results
+    assert result.risk_score.risk_level.value == "CRITICAL"
+    assert result.verdict.verdict.value == "COUNTERFEIT"
+
+def test_unrecorded_scan_has_no_scan_id(ledgers):
+    result, _ = asyncio.run(run_unrecorded_scan_test(ledgers))
+
+    assert result.scan_id is None
+    assert result.verdict.verdict.value == "AUTHENTIC"
+
+def test_locked_ledger_does_not_stall_event_loop(ledgers):
+    # The insert waits out the whole busy timeout in a worker thread, not on the loop
+    result, longest = asyncio.run(run_unrecorded_scan_test(ledgers, busy_timeout=1.0))
+
+    assert result.scan_id is None
+    assert longest < 0.5, f"event loop stalled for {longest:.2f}s"
+
+def test_scan_endpoint_returns_audit_response(ledger):
+    known, ghost = asyncio.run(run_endpoint_test(ledger))
+
+    assert known.status_code == 200
+    body = known.json()
+    assert body["verdict"]["verdict"] == "AUTHENTIC"
+    assert body["risk_score"]["risk_level"] == "LOW"
+    assert set(body["agent_results"]) == {
+        "Identity Agent", "Provenance Agent", "Anomaly Agent", "Courier Agent", "Marketplace Agent"
+    }
+    assert ghost.status_code == 200
+    assert ghost.json()["product_info"]["name"] == "Unidentified SKU"
+    assert ghost.json()["scan_id"] == body["scan_id"] + 1
+
+def test_batch_endpoint_audits_pallet_with_bulk_lookups(ledger):
+    response, part_lookups = asyncio.run(run_batch_endpoint_test(ledger))
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["count"] == 4
+    assert [item["index"] for item in body["results"]] == [0, 1, 2, 3]
+    assert [item["verdict"] for item in body["results"]] == ["AUTHENTIC"] * 3 + ["COUNTERFEIT"]
+    assert body["results"][3]["short_circuit"] == "PART_NOT_FOUND"
+    assert body["summary"] == {"AUTHENTIC": 3, "COUNTERFEIT": 1}
+    assert len(part_lookups) == 1, f"per-item part lookups: {part_lookups}"
+
+def test_batch_endpoint_streams_ndjson(ledger):
+    response, _ = asyncio.run(run_batch_endpoint_test(ledger, stream=True))
+
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    items = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(item["index"] for item in items) == [0, 1, 2, 3]
+
+def test_rejected_row_keeps_other_batch_rows(ledgers):
+    scan_ids, stored = asyncio.run(run_batch_with_rejected_row_test(ledgers))
+
+    assert scan_ids[3] is None
+    recorded = scan_ids[:3] + scan_ids[4:]
+    assert None not in recorded
+    assert len(set(recorded)) == len(recorded), f"scan_ids repeat: {scan_ids}"
+    assert set(recorded) == stored
+
+def test_stream_bounds_scans_in_flight(ledger):
+    indexes, peak = asyncio.run(run_stream_bound_test(ledger, 200, 4))
+
+    assert indexes == list(range(200))
+    assert peak <= 4, f"{peak} scans in flight"
+
+def test_stream_endpoint_returns_ndjson_verdicts(ledger):
+    known = json.dumps(sony_scan().model_dump())
+    response = asyncio.run(run_stream_endpoint_test(
+        ledger, f"{known}\n\n{{not json}}\n{known}".encode()
+    ))
+
+    assert response.status_code == 200
+    items = [json.loads(line) for line in response.text.splitlines()]
+    assert [item["index"] for item in items] == [0, 1, 2]
+    assert items[0]["verdict"] == "AUTHENTIC"
+    assert items[1]["error"].startswith("Invalid ScanRequest")
+    assert items[2]["verdict"] == "AUTHENTIC"
+
+def test_stream_rejected_row_keeps_other_rows(ledgers):
+    items, stored = asyncio.run(run_stream_rejected_row_test(ledgers))
+
+    assert [item["verdict"] for item in items] == ["AUTHENTIC", "COUNTERFEIT", "AUTHENTIC"]
+    assert items[1]["scan_id"] is None
+    assert {items[0]["scan_id"], items[2]["scan_id"]} == stored
+    assert len(stored) == 2
+
+def test_stream_client_disconnect_ends_stream(ledger):
+    items = asyncio.run(run_stream_disconnect_test(ledger))
+
+    assert [item["index"] for item in items] == [0]
+    assert items[0]["verdict"] == "AUTHENTIC" and items[0]["scan_id"] is not None
+
+def test_image_path_is_confined_to_scan_image_dir(tmp_path):
+    images = tmp_path / "scan_images"
+    images.mkdir()
+    (images / "pallet-7.jpg").write_bytes(b"photo")
+    (tmp_path / "secret.txt").write_text("not a photo")
+    (images / "link.jpg").symlink_to(tmp_path / "secret.txt")
+
+    paths = ["pallet-7.jpg", str(images / "pallet-7.jpg"), "../secret.txt", str(tmp_path / "secret.txt"), "link.jpg"]
+    results, opened = asyncio.run(run_image_path_test(str(images), paths))
+
+    assert [result.passed for result in results] == [True, True, False, False, False]
+    assert all("outside the scan image directory" in result.details["error"] for result in results[2:])
+    assert opened == [os.path.realpath(images / "pallet-7.jpg")] * 2
+
+def test_confidence_rescaled_per_agent():
+    confidences = asyncio.run(run_confidence_test({"identity": 0.9, "courier": 1.0, "visual": 1.0, "marketplace": 0.5}))
+
+    # The vision model's percentages are kept as they are, even a low one of 1
+    assert confidences == {"identity": 90.0, "courier": 100.0, "visual": 1.0, "marketplace": 50.0}
+
+def test_stream_endpoint_rejects_oversized_line(ledger):
+    response = asyncio.run(run_stream_endpoint_test(ledger, b"x" * 100_000))
+
+    items = [json.loads(line) for line in response.text.splitlines()]
+    assert items == [{"error": "NDJSON line exceeds 65536 bytes"}]
+
+def main():
+    print("VeriGuardX Scan Pipeline Test")
+    print("=" * 50)
+    with Ledgers() as ledgers:
+        result, elapsed = asyncio.run(run_fan_out_test(ledgers()))
+        print(f"5 agents x {AGENT_DELAY}s: {elapsed:.2f}s wall time")
+        if elapsed < AGENT_DELAY * 2:
+            print("✅ PASS: Agents ran concurrently")
+        else:
+            print("❌ FAIL: Agents ran back to back")
+
+        result = asyncio.run(run_timeout_test(ledgers()))
+        print(f"\nHung marketplace agent: {result.agent_results['Marketplace Agent'].details}")
+        print(f"Scan finished in {result.processing_time_ms}ms with verdict {result.verdict.verdict.value}")
+
+        result, elapsed = asyncio.run(run_short_circuit_test(ledgers()))
+        print(f"\nUnknown part: {result.short_circuit}, decided in {elapsed:.2f}s")
+        if "Marketplace Agent" in result.skipped_agents and elapsed < 1:
+            print("✅ PASS: Decisive failure short-circuited the scan")
+        else:
+            print("❌ FAIL: Scan waited for agents after a decisive failure")
+
+        known, ghost = asyncio.run(run_endpoint_test(ledgers()))
+        print(f"\nPOST /api/scan (Sony): {known.status_code} {known.json()['verdict']['verdict']}")
+        print(f"POST /api/scan (ghost): {ghost.status_code} {ghost.json()['product_info']['name']}")
+
+        response, part_lookups = asyncio.run(run_batch_endpoint_test(ledgers()))
+        print(f"\nPOST /api/scan/batch (4 items): {response.json()['summary']}, "
+              f"{len(part_lookups)} parts_ledger query(s)")
+
+        indexes, peak = asyncio.run(run_stream_bound_test(ledgers(), 200, 4))
+        print(f"\nNDJSON feed (200 scans, max 4 in flight): {len(indexes)} verdicts, peak {peak} in flight")
+
+if __name__ == "__main__":
+    main()
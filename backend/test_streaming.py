@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Council Chat Streaming Test Script for VeriGuardX
+Checks that POST /api/council/chat/stream relays Ollama's NDJSON tokens
+as Server-Sent Events while they are generated, one `data:` frame per
+token, and ends with an `event: done` carrying the full response. Also
+checks that a client hanging up, mid-stream or before Ollama answers,
+frees the model's scheduler slot and the circuit breaker's trial, that
+?structured=true ends with a ChatResponse (reply plus session_data), and
+that a full model queue is reported as an `event: error` with status 429
+rather than the offline reply.
+
+Runs in-process against a simulated Ollama server, no backend needed:
+python test_streaming.py
+"""
+
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
+from typing import List, Optional
+import httpx
+
+from app.main import app
+from app.tools.health import CircuitBreaker
+from app.tools.llm import llm_client
+from app.tools.scheduler import InferenceScheduler
+from conftest import simulated_ollama
+
+TOKENS = ["Custody ", "chain ", "verified."]
+TOKEN_DELAY = 0.1  # Simulated seconds between generated tokens
+
+def streaming_ollama(tokens: Optional[List[str]], delay: float = TOKEN_DELAY, called: Optional[asyncio.Event] = None):
+    """
+    A simulated Ollama server streaming tokens as NDJSON chunks
+
+    Sets `called` when a request arrives; with tokens=None it then never
+    answers, like a model still loading.
+    """
+    async def chunks():
+        for token in tokens:
+            await asyncio.sleep(delay)
+            chunk = {"model": "llama3", "message": {"role": "assistant", "content": token}, "done": False}
+            yield json.dumps(chunk).encode() + b"\n"
+        yield json.dumps({"model": "llama3", "done": True, "eval_count": len(tokens)}).encode() + b"\n"
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if called is not None:
+            called.set()
+        if tokens is None:
+            await asyncio.Event().wait()
+        return httpx.Response(200, headers={"content-type": "application/x-ndjson"}, content=chunks())
+    return handler
+
+@asynccontextmanager
+async def fresh_llm_state(breaker: CircuitBreaker):
+    """Give llm_client its own breaker and scheduler, restored afterwards"""
+    previous = llm_client.breaker, llm_client.scheduler
+    llm_client.breaker = breaker
+    llm_client.scheduler = InferenceScheduler(default_limit=1)
+    try:
+        yield llm_client.scheduler
+    finally:
+        llm_client.breaker, llm_client.scheduler = previous
+
+async def post_stream(message: str, hang_up: asyncio.Event, hang_up_after: Optional[int] = None, query: bytes = b""):
+    """
+    POST to the stream endpoint straight through ASGI
+
+    httpx's ASGITransport buffers whole responses, so frames are collected
+    here as the app sends them, with their arrival time. The client hangs
+    up once `hang_up` is set, or after `hang_up_after` body frames.
+    """
+    body = json.dumps({"message": message}).encode()
+    frames = []
+    delivered = False
+
+    async def receive():
+        nonlocal delivered
+        if not delivered:
+            delivered = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await hang_up.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.body" and message.get("body"):
+            frames.append((time.perf_counter(), message["body"].decode()))
+            if hang_up_after is not None and len(frames) >= hang_up_after:
+                hang_up.set()
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "POST", "scheme": "http", "path": "/api/council/chat/stream",
+        "raw_path": b"/api/council/chat/stream", "root_path": "", "query_string": query,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        "client": ("127.0.0.1", 50000), "server": ("test", 80)
+    }
+    await asyncio.wait_for(app(scope, receive, send), 5)
+    return frames
+
+async def run_stream_test():
+    async with simulated_ollama(streaming_ollama(TOKENS)), fresh_llm_state(CircuitBreaker()) as scheduler:
+        start = time.perf_counter()
+        frames = await post_stream("Status report", asyncio.Event())
+        slots = scheduler.queue_for("llama3").active
+    return [(at - start, frame) for at, frame in frames], slots
+
+async def run_disconnect_test():
+    """The client hangs up after the first token of a long generation"""
+    async with simulated_ollama(streaming_ollama(TOKENS * 20)), fresh_llm_state(CircuitBreaker()) as scheduler:
+        frames = await post_stream("Status report", asyncio.Event(), hang_up_after=1)
+        await asyncio.sleep(TOKEN_DELAY * 2)
+        slots = scheduler.queue_for("llama3").active
+    return frames, slots
+
+async def run_trial_disconnect_test():
+    """The client hangs up while the half-open trial request waits on Ollama"""
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0)
+    breaker.record_failure()
+    called = asyncio.Event()
+    async with simulated_ollama(streaming_ollama(None, called=called)), fresh_llm_state(breaker) as scheduler:
+        hang_up = asyncio.Event()
+        watcher = asyncio.create_task(called.wait())
+        watcher.add_done_callback(lambda _: hang_up.set())
+        await post_stream("Status report", hang_up)
+        reached_ollama = called.is_set()
+        slots = scheduler.queue_for("llama3").active
+        trial_free = breaker.allow_request()
+    return reached_ollama, slots, trial_free
+
+async def run_structured_test():
+    async with simulated_ollama(streaming_ollama(TOKENS)), fresh_llm_state(CircuitBreaker()):
+        frames = await post_stream("Status report", asyncio.Event(), query=b"structured=true")
+    return [frame for _, frame in frames]
+
+async def run_queue_full_test():
+    """The model's only slot is taken and its queue holds no one"""
+    called = asyncio.Event()
+    async with simulated_ollama(streaming_ollama(TOKENS, called=called)), \
+            fresh_llm_state(CircuitBreaker()) as scheduler:
+        scheduler.max_queue = 0
+        async with scheduler.slot("llama3"):
+            frames = await post_stream("Status report", asyncio.Event())
+    return [frame for _, frame in frames], called.is_set()
+
+def test_tokens_stream_as_separate_frames():
+    frames, slots = asyncio.run(run_stream_test())
+    tokens = [json.loads(frame[len("data: "):]) for _, frame in frames[:-1]]
+    done_at, done = frames[-1]
+
+    assert tokens == [{"token": token} for token in TOKENS]
+    assert all(frame.startswith("data: ") and frame.endswith("\n\n") for _, frame in frames[:-1])
+    # The first token is sent while the rest are still being generated
+    assert frames[0][0] < done_at - TOKEN_DELAY
+    assert done.startswith("event: done\n")
+    assert json.loads(done.split("data: ", 1)[1]) == {"response": "".join(TOKENS)}
+    assert slots == 0
+
+def test_disconnect_mid_stream_frees_slot():
+    frames, slots = asyncio.run(run_disconnect_test())
+
+    assert len(frames) < len(TOKENS) * 20
+    assert slots == 0
+
+def test_disconnect_before_answer_frees_slot_and_trial():
+    reached_ollama, slots, trial_free = asyncio.run(run_trial_disconnect_test())
+
+    assert reached_ollama
+    assert slots == 0
+    assert trial_free
+
+def test_structured_done_event_is_chat_response():
+    frames = asyncio.run(run_structured_test())
+    done = json.loads(frames[-1].split("data: ", 1)[1])
+
+    assert frames[-1].startswith("event: done\n")
+    assert done["response"] == "".join(TOKENS)
+    assert done["session_data"] == {"model": "llama3", "offline": False, "eval_count": len(TOKENS)}
+
+def test_full_queue_is_a_429_error_event():
+    frames, called = asyncio.run(run_queue_full_test())
+
+    assert len(frames) == 1
+    assert frames[0].startswith("event: error\n")
+    error = json.loads(frames[0].split("data: ", 1)[1])
+    assert error["status"] == 429 and error["retry_after"] > 0
+    assert not called
+
+def main():
+    print("VeriGuardX Council Chat Streaming Test")
+    print("=" * 50)
+    frames, _ = asyncio.run(run_stream_test())
+    for at, frame in frames:
+        print(f"{at * 1000:6.0f}ms  {frame.strip()}")
+
+    _, slots = asyncio.run(run_disconnect_test())
+    print(f"\nSlots held after a mid-stream hang-up: {slots}")
+    reached_ollama, slots, trial_free = asyncio.run(run_trial_disconnect_test())
+    print(f"Hang-up during the half-open trial: {slots} slot(s) held, trial free: {trial_free}")
+    print(f"\nstructured=true: {asyncio.run(run_structured_test())[-1].strip()}")
+    frames, _ = asyncio.run(run_queue_full_test())
+    print(f"Queue full: {frames[0].strip()}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Upload Limit Test Script for VeriGuardX
+Checks that /api/visual_agent answers 413 for a photo above
+IMAGE_MAX_UPLOAD_BYTES before the vision model is called, and that an
+upload of unknown size is read only up to the limit plus one byte rather
+than buffered whole.
+
+Runs in-process, no backend needed:
+python test_uploads.py
+"""
+
+import asyncio
+import httpx
+
+from app.main import app
+from app.tools import imaging
+from app.tools.imaging import ImageRejectedError, read_upload
+
+UPLOAD_LIMIT = 64 * 1024
+
+class StreamedUpload:
+    """An upload whose size the parser did not record, counting bytes handed out"""
+
+    def __init__(self, total: int):
+        self.size = None
+        self.remaining = total
+        self.served = 0
+
+    async def read(self, size: int = -1) -> bytes:
+        n = self.remaining if size < 0 else min(size, self.remaining)
+        self.remaining -= n
+        self.served += n
+        return b"\0" * n
+
+async def run_endpoint_test(upload_bytes: int):
+    default_limit = imaging.IMAGE_MAX_UPLOAD_BYTES
+    imaging.IMAGE_MAX_UPLOAD_BYTES = UPLOAD_LIMIT
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post(
+                "/api/visual_agent",
+                files={"file": ("part.jpg", b"\xff" * upload_bytes, "image/jpeg")}
+            )
+    finally:
+        imaging.IMAGE_MAX_UPLOAD_BYTES = default_limit
+
+async def run_streamed_test(total: int):
+    upload = StreamedUpload(total)
+    try:
+        contents = await read_upload(upload, limit=UPLOAD_LIMIT)
+    except ImageRejectedError:
+        contents = None
+    return contents, upload.served
+
+def test_oversized_upload_returns_413():
+    response = asyncio.run(run_endpoint_test(UPLOAD_LIMIT + 1))
+
+    assert response.status_code == 413
+    assert str(UPLOAD_LIMIT) in response.json()["detail"]
+
+def test_upload_of_unknown_size_stops_at_limit():
+    contents, served = asyncio.run(run_streamed_test(UPLOAD_LIMIT * 100))
+
+    assert contents is None
+    assert served == UPLOAD_LIMIT + 1
+
+def test_upload_within_limit_is_read_whole():
+    contents, served = asyncio.run(run_streamed_test(UPLOAD_LIMIT))
+
+    assert contents is not None and len(contents) == UPLOAD_LIMIT
+
+def main():
+    print("VeriGuardX Upload Limit Test")
+    print("=" * 50)
+    response = asyncio.run(run_endpoint_test(UPLOAD_LIMIT + 1))
+    print(f"Upload of {UPLOAD_LIMIT + 1} bytes (limit {UPLOAD_LIMIT}): {response.status_code}")
+    _, served = asyncio.run(run_streamed_test(UPLOAD_LIMIT * 100))
+    print(f"Upload of unknown size, {UPLOAD_LIMIT * 100} bytes: read {served} before refusing")
+
+if __name__ == "__main__":
+    main()